@@ -0,0 +1,127 @@
+"""
+Concurrency benchmark of the API layer.
+
+Measures the latency of `/health` and `/subtitle/status` while a number of `/subtitles/yt/generate` requests
+are in flight, whose YouTube lookup is slow. The handlers run the blocking calls on the executors,
+so the latency of the cheap endpoints should stay flat no matter how many generations are in flight.
+
+The datastore, the token verification and the YouTube lookup are replaced with stand-ins which sleep
+for the given time, so that the benchmark can run without the cloud services:
+
+    python benchmarks/api_concurrency.py --in-flight 0 8 32 --lookup-seconds 2
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("JOB_STORE_PATH", os.path.join(tempfile.mkdtemp(), "jobs.sqlite3"))
+os.environ.setdefault("SCRATCH_DIR", tempfile.mkdtemp())
+
+import httpx  # noqa: E402
+
+from pysubs.dal.datastore_models import UserModel  # noqa: E402
+from pysubs.dal.firestore import FirestoreDatastore  # noqa: E402
+from pysubs.utils.models import Media, MediaSource, MediaType  # noqa: E402
+
+MEDIA_ID = "a" * 64
+
+
+class SlowDatastore:
+    """Answers the datastore reads after the given round trip time"""
+    def __init__(self, round_trip_seconds: float):
+        self.round_trip_seconds = round_trip_seconds
+
+    def get_user(self, user_id: str) -> UserModel:
+        time.sleep(self.round_trip_seconds)
+        return UserModel(id=user_id, credits=100, displayName="bench", email="bench@pysubs", createdAt=datetime.now())
+
+    def get_media(self, media_id: str):
+        time.sleep(self.round_trip_seconds)
+        return None
+
+
+def install_stand_ins(round_trip_seconds: float, lookup_seconds: float):
+    datastore = SlowDatastore(round_trip_seconds)
+    FirestoreDatastore.instance = classmethod(lambda cls: datastore)
+
+    import pysubs.main as main
+    import pysubs.utils.auth as auth
+
+    def verify_token(token: str) -> dict:
+        time.sleep(round_trip_seconds)
+        return {"user_id": token}
+
+    def get_yt_media_info(video_url: str, user: UserModel) -> Media:
+        time.sleep(lookup_seconds)
+        return Media(
+            id=MEDIA_ID, source=MediaSource.YOUTUBE, file_type=MediaType.MP4, source_url=video_url,
+            duration=timedelta(minutes=1)
+        )
+
+    auth.decode_token = verify_token
+    main.get_yt_media_info = get_yt_media_info
+    main.get_in_flight_media_id = lambda video_url, user: None
+    main.start_youtube_transcribe_worker = lambda video_url, user: MEDIA_ID
+    return main.app
+
+
+async def measure(client: httpx.AsyncClient, method: str, url: str, samples: int, **kwargs) -> list[float]:
+    latencies = []
+    for _ in range(samples):
+        started_at = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started_at)
+    return latencies
+
+
+def percentile(latencies: list[float], q: float) -> float:
+    return statistics.quantiles(latencies, n=100, method="inclusive")[int(q) - 1] * 1000
+
+
+async def run(app, in_flight: int, samples: int) -> dict:
+    headers = {"Authorization": "Bearer bench-user"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        generations = [
+            asyncio.create_task(client.post(
+                "/subtitles/yt/generate", json={"video_url": f"https://youtube.com/watch?v={i}"}, headers=headers
+            ))
+            for i in range(in_flight)
+        ]
+        await asyncio.sleep(0.05)
+        health = await measure(client, "GET", "/health", samples)
+        status = await measure(client, "POST", "/subtitle/status", samples, json={"media_id": MEDIA_ID}, headers=headers)
+        await asyncio.gather(*generations)
+    return {
+        "in_flight": in_flight,
+        "health_p50": percentile(health, 50), "health_p99": percentile(health, 99),
+        "status_p50": percentile(status, 50), "status_p99": percentile(status, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[0, 8, 32])
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--lookup-seconds", type=float, default=2.0)
+    parser.add_argument("--round-trip-seconds", type=float, default=0.005)
+    args = parser.parse_args()
+    app = install_stand_ins(round_trip_seconds=args.round_trip_seconds, lookup_seconds=args.lookup_seconds)
+    print(f"{'in flight':>10} {'health p50':>11} {'health p99':>11} {'status p50':>11} {'status p99':>11}  (ms)")
+    for in_flight in args.in_flight:
+        result = asyncio.run(run(app, in_flight=in_flight, samples=args.samples))
+        print(
+            f"{result['in_flight']:>10} {result['health_p50']:>11.2f} {result['health_p99']:>11.2f} "
+            f"{result['status_p50']:>11.2f} {result['status_p99']:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Metadata access benchmark of the datastore backends.
+
+Fills the SQLite datastore and an in memory stand-in of Firestore, which waits for the given latency on every
+read and query like a round trip to the server, with the same history and measures the reads of the API:
+
+    python benchmarks/datastore_backends.py --history 100 --repeat 200 --latency-ms 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pysubs.dal.firestore import FirestoreDatastore  # noqa: E402
+from pysubs.dal.sqlite import SQLiteDatastore  # noqa: E402
+from pysubs.interfaces.datastore import Datastore  # noqa: E402
+from tests.fake_firestore import FakeFirestore, make_media, make_subtitle, sample_user  # noqa: E402
+
+
+def fill(datastore: Datastore, count: int) -> None:
+    datastore.upsert_user(sample_user)
+    for i in range(count):
+        datastore.upsert_media(make_media(i))
+        datastore.upsert_subtitle(make_subtitle(i))
+
+
+def measure(backend: str, name: str, repeat: int, read) -> None:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        read()
+        timings.append(time.perf_counter() - started_at)
+    print(f"{backend:>10} {name:>16} {statistics.median(timings) * 1000:>12.3f} {max(timings) * 1000:>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+    db = FakeFirestore()
+    datastores = {
+        "firestore": FirestoreDatastore(db=db),
+        "sqlite": SQLiteDatastore(path=os.path.join(tempfile.mkdtemp(), "datastore.sqlite3")),
+    }
+    for datastore in datastores.values():
+        fill(datastore, args.history)
+    db.latency_seconds = args.latency_ms / 1000
+    print(f"{'backend':>10} {'read':>16} {'median (ms)':>12} {'max (ms)':>10}")
+    for backend, datastore in datastores.items():
+        measure(backend, "media", args.repeat, lambda: datastore.get_media("media-0"))
+        measure(backend, "subtitle", args.repeat, lambda: datastore.get_subtitle_for_media("media-0"))
+        measure(backend, "history summary", max(1, args.repeat // 10), lambda: datastore.get_history_for_user(
+            user_id=sample_user.id, count=args.history, include_content=False
+        ))
+
+
+if __name__ == "__main__":
+    main()
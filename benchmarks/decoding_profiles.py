@@ -0,0 +1,57 @@
+"""
+Accuracy and throughput benchmark of the decoding profiles.
+
+Transcribes a set of clips with every decoding profile and reports the word error rate against the reference
+transcripts and the real-time factor, the clip sets are described in benchmarks/quantization_wer.py:
+
+    python benchmarks/decoding_profiles.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.quantization_wer import CLIPS_DIR, load_clips  # noqa: E402
+from pysubs.utils.decoding import DECODING_PROFILES  # noqa: E402
+from pysubs.utils.ffmpeg_utils import PCM_SAMPLE_RATE  # noqa: E402
+from pysubs.utils.model_registry import WhisperModelRegistry  # noqa: E402
+from pysubs.utils.models import Media, MediaSource, MediaType  # noqa: E402
+from pysubs.utils.transcriber import WhisperTranscriber  # noqa: E402
+from tests.helpers import normalize, word_error_rate  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", default=CLIPS_DIR)
+    parser.add_argument("--profiles", default=",".join(DECODING_PROFILES))
+    args = parser.parse_args()
+    clips = load_clips(args.clips)
+    if not clips:
+        parser.error(f"No audio files with reference transcripts were found in {args.clips}")
+    audio_seconds = sum(len(audio) for _, audio, _ in clips) / PCM_SAMPLE_RATE
+    print(f"{len(clips)} clips, {audio_seconds:.1f}s of audio")
+    print(f"{'profile':>9} {'model':>8} {'WER':>7} {'RTF':>7}")
+    transcriber = WhisperTranscriber()
+    for name in args.profiles.split(","):
+        profile = DECODING_PROFILES[name]
+        # the model is loaded before the clock starts, the jobs find it loaded in the registry as well
+        WhisperModelRegistry.instance().get_model(profile.model_name)
+        errors, words, transcribe_seconds = 0.0, 0, 0.0
+        for _, audio, reference in clips:
+            media = Media(source=MediaSource.RAW_FILE, file_type=MediaType.PCM, pcm=audio)
+            started_at = time.perf_counter()
+            result = transcriber.process_audio(media, profile=name)
+            transcribe_seconds += time.perf_counter() - started_at
+            reference_words = len(normalize(reference))
+            errors += word_error_rate(reference, result["text"]) * reference_words
+            words += reference_words
+        print(
+            f"{name:>9} {profile.model_name:>8} {errors / max(1, words):>7.3f} "
+            f"{transcribe_seconds / audio_seconds:>7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
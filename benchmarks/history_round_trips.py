@@ -0,0 +1,60 @@
+"""
+Round trip benchmark of the history retrieval.
+
+Fills an in memory stand-in of Firestore, which waits for the given latency on every read and query,
+with the history of a user and fetches a page of it. The subtitles of the page are fetched with batched `in`
+queries which run concurrently, the query per media of the previous implementation is measured alongside:
+
+    python benchmarks/history_round_trips.py --page-size 100 --latency-ms 20
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pysubs.dal.datastore_models import MediaModel, SubtitleModel, MediaSubtitlesModel  # noqa: E402
+from pysubs.dal.firestore import FirestoreDatastore  # noqa: E402
+from tests.fake_firestore import FakeFirestore, add_history  # noqa: E402
+
+
+def get_history_one_query_per_media(fs: FirestoreDatastore, user_id: str, count: int) -> list[MediaSubtitlesModel]:
+    """The history retrieval with one subtitles query per media, as it was implemented before"""
+    medias = fs.db.collection('media').where("user_id", "==", user_id).order_by(
+        "created_at", direction="DESCENDING"
+    ).limit(count).stream()
+    history = []
+    for m in medias:
+        subtitles = [
+            SubtitleModel(**sub.to_dict())
+            for sub in fs.db.collection('subtitles').where("media_id", "==", m.id).stream()
+        ]
+        history.append(MediaSubtitlesModel(media=MediaModel(**m.to_dict()), subtitles=subtitles))
+    return history
+
+
+def measure(name: str, db: FakeFirestore, fetch) -> None:
+    queries = db.queries
+    started_at = time.perf_counter()
+    history = fetch()
+    elapsed = time.perf_counter() - started_at
+    print(f"{name:>22} {len(history):>6} {db.queries - queries:>12} {elapsed * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+    db = FakeFirestore()
+    add_history(db, user_id="1", count=args.page_size)
+    db.latency_seconds = args.latency_ms / 1000
+    fs = FirestoreDatastore(db=db)
+    print(f"{'implementation':>22} {'items':>6} {'round trips':>12} {'wall (ms)':>10}")
+    measure("query per media", db, lambda: get_history_one_query_per_media(fs, "1", args.page_size))
+    measure("batched, concurrent", db, lambda: fs.get_history_for_user(user_id="1", count=args.page_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Cold start benchmark of the API.
+
+Imports the module in a fresh interpreter with `-X importtime` and reports the cumulative import time of the module
+and of its slowest imports, the heavy libraries of the workers are expected to be missing from the API imports:
+
+    python benchmarks/import_time.py --module pysubs.main --top 15
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.helpers import measure_import_time, WORKER_MODULES  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="pysubs.main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    timings = measure_import_time(args.module)
+    print(f"{args.module}: {timings[args.module] / 1000:.1f} ms")
+    print(f"worker modules loaded: {[m for m in WORKER_MODULES if m in timings] or 'none'}")
+    for name, cumulative in sorted(timings.items(), key=lambda item: item[1], reverse=True)[1:args.top + 1]:
+        print(f"{cumulative / 1000:>10.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
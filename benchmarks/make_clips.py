@@ -0,0 +1,137 @@
+"""
+Generates the reference clip set of the accuracy benchmarks.
+
+Speaks public-domain Harvard sentences (IEEE Recommended Practice for Speech Quality Measurements, 1969)
+with the espeak-ng speech synthesizer and writes every clip as a 16 kHz mono wav file with its reference
+transcript of the same name ending in `.txt`. The generated set is bundled in benchmarks/clips, it is the default
+of `--clips` of benchmarks/quantization_wer.py and benchmarks/decoding_profiles.py.
+The synthesizer is the espeak-ng library of the system, or the one of `pip install espeakng-loader`:
+
+    python benchmarks/make_clips.py --out benchmarks/clips
+"""
+import argparse
+import ctypes
+import ctypes.util
+import os
+import wave
+from typing import Optional
+
+import numpy as np
+
+CLIPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clips")
+SAMPLE_RATE: int = 16000
+# the clips are made of the first sentences of the Harvard lists, a few sentences each
+CLIPS: dict[str, list[str]] = {
+    "harvard-01": [
+        "The birch canoe slid on the smooth planks.",
+        "Glue the sheet to the dark blue background.",
+        "It's easy to tell the depth of a well.",
+    ],
+    "harvard-02": [
+        "These days a chicken leg is a rare dish.",
+        "Rice is often served in round bowls.",
+        "The juice of lemons makes fine punch.",
+    ],
+    "harvard-03": [
+        "The box was thrown beside the parked truck.",
+        "The hogs were fed chopped corn and garbage.",
+        "Four hours of steady work faced us.",
+    ],
+    "harvard-04": [
+        "A large size in stockings is hard to sell.",
+        "The boy was there when the sun rose.",
+        "A rod is used to catch pink salmon.",
+    ],
+    "harvard-05": [
+        "The source of the huge river is the clear spring.",
+        "Kick the ball straight and follow through.",
+        "Help the woman get back to her feet.",
+    ],
+}
+# espeak_AUDIO_OUTPUT.AUDIO_OUTPUT_SYNCHRONOUS and espeak_POSITION_TYPE.POS_CHARACTER of speak_lib.h
+AUDIO_OUTPUT_SYNCHRONOUS: int = 2
+POS_CHARACTER: int = 1
+SYNTH_CALLBACK = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.POINTER(ctypes.c_short), ctypes.c_int, ctypes.c_void_p)
+
+
+def load_espeak() -> tuple[ctypes.CDLL, Optional[str]]:
+    """
+    Loads the espeak-ng library and returns it with its data directory, which is None for the system library
+    :return:
+    """
+    try:
+        import espeakng_loader
+        return ctypes.CDLL(espeakng_loader.get_library_path()), espeakng_loader.get_data_path()
+    except ImportError:
+        if (path := ctypes.util.find_library("espeak-ng")) is None:
+            raise RuntimeError("espeak-ng was not found, install it or run `pip install espeakng-loader`")
+        return ctypes.CDLL(path), None
+
+
+def synthesize(espeak: ctypes.CDLL, sample_rate: int, text: str) -> np.ndarray:
+    """
+    Speaks the text and returns the audio resampled to 16 kHz as float32 samples
+    :param espeak:
+    :param sample_rate:
+    :param text:
+    :return:
+    """
+    samples: list[np.ndarray] = []
+
+    @SYNTH_CALLBACK
+    def collect(wav, count, events) -> int:
+        if wav and count > 0:
+            samples.append(np.ctypeslib.as_array(wav, shape=(count,)).copy())
+        return 0
+
+    espeak.espeak_SetSynthCallback(collect)
+    data = text.encode("utf-8")
+    espeak.espeak_Synth(data, len(data) + 1, 0, POS_CHARACTER, 0, 0, None, None)
+    espeak.espeak_Synchronize()
+    audio = np.concatenate(samples).astype(np.float32) / 32768
+    positions = np.arange(0, len(audio) * SAMPLE_RATE / sample_rate) * sample_rate / SAMPLE_RATE
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def write_wav(path: str, audio: np.ndarray) -> None:
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=CLIPS_DIR)
+    parser.add_argument("--voice", default="en-us")
+    parser.add_argument("--rate", type=int, default=150, help="words per minute")
+    args = parser.parse_args()
+    espeak, data_path = load_espeak()
+    espeak.espeak_Initialize.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+    espeak.espeak_Synth.argtypes = [
+        ctypes.c_char_p, ctypes.c_size_t, ctypes.c_uint, ctypes.c_int, ctypes.c_uint, ctypes.c_uint,
+        ctypes.c_void_p, ctypes.c_void_p
+    ]
+    espeak.espeak_SetSynthCallback.argtypes = [SYNTH_CALLBACK]
+    espeak.espeak_SetVoiceByName.argtypes = [ctypes.c_char_p]
+    sample_rate = espeak.espeak_Initialize(
+        AUDIO_OUTPUT_SYNCHRONOUS, 0, data_path.encode("utf-8") if data_path else None, 0
+    )
+    if sample_rate <= 0:
+        raise RuntimeError("espeak-ng could not be initialized")
+    espeak.espeak_SetVoiceByName(args.voice.encode("utf-8"))
+    # espeakRATE of espeak_PARAMETER
+    espeak.espeak_SetParameter(1, args.rate, 0)
+    os.makedirs(args.out, exist_ok=True)
+    for name, sentences in CLIPS.items():
+        text = " ".join(sentences)
+        audio = synthesize(espeak, sample_rate, text)
+        write_wav(os.path.join(args.out, f"{name}.wav"), audio)
+        with open(os.path.join(args.out, f"{name}.txt"), "w") as f:
+            f.write(f"{text}\n")
+        print(f"{name}: {len(audio) / SAMPLE_RATE:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Memory benchmark of the pre-forked workers.
+
+Loads the whisper model once, forks the given number of worker processes which transcribe a second of silence
+and reports the memory of every process read from /proc/<pid>/smaps_rollup. The shared bytes of a worker are
+the pages of the weights it still shares with the supervisor, instead of holding its own copy:
+
+    python benchmarks/prefork_memory.py --model base --processes 4
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pysubs.utils.model_registry import WhisperModelRegistry  # noqa: E402
+from pysubs.utils.prefork import PreforkSupervisor  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--settle-seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    def work(stopped: threading.Event) -> None:
+        import numpy as np
+        import torch
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // args.processes))
+        WhisperModelRegistry.instance().get_model(args.model).transcribe(np.zeros(16000, dtype=np.float32))
+        stopped.wait()
+
+    WhisperModelRegistry.instance().preload([args.model])
+    supervisor = PreforkSupervisor(processes=args.processes, preload=lambda: None, target=work)
+    thr = threading.Thread(target=supervisor.run, daemon=True)
+    thr.start()
+    time.sleep(args.settle_seconds)
+    stats = supervisor.stats()
+    resident = WhisperModelRegistry.instance().stats()["models"][args.model]["resident_bytes"]
+    supervisor.stop()
+    thr.join()
+    print(json.dumps(stats, indent=2))
+    total_pss = stats["supervisor"]["pss"] + sum(worker.get("pss", 0) for worker in stats["workers"])
+    print(f"model weights: {resident / 2 ** 20:.1f} MiB")
+    print(f"proportional set size of all the processes: {total_pss / 2 ** 20:.1f} MiB")
+    print(f"weights loaded per process would add: {resident * args.processes / 2 ** 20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Accuracy and throughput benchmark of the whisper quantization modes.
+
+Transcribes a set of clips with the fp32 and the int8 quantized model and reports the word error rate
+against the reference transcripts and the real-time factor, the transcription time over the audio length.
+A clip set is a directory of audio files, each with a reference transcript of the same name ending in `.txt`.
+The synthetic set of benchmarks/clips, spoken Harvard sentences generated by benchmarks/make_clips.py, is used
+by default, public-domain audiobook chapters from LibriVox with their book text make a larger set:
+
+    python benchmarks/quantization_wer.py --model base
+    python benchmarks/quantization_wer.py --clips ./librivox --model base
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pysubs.utils import quantization  # noqa: E402
+from pysubs.utils.ffmpeg_utils import decode_to_pcm, PCM_SAMPLE_RATE  # noqa: E402
+from pysubs.utils.model_registry import load_whisper_model  # noqa: E402
+from tests.helpers import normalize, word_error_rate  # noqa: E402
+
+CLIPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clips")
+
+AUDIO_EXTENSIONS: tuple[str, ...] = (".wav", ".flac", ".mp3", ".ogg", ".m4a")
+
+
+def read_audio(path: str) -> np.ndarray:
+    """
+    Reads the 16 kHz mono wav files like the bundled clips directly, the other files are decoded with ffmpeg
+    :param path:
+    :return:
+    """
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as f:
+            if (f.getframerate(), f.getnchannels(), f.getsampwidth()) == (PCM_SAMPLE_RATE, 1, 2):
+                return np.frombuffer(f.readframes(f.getnframes()), dtype="<i2").astype(np.float32) / 32768
+    return decode_to_pcm(path)
+
+
+def load_clips(clips_dir: str) -> list[tuple[str, object, str]]:
+    clips = []
+    for path in sorted(glob.glob(os.path.join(clips_dir, "*"))):
+        stem, extension = os.path.splitext(path)
+        if extension.lower() in AUDIO_EXTENSIONS and os.path.exists(f"{stem}.txt"):
+            with open(f"{stem}.txt") as f:
+                clips.append((os.path.basename(path), read_audio(path), f.read()))
+    return clips
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", default=CLIPS_DIR)
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--language", default="en")
+    args = parser.parse_args()
+    clips = load_clips(args.clips)
+    if not clips:
+        parser.error(f"No audio files with reference transcripts were found in {args.clips}")
+    audio_seconds = sum(len(audio) for _, audio, _ in clips) / PCM_SAMPLE_RATE
+    print(f"{len(clips)} clips, {audio_seconds:.1f}s of audio")
+    print(f"{'mode':>6} {'load (s)':>9} {'WER':>7} {'RTF':>7}")
+    for mode in (quantization.QUANTIZATION_NONE, quantization.QUANTIZATION_INT8):
+        started_at = time.perf_counter()
+        model = load_whisper_model(args.model, quantization_mode=mode)
+        load_seconds = time.perf_counter() - started_at
+        errors, words, transcribe_seconds = 0.0, 0, 0.0
+        for name, audio, reference in clips:
+            started_at = time.perf_counter()
+            result = model.transcribe(audio, language=args.language, fp16=False)
+            transcribe_seconds += time.perf_counter() - started_at
+            reference_words = len(normalize(reference))
+            errors += word_error_rate(reference, result["text"]) * reference_words
+            words += reference_words
+        print(f"{mode:>6} {load_seconds:>9.2f} {errors / max(1, words):>7.3f} {transcribe_seconds / audio_seconds:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
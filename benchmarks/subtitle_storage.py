@@ -0,0 +1,67 @@
+"""
+Storage benchmark of the subtitle content codec.
+
+Generates SRT transcripts of the given lengths, encodes them with the codec used by the FirestoreDatastore
+and reports the bytes stored per subtitle, the number of documents and the encode and decode times:
+
+    python benchmarks/subtitle_storage.py --minutes 10 60 180 600
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pysubs.dal import subtitle_codec  # noqa: E402
+
+WORDS = (
+    "the a and to of in that it is was for on you he be with as by at have are this not but had his they from "
+    "she which or we an there her were one do been all their has would will what if can when so no said who"
+).split()
+
+
+def format_timestamp(seconds: float) -> str:
+    milliseconds = int(seconds * 1000)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+
+def generate_srt(minutes: int, seed: int = 0) -> str:
+    """Generates a transcript with a segment of about a dozen words every three seconds"""
+    rng = random.Random(seed)
+    segments = []
+    for index, start in enumerate(range(0, minutes * 60, 3), start=1):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16)))
+        segments.append(f"{index}\n{format_timestamp(start)} --> {format_timestamp(start + 3)}\n{text}\n")
+    return "\n".join(segments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=int, nargs="+", default=[10, 60, 180, 600])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(f"{'minutes':>8} {'raw bytes':>11} {'stored bytes':>13} {'ratio':>6} {'documents':>10} "
+          f"{'encode ms':>10} {'decode ms':>10}")
+    for minutes in args.minutes:
+        content = generate_srt(minutes)
+        started_at = time.perf_counter()
+        for _ in range(args.repeat):
+            encoded = subtitle_codec.encode_content(content)
+        encode_ms = (time.perf_counter() - started_at) / args.repeat * 1000
+        started_at = time.perf_counter()
+        for _ in range(args.repeat):
+            decoded = subtitle_codec.decode_content(encoded.encoding, encoded.chunks)
+        decode_ms = (time.perf_counter() - started_at) / args.repeat * 1000
+        assert decoded == content
+        stored = sum(len(chunk) for chunk in encoded.chunks)
+        print(f"{minutes:>8} {encoded.size:>11} {stored:>13} {encoded.size / stored:>6.1f} {len(encoded.chunks):>10} "
+              f"{encode_ms:>10.2f} {decode_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
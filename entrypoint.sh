@@ -1,3 +1,7 @@
 #!/bin/bash
 
+# PROCESS_ROLE=worker runs the transcription workers, the API queues the jobs for them when PROCESS_ROLE=api
+if [ "$PROCESS_ROLE" = "worker" ]; then
+  exec python -m pysubs.worker
+fi
 uvicorn pysubs.main:app --host="0.0.0.0" --port=8080 --log-level="info"
@@ -1,7 +1,20 @@
 from typing import Optional
 
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timezone
+
+
+def parse_history_cursor(value: datetime | str) -> datetime:
+    """
+    Parses the creation time the history pages are continued from, the clients send it back as the ISO 8601 text
+    of the last item they received. The datetimes are stored as naive UTC, so the aware ones are converted to it.
+    :param value:
+    :return:
+    """
+    cursor = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    if cursor.tzinfo is not None:
+        cursor = cursor.astimezone(timezone.utc).replace(tzinfo=None)
+    return cursor
 
 
 class MediaModel(BaseModel):
@@ -16,6 +29,9 @@ class MediaModel(BaseModel):
     media_source: Optional[str]
     thumbnail_url: Optional[str]
     created_at: datetime = datetime.utcnow()
+    stream_itag: Optional[int] = None
+    stream_bitrate: Optional[int] = None
+    stream_bytes: Optional[int] = None
 
 
 class SubtitleModel(BaseModel):
@@ -24,12 +40,30 @@ class SubtitleModel(BaseModel):
     """
     id: str
     media_id: str
-    content: str
+    # left out of the history listings in the summary mode
+    content: Optional[str]
     language: str = "en"
     created_at: datetime
     expire_at: datetime
 
 
+class TranscriptionCacheModel(BaseModel):
+    """
+    datastore model to store the transcription of a media content, shared by all the users who generate
+    subtitles for the same content with the same model and language
+    """
+    id: str
+    content_id: str
+    model_name: str
+    language: str
+    detected_language: str
+    content: str
+    title: Optional[str]
+    duration: int
+    thumbnail_url: Optional[str]
+    created_at: datetime
+
+
 class MediaSubtitlesModel(BaseModel):
     """A helper model to get the data from firestore which will contain all the medias and the subtitles each media has"""
     media: MediaModel
@@ -43,3 +77,22 @@ class UserModel(BaseModel):
     displayName: str
     email: str
     createdAt: datetime
+
+
+class JobModel(BaseModel):
+    """Job store representation of a subtitle generation job"""
+    id: str
+    kind: str
+    payload: dict
+    status: str
+    stage: Optional[str]
+    attempts: int
+    max_attempts: int
+    lease_owner: Optional[str]
+    lease_expires_at: Optional[float]
+    next_attempt_at: float
+    last_error: Optional[str]
+    created_at: float
+    updated_at: float
+    decoding_profile: Optional[str]
+    real_time_factor: Optional[float]
@@ -0,0 +1,19 @@
+from pysubs.interfaces.datastore import Datastore
+from pysubs.utils.constants import EnvConstants, DatastoreBackend
+from pysubs.utils.settings import PySubsSettings
+
+
+def get_datastore() -> Datastore:
+    """
+    Returns the datastore of the backend selected with the DATASTORE_BACKEND setting.
+    The backends are imported on first use, so that a deployment on SQLite does not need the Firebase libraries.
+    :return:
+    """
+    backend = PySubsSettings.get_config(EnvConstants.DATASTORE_BACKEND)
+    if backend == DatastoreBackend.FIRESTORE:
+        from pysubs.dal.firestore import FirestoreDatastore
+        return FirestoreDatastore.instance()
+    if backend == DatastoreBackend.SQLITE:
+        from pysubs.dal.sqlite import SQLiteDatastore
+        return SQLiteDatastore.instance()
+    raise ValueError(f"Unknown datastore backend: {backend}")
@@ -1,12 +1,87 @@
+import logging
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 
-import firebase_admin
 from google.cloud import firestore
-from pysubs.dal.datastore_models import MediaModel, SubtitleModel, MediaSubtitlesModel, UserModel
+from pysubs.dal.datastore_models import MediaModel, SubtitleModel, MediaSubtitlesModel, UserModel, \
+    TranscriptionCacheModel, parse_history_cursor
 from pysubs.exceptions.firestore import UserNotFoundError
-from pysubs.interfaces.datastore import Datastore
+from pysubs.exceptions.media import NotEnoughCreditsToPerformGenerationError
+from pysubs.dal import subtitle_codec
+from pysubs.interfaces.datastore import Datastore, UnitOfWork
+from pysubs.utils.cache import LRUCache
+from pysubs.utils.constants import EnvConstants, LogConstants
+from pysubs.utils.firebase import get_firebase_app
+from pysubs.utils.settings import PySubsSettings
+
+logger = logging.getLogger(LogConstants.LOGGER_NAME)
+
+# the number of values a single `in` filter accepts
+IN_QUERY_LIMIT: int = 10
+# the number of the batched queries of a history page which run at the same time
+MAX_CONCURRENT_QUERIES: int = 10
+# the fields of the subtitles read for the history listings in the summary mode, which leave out the content
+SUBTITLE_SUMMARY_FIELDS: list[str] = ["id", "media_id", "language", "created_at", "expire_at"]
+
+
+class FirestoreUnitOfWork(UnitOfWork):
+    """
+    Unit of work backed by a Firestore transaction, the writes are collected and committed atomically on commit.
+    The balances of the users are read again in the transaction and checked before they are decremented,
+    Firestore retries the transaction when a concurrent generation of the user changed the balance meanwhile,
+    so concurrent generations cannot overwrite each other's deduction or drive the credits negative.
+    """
+    def __init__(self, datastore: "FirestoreDatastore"):
+        self.datastore = datastore
+        # the documents to set, or to delete when the document is None
+        self._writes: list[tuple[Any, Optional[dict]]] = []
+        self._decrements: dict[str, int] = {}
+
+    def upsert_media(self, media: MediaModel) -> None:
+        self._writes.append((self.datastore.db.collection('media').document(media.id), media.dict()))
+
+    def upsert_subtitle(self, subtitle: SubtitleModel) -> None:
+        self._writes.extend(self.datastore.subtitle_to_documents(subtitle))
+
+    def decrement_credits(self, user_id: str, amount: int) -> None:
+        self._decrements[user_id] = self._decrements.get(user_id, 0) + amount
+
+    def commit(self) -> None:
+        """
+        commits the writes and the decrements in a transaction, which raises UserNotFoundError or
+        NotEnoughCreditsToPerformGenerationError without writing anything when a balance cannot be decremented.
+        The cached users whose credits changed are updated with their new balance.
+        :return:
+        """
+        users = self.datastore.db.collection('users')
+
+        @firestore.transactional
+        def apply(transaction: firestore.Transaction) -> dict[str, int]:
+            balances = {}
+            # all the reads of a transaction have to come before its writes
+            for user_id, amount in self._decrements.items():
+                user = users.document(user_id).get(transaction=transaction)
+                if not user.exists:
+                    raise UserNotFoundError(f"User with id: {user_id} was not found in firestore.")
+                if (credits := user.get("credits")) < amount:
+                    raise NotEnoughCreditsToPerformGenerationError(
+                        f"The user with id: {user_id} has {credits} credits, {amount} are required"
+                    )
+                balances[user_id] = credits - amount
+            for reference, document in self._writes:
+                if document is None:
+                    transaction.delete(reference)
+                else:
+                    transaction.set(reference, document)
+            for user_id, balance in balances.items():
+                transaction.update(users.document(user_id), {"credits": balance})
+            return balances
+
+        for user_id, balance in apply(self.datastore.db.transaction()).items():
+            self.datastore.update_cached_credits(user_id=user_id, credits=balance)
 
 
 class FirestoreDatastore(Datastore):
@@ -26,12 +101,36 @@ class FirestoreDatastore(Datastore):
                     cls.__singleton_instance = cls()
         return cls.__singleton_instance
 
-    def __init__(self):
+    def __init__(self, db: Optional[firestore.Client] = None):
         """
-        Initializing the app and creating the client
+        Initializing the app and creating the client, unless a client is given.
+        The users read are kept in a read-through cache, which is updated by upsert_user, by the units of work
+        and by the snapshot listeners of the cached user documents, so that the cache does not serve stale
+        credit balances. The listeners are limited to USER_WATCH_LIMIT users, as every listener holds a stream
+        to the server, the changes made elsewhere to the other cached users are picked up when their ttl expires.
+        :param db:
         """
-        firebase_admin.initialize_app()
-        self.db = firestore.Client()
+        if db is None:
+            get_firebase_app()
+            db = firestore.Client()
+        self.db = db
+        self.user_cache = LRUCache(
+            maxsize=int(PySubsSettings.get_config(EnvConstants.USER_CACHE_SIZE)),
+            ttl_seconds=float(PySubsSettings.get_config(EnvConstants.USER_CACHE_TTL_SECONDS)),
+            on_evict=self._stop_watching_user
+        )
+        self.max_user_watches = int(PySubsSettings.get_config(EnvConstants.USER_WATCH_LIMIT))
+        self._user_watches_lock = threading.Lock()
+        self._user_watches = {}
+        self._query_executor = ThreadPoolExecutor(
+            max_workers=MAX_CONCURRENT_QUERIES, thread_name_prefix="pysubs-firestore-query"
+        )
+        # the listeners are stopped on this thread, as the users are also evicted from the callbacks of the listeners
+        # and a listener cannot be stopped from its own callback thread
+        self._unwatch_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pysubs-firestore-unwatch")
+
+    def unit_of_work(self) -> FirestoreUnitOfWork:
+        return FirestoreUnitOfWork(datastore=self)
 
     def upsert_media(self, media: MediaModel) -> MediaModel:
         """
@@ -52,31 +151,198 @@ class FirestoreDatastore(Datastore):
         """
         user_ref = self.db.collection('users').document(user.id)
         user_ref.set(user.dict(), merge=True)
+        self.user_cache.put(user.id, user.copy())
         return user
 
     def upsert_subtitle(self, subtitle: SubtitleModel) -> SubtitleModel:
         """
         upserts the user data to the subtitles collection and returns the upserted subtitles model
+        the content is compressed and the chunks which do not fit in the subtitle document are written with it
         :param subtitle:
         :return:
         """
-        subtitle_ref = self.db.collection('subtitles').document(subtitle.id)
-        subtitle_ref.set(subtitle.dict())
+        with self.unit_of_work() as unit_of_work:
+            unit_of_work.upsert_subtitle(subtitle)
         return subtitle
 
+    def subtitle_to_documents(
+            self, subtitle: SubtitleModel
+    ) -> list[tuple[firestore.DocumentReference, Optional[dict]]]:
+        """
+        encodes the subtitle to its document and its chunk documents, see content_to_documents
+        :param subtitle:
+        :return:
+        """
+        return self.content_to_documents('subtitles', 'subtitle_chunks', 'subtitle_id', subtitle.id, subtitle.dict())
+
+    def subtitle_from_document(self, document: dict) -> SubtitleModel:
+        """
+        decodes the subtitle from its document.
+        The documents stored before the content was compressed and the summary projections are read as they are.
+        :param document:
+        :return:
+        """
+        return SubtitleModel(**self.content_from_document('subtitle_chunks', document.get("id"), document))
+
+    def content_to_documents(
+            self, collection: str, chunk_collection: str, parent_field: str, document_id: str, document: dict
+    ) -> list[tuple[firestore.DocumentReference, Optional[dict]]]:
+        """
+        encodes the content of the document and splits it to the document and its chunk documents. The first chunk
+        of the compressed content is kept in the document, so the contents of a usual length are read
+        with a single document and the long ones do not hit the size limit of a document.
+        The chunks carry the expire_at of the document, so that the TTL policy deletes them with it,
+        and the chunks of a previous longer content are returned with None to be deleted in the same write.
+        :param collection:
+        :param chunk_collection:
+        :param parent_field: the field of the chunk documents holding the id of the document
+        :param document_id:
+        :param document:
+        :return:
+        """
+        reference = self.db.collection(collection).document(document_id)
+        previous_chunks = (reference.get().to_dict() or {}).get("content_chunks") or 1
+        documents: list[tuple[firestore.DocumentReference, Optional[dict]]] = [(reference, document)]
+        chunk_count = 1
+        if document.get("content") is not None:
+            encoded = subtitle_codec.encode_content(document["content"])
+            document.update(
+                content=None,
+                content_encoding=encoded.encoding,
+                content_size=encoded.size,
+                content_chunks=len(encoded.chunks),
+                content_blob=encoded.chunks[0],
+            )
+            chunk_count = len(encoded.chunks)
+            for index, chunk in enumerate(encoded.chunks[1:], start=1):
+                chunk_document = {parent_field: document_id, "index": index, "data": chunk}
+                if document.get("expire_at") is not None:
+                    chunk_document["expire_at"] = document["expire_at"]
+                documents.append(
+                    (self.db.collection(chunk_collection).document(f"{document_id}-{index}"), chunk_document)
+                )
+        for index in range(chunk_count, previous_chunks):
+            documents.append((self.db.collection(chunk_collection).document(f"{document_id}-{index}"), None))
+        return documents
+
+    def content_from_document(self, chunk_collection: str, document_id: str, document: dict) -> dict:
+        """
+        decodes the content of the document, reading the rest of the chunks of a long content in one call.
+        The documents whose content is not encoded are returned as they are.
+        :param chunk_collection:
+        :param document_id:
+        :param document:
+        :return:
+        """
+        if not (encoding := document.get("content_encoding")) or "content_blob" not in document:
+            return document
+        chunks = [document["content_blob"]]
+        if (chunk_count := document.get("content_chunks", 1)) > 1:
+            references = [
+                self.db.collection(chunk_collection).document(f"{document_id}-{index}")
+                for index in range(1, chunk_count)
+            ]
+            rest = sorted((chunk.to_dict() for chunk in self.db.get_all(references)), key=lambda c: c["index"])
+            chunks.extend(chunk["data"] for chunk in rest)
+        return {**document, "content": subtitle_codec.decode_content(encoding, chunks)}
+
     def get_user(self, user_id: str) -> Optional[UserModel]:
         """
         queries the datastore for the user with the specified user id and returns user model if such a user exists.
+        The user is served from the user cache when it is cached, a copy is returned so that the callers
+        can update it without changing the cached user.
         :param user_id:
         :return:
         """
+        if cached := self.user_cache.get(user_id):
+            return cached.copy()
         user_ref = self.db.collection('users').document(user_id)
         user = user_ref.get()
         if user.exists:
-            return UserModel(**user.to_dict())
+            ds_user = UserModel(**user.to_dict())
+            self.user_cache.put(user_id, ds_user.copy())
+            self._watch_user(user_ref)
+            return ds_user
         else:
             raise UserNotFoundError(f"User with id: {user_id} was not found in firestore.")
 
+    def _watch_user(self, user_ref) -> None:
+        """
+        Listens to the changes of the cached user document, so that the changes made by other processes,
+        like the credits bought through the cloud functions, replace the cached user.
+        The users over the watch limit are not listened to, they are refreshed when their ttl expires.
+        The user is reserved before the listener is started outside of the lock, as the listener takes the lock
+        in its callback, the listener of a user evicted meanwhile is stopped right away.
+        :param user_ref:
+        :return:
+        """
+        with self._user_watches_lock:
+            if user_ref.id in self._user_watches or len(self._user_watches) >= self.max_user_watches:
+                return
+            self._user_watches[user_ref.id] = None
+        try:
+            watch = user_ref.on_snapshot(self._on_user_snapshot)
+        except Exception as e:
+            logger.warning(f"Listening to the changes of the user: {user_ref.id} failed with error: {e}")
+            with self._user_watches_lock:
+                if user_ref.id in self._user_watches and self._user_watches[user_ref.id] is None:
+                    del self._user_watches[user_ref.id]
+            return
+        with self._user_watches_lock:
+            if user_ref.id in self._user_watches:
+                self._user_watches[user_ref.id] = watch
+                return
+        self._unwatch_executor.submit(self._unsubscribe, user_ref.id, watch)
+
+    def update_cached_credits(self, user_id: str, credits: int) -> None:
+        """
+        Updates the credits of the cached user, so that the user and its listener stay in the cache
+        :param user_id:
+        :param credits:
+        :return:
+        """
+        if cached := self.user_cache.get(user_id):
+            self.user_cache.put(user_id, cached.copy(update={"credits": credits}))
+
+    def _on_user_snapshot(self, snapshots: list, _changes, _read_time) -> None:
+        """
+        The callback of the user listeners, it runs on the thread of the listener.
+        The snapshots of the users whose listener is being stopped are stale, they are not put back in the cache.
+        :param snapshots:
+        :param _changes:
+        :param _read_time:
+        :return:
+        """
+        for snapshot in snapshots:
+            with self._user_watches_lock:
+                if snapshot.id not in self._user_watches:
+                    continue
+            if snapshot.exists:
+                self.user_cache.put(snapshot.id, UserModel(**snapshot.to_dict()))
+            else:
+                self.user_cache.pop(snapshot.id)
+
+    def _stop_watching_user(self, user_id: str, _user: UserModel) -> None:
+        """
+        Marks the listener of the evicted user as stale and stops it on the unwatch executor,
+        since the evictions also happen on the callback threads of the listeners
+        :param user_id:
+        :param _user:
+        :return:
+        """
+        with self._user_watches_lock:
+            watch = self._user_watches.pop(user_id, None)
+        # a listener which is still being started is stopped by _watch_user once it has started
+        if watch is not None:
+            self._unwatch_executor.submit(self._unsubscribe, user_id, watch)
+
+    @staticmethod
+    def _unsubscribe(user_id: str, watch) -> None:
+        try:
+            watch.unsubscribe()
+        except Exception as e:
+            logger.warning(f"Stopping the listener of the user: {user_id} failed with error: {e}")
+
     def get_subtitle_for_media(self, media_id: str) -> SubtitleModel:
         """
         queries the datastore for the subtitles for the given media.
@@ -86,7 +352,17 @@ class FirestoreDatastore(Datastore):
         """
         subtitles = self.db.collection('subtitles').where("media_id", "==", media_id).stream()
         for s in subtitles:
-            return SubtitleModel(**s.to_dict())
+            return self.subtitle_from_document(s.to_dict())
+
+    def get_subtitle(self, subtitle_id: str) -> Optional[SubtitleModel]:
+        """
+        queries the datastore for the subtitle with the given subtitle id
+        :param subtitle_id:
+        :return:
+        """
+        subtitle = self.db.collection('subtitles').document(subtitle_id).get()
+        if subtitle.exists:
+            return self.subtitle_from_document(subtitle.to_dict())
 
     def get_media(self, media_id: str) -> MediaModel:
         """
@@ -101,14 +377,20 @@ class FirestoreDatastore(Datastore):
     def get_history_for_user(
             self,
             user_id: str,
-            last_created_at: Optional[datetime] = None,
-            count: int = 100
+            last_created_at: Optional[datetime | str] = None,
+            count: int = 100,
+            include_content: bool = True
     ) -> list[MediaSubtitlesModel]:
         """
-        Gets the media entities with subtitles for a given user
+        Gets the media entities with subtitles for a given user.
+        The page is continued from last_created_at, which is either a datetime or its ISO 8601 text.
+        The subtitles of the whole page are fetched with batched `in` queries which run concurrently,
+        instead of one query per media. The content of the subtitles is left out by a projection
+        when include_content is False, so the size of the page does not depend on the length of the videos.
         :param user_id:
         :param last_created_at:
         :param count:
+        :param include_content:
         :return:
         """
         media_subtitles: list[MediaSubtitlesModel] = []
@@ -121,7 +403,7 @@ class FirestoreDatastore(Datastore):
         )
         if last_created_at:
             medias = ordered_medias.start_after({
-                u'created_at': last_created_at
+                u'created_at': parse_history_cursor(last_created_at)
             }).limit(
                 count
             ).stream()
@@ -129,12 +411,104 @@ class FirestoreDatastore(Datastore):
             medias = ordered_medias.limit(
                 count
             ).stream()
-        for m in medias:
-            media: MediaModel = MediaModel(**m.to_dict())
-            subtitles: list[SubtitleModel] = []
-            subtitles_ref = self.db.collection('subtitles').where("media_id", "==", m.id).stream()
-            for sub in subtitles_ref:
-                subtitle: SubtitleModel = SubtitleModel(**sub.to_dict())
-                subtitles.append(subtitle)
-            media_subtitles.append(MediaSubtitlesModel(media=media, subtitles=subtitles))
+        media_models: list[MediaModel] = [MediaModel(**m.to_dict()) for m in medias]
+        subtitles = self.get_subtitles_for_medias(
+            media_ids=[media.id for media in media_models], include_content=include_content
+        )
+        for media in media_models:
+            media_subtitles.append(MediaSubtitlesModel(media=media, subtitles=subtitles.get(media.id, [])))
         return media_subtitles
+
+    def get_subtitles_for_medias(
+            self,
+            media_ids: list[str],
+            include_content: bool = True
+    ) -> dict[str, list[SubtitleModel]]:
+        """
+        queries the datastore for the subtitles of the given medias in chunks of the `in` filter limit,
+        the chunks are queried concurrently and the subtitles are returned grouped by the media id
+        :param media_ids:
+        :param include_content:
+        :return:
+        """
+        chunks = [media_ids[i:i + IN_QUERY_LIMIT] for i in range(0, len(media_ids), IN_QUERY_LIMIT)]
+        subtitles: dict[str, list[SubtitleModel]] = {}
+        for chunk in self._query_executor.map(lambda c: self._get_subtitles_for_chunk(c, include_content), chunks):
+            for subtitle in chunk:
+                subtitles.setdefault(subtitle.media_id, []).append(subtitle)
+        return subtitles
+
+    def _get_subtitles_for_chunk(self, media_ids: list[str], include_content: bool) -> list[SubtitleModel]:
+        query = self.db.collection('subtitles').where("media_id", "in", media_ids)
+        if not include_content:
+            query = query.select(SUBTITLE_SUMMARY_FIELDS)
+        return [self.subtitle_from_document(sub.to_dict()) for sub in query.stream()]
+
+    def acquire_generation_lock(self, media_id: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        takes the generation lock of the media in a transaction on the generation_locks collection
+        :param media_id:
+        :param owner:
+        :param ttl_seconds:
+        :return:
+        """
+        lock_ref = self.db.collection('generation_locks').document(media_id)
+
+        @firestore.transactional
+        def acquire(transaction: firestore.Transaction) -> bool:
+            now = time.time()
+            lock = lock_ref.get(transaction=transaction)
+            if lock.exists and lock.get("owner") != owner and lock.get("expires_at") > now:
+                return False
+            transaction.set(lock_ref, {"owner": owner, "expires_at": now + ttl_seconds})
+            return True
+
+        return acquire(self.db.transaction())
+
+    def release_generation_lock(self, media_id: str, owner: str) -> None:
+        """
+        deletes the generation lock of the media in a transaction, when it is still held by the owner
+        :param media_id:
+        :param owner:
+        :return:
+        """
+        lock_ref = self.db.collection('generation_locks').document(media_id)
+
+        @firestore.transactional
+        def release(transaction: firestore.Transaction) -> None:
+            lock = lock_ref.get(transaction=transaction)
+            if lock.exists and lock.get("owner") == owner:
+                transaction.delete(lock_ref)
+
+        release(self.db.transaction())
+
+    def get_cached_transcription(self, cache_key: str) -> Optional[TranscriptionCacheModel]:
+        """
+        queries the transcription_cache collection for the given cache key,
+        the content is decoded in the same way as the content of the subtitles
+        :param cache_key:
+        :return:
+        """
+        entry = self.db.collection('transcription_cache').document(cache_key).get()
+        if entry.exists:
+            return TranscriptionCacheModel(
+                **self.content_from_document('transcription_cache_chunks', cache_key, entry.to_dict())
+            )
+
+    def upsert_cached_transcription(self, entry: TranscriptionCacheModel) -> TranscriptionCacheModel:
+        """
+        upserts the cached transcription to the transcription_cache collection,
+        the content is compressed and the chunks which do not fit in the document are written with it in a batch
+        :param entry:
+        :return:
+        """
+        batch = self.db.batch()
+        for reference, document in self.content_to_documents(
+                'transcription_cache', 'transcription_cache_chunks', 'cache_key', entry.id, entry.dict()
+        ):
+            if document is None:
+                batch.delete(reference)
+            else:
+                batch.set(reference, document)
+        batch.commit()
+        return entry
@@ -0,0 +1,267 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Iterator
+
+from pysubs.dal.datastore_models import JobModel
+from pysubs.utils.constants import EnvConstants
+from pysubs.utils.settings import PySubsSettings
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    ACTIVE = (QUEUED, RUNNING)
+
+
+class SQLiteJobStore:
+    """
+    Persists the subtitle generation jobs in a local SQLite database, so that the jobs survive restarts.
+    A worker claims a job by taking a lease on it, jobs whose lease has expired are claimed again,
+    which is how the jobs of a crashed or restarted process are resumed.
+    All should access this class using the SQLiteJobStore.instance() method.
+    """
+    __singleton_instance = None
+    __singleton_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "SQLiteJobStore":
+        if not cls.__singleton_instance:
+            with cls.__singleton_lock:
+                if not cls.__singleton_instance:
+                    cls.__singleton_instance = cls(path=PySubsSettings.get_config(EnvConstants.JOB_STORE_PATH))
+        return cls.__singleton_instance
+
+    def __init__(self, path: str):
+        """
+        Creates the database in WAL mode, so that the readers are not blocked by the workers
+        :param path:
+        """
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    decoding_profile TEXT,
+                    real_time_factor REAL
+                )
+            """)
+            # the columns added after the first release are added to the databases created before them
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)").fetchall()}
+            for column, column_type in (("decoding_profile", "TEXT"), ("real_time_factor", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_next_attempt ON jobs (status, next_attempt_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _to_model(row: Optional[sqlite3.Row]) -> Optional[JobModel]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return JobModel(**job)
+
+    def enqueue(self, job_id: str, kind: str, payload: dict, max_attempts: int) -> tuple[JobModel, bool]:
+        """
+        Adds a new job to the queue and returns it with True. A finished job with the same id is replaced,
+        while a queued or running job with the same id is returned as it is with False.
+        :param job_id:
+        :param kind:
+        :param payload:
+        :param max_attempts:
+        :return:
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            existing = self._to_model(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+            if existing and existing.status in JobStatus.ACTIVE:
+                return existing, False
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO jobs (
+                    id, kind, payload, status, stage, attempts, max_attempts, next_attempt_at, created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?, ?)
+                """,
+                (job_id, kind, json.dumps(payload), JobStatus.QUEUED, JobStatus.QUEUED, max_attempts, now, now, now)
+            )
+            return self._to_model(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()), True
+
+    def claim(self, owner: str, lease_seconds: float) -> Optional[JobModel]:
+        """
+        Claims the next due job for the given owner, this also picks up the running jobs whose lease has expired
+        unless they have used up their attempts, those are failed by fail_abandoned
+        :param owner:
+        :param lease_seconds:
+        :return:
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                """
+                SELECT id FROM jobs
+                WHERE (status = ? AND next_attempt_at <= ?)
+                OR (status = ? AND lease_expires_at < ? AND attempts < max_attempts)
+                ORDER BY next_attempt_at LIMIT 1
+                """,
+                (JobStatus.QUEUED, now, JobStatus.RUNNING, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                """
+                UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_expires_at = ?,
+                updated_at = ? WHERE id = ?
+                """,
+                (JobStatus.RUNNING, owner, now + lease_seconds, now, row["id"])
+            )
+            return self._to_model(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def extend_lease(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """
+        Extends the lease of a running job, returns False when the job is no longer owned by the given owner
+        :param job_id:
+        :param owner:
+        :param lease_seconds:
+        :return:
+        """
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+                (now + lease_seconds, now, job_id, owner, JobStatus.RUNNING)
+            )
+            return cursor.rowcount == 1
+
+    def set_stage(self, job_id: str, stage: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET stage = ?, updated_at = ? WHERE id = ?", (stage, time.time(), job_id))
+
+    def set_decoding(self, job_id: str, decoding_profile: str, real_time_factor: Optional[float]) -> None:
+        """
+        Records the decoding profile the job was transcribed with and the real-time factor it achieved
+        :param job_id:
+        :param decoding_profile:
+        :param real_time_factor:
+        :return:
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET decoding_profile = ?, real_time_factor = ?, updated_at = ? WHERE id = ?",
+                (decoding_profile, real_time_factor, time.time(), job_id)
+            )
+
+    def complete(self, job_id: str, owner: str) -> bool:
+        """
+        Marks the job as succeeded, returns False when the job is no longer owned by the given owner,
+        as its lease expired and it was claimed by another worker
+        :param job_id:
+        :param owner:
+        :return:
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ? "
+                "WHERE id = ? AND lease_owner = ?",
+                (JobStatus.SUCCEEDED, JobStatus.SUCCEEDED, time.time(), job_id, owner)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: str, owner: str, error: str, retry_in: Optional[float] = None) -> bool:
+        """
+        Marks the attempt as failed, the job is queued again after `retry_in` seconds when it is given.
+        Returns False when the job is no longer owned by the given owner
+        :param job_id:
+        :param owner:
+        :param error:
+        :param retry_in:
+        :return:
+        """
+        now = time.time()
+        status = JobStatus.QUEUED if retry_in is not None else JobStatus.FAILED
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE jobs SET status = ?, last_error = ?, next_attempt_at = ?, lease_owner = NULL,
+                lease_expires_at = NULL, updated_at = ? WHERE id = ? AND lease_owner = ?
+                """,
+                (status, error, now + (retry_in or 0), now, job_id, owner)
+            )
+            return cursor.rowcount == 1
+
+    def fail_abandoned(self) -> list[JobModel]:
+        """
+        Fails the running jobs whose lease has expired on their last attempt and returns them, their workers
+        have crashed or been killed on every attempt, so the job is not resumed again
+        :return:
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND lease_expires_at < ? AND attempts >= max_attempts",
+                (JobStatus.RUNNING, now)
+            ).fetchall()
+            jobs = []
+            for row in rows:
+                conn.execute(
+                    """
+                    UPDATE jobs SET status = ?, last_error = ?, lease_owner = NULL, lease_expires_at = NULL,
+                    updated_at = ? WHERE id = ?
+                    """,
+                    (JobStatus.FAILED, "The worker running the job stopped on every attempt", now, row["id"])
+                )
+                jobs.append(self._to_model(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()))
+            return jobs
+
+    def get(self, job_id: str) -> Optional[JobModel]:
+        with self._connect() as conn:
+            return self._to_model(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def get_active_ids(self) -> list[str]:
+        """
+        Returns the ids of the jobs which are queued or running
+        :return:
+        """
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM jobs WHERE status IN (?, ?)", JobStatus.ACTIVE).fetchall()
+            return [row["id"] for row in rows]
+
+    def count(self, status: str) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
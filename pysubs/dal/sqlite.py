@@ -0,0 +1,340 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Iterator
+
+from pysubs.dal import subtitle_codec
+from pysubs.dal.datastore_models import MediaModel, SubtitleModel, MediaSubtitlesModel, UserModel, \
+    TranscriptionCacheModel, parse_history_cursor
+from pysubs.exceptions.firestore import UserNotFoundError
+from pysubs.exceptions.media import NotEnoughCreditsToPerformGenerationError
+from pysubs.interfaces.datastore import Datastore, UnitOfWork
+from pysubs.utils.constants import EnvConstants
+from pysubs.utils.settings import PySubsSettings
+
+# the columns of the subtitles read for the history listings in the summary mode, which leave out the content
+SUBTITLE_SUMMARY_COLUMNS: str = "id, media_id, language, created_at, expire_at"
+# the variables a single statement accepts are limited, the subtitles of a history page are read in chunks of this
+IN_QUERY_LIMIT: int = 500
+
+SCHEMA: list[str] = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id TEXT PRIMARY KEY,
+        credits INTEGER NOT NULL,
+        displayName TEXT NOT NULL,
+        email TEXT NOT NULL,
+        createdAt TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS media (
+        id TEXT PRIMARY KEY,
+        user_id TEXT,
+        title TEXT NOT NULL,
+        duration INTEGER NOT NULL,
+        media_url TEXT,
+        media_source TEXT,
+        thumbnail_url TEXT,
+        created_at TEXT NOT NULL,
+        stream_itag INTEGER,
+        stream_bitrate INTEGER,
+        stream_bytes INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS media_user_id_created_at ON media (user_id, created_at)",
+    """
+    CREATE TABLE IF NOT EXISTS subtitles (
+        id TEXT PRIMARY KEY,
+        media_id TEXT NOT NULL,
+        language TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        expire_at TEXT NOT NULL,
+        content_encoding TEXT,
+        content_size INTEGER,
+        content BLOB
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS subtitles_media_id ON subtitles (media_id)",
+    """
+    CREATE TABLE IF NOT EXISTS generation_locks (
+        media_id TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS transcription_cache (
+        id TEXT PRIMARY KEY,
+        content_id TEXT NOT NULL,
+        model_name TEXT NOT NULL,
+        language TEXT NOT NULL,
+        detected_language TEXT NOT NULL,
+        content TEXT NOT NULL,
+        title TEXT,
+        duration INTEGER NOT NULL,
+        thumbnail_url TEXT,
+        created_at TEXT NOT NULL
+    )
+    """,
+]
+
+
+def _to_row(model: dict) -> dict:
+    """
+    converts the values of a model to the values stored in the columns, the datetimes are stored in ISO 8601
+    so that they are ordered by their text
+    :param model:
+    :return:
+    """
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in model.items()}
+
+
+def _upsert_statement(table: str, row: dict) -> str:
+    columns = ", ".join(row)
+    values = ", ".join(f":{column}" for column in row)
+    return f"INSERT OR REPLACE INTO {table} ({columns}) VALUES ({values})"
+
+
+class SQLiteUnitOfWork(UnitOfWork):
+    """
+    Unit of work backed by a SQLite transaction, the writes are collected and applied in a single transaction
+    on commit. The credits are checked and decremented in the update statement, so concurrent generations of a user
+    cannot overwrite each other's deduction or drive the credits negative.
+    """
+    def __init__(self, datastore: "SQLiteDatastore"):
+        self.datastore = datastore
+        self._writes: list[tuple[str, dict]] = []
+
+    def upsert_media(self, media: MediaModel) -> None:
+        row = _to_row(media.dict())
+        self._writes.append((_upsert_statement("media", row), row))
+
+    def upsert_subtitle(self, subtitle: SubtitleModel) -> None:
+        row = self.datastore.subtitle_to_row(subtitle)
+        self._writes.append((_upsert_statement("subtitles", row), row))
+
+    def decrement_credits(self, user_id: str, amount: int) -> None:
+        self._writes.append((
+            "UPDATE users SET credits = credits - :amount WHERE id = :user_id AND credits >= :amount",
+            {"amount": amount, "user_id": user_id}
+        ))
+
+    def commit(self) -> None:
+        """
+        applies the writes in one transaction, which is rolled back when the user of a decrement does not exist
+        or does not have enough credits
+        :return:
+        """
+        with self.datastore._transaction() as conn:
+            for statement, parameters in self._writes:
+                cursor = conn.execute(statement, parameters)
+                if statement.startswith("UPDATE users") and cursor.rowcount == 0:
+                    user_id = parameters["user_id"]
+                    if conn.execute("SELECT 1 FROM users WHERE id = ?", (user_id,)).fetchone() is None:
+                        raise UserNotFoundError(f"User with id: {user_id} was not found in sqlite.")
+                    raise NotEnoughCreditsToPerformGenerationError(
+                        f"The user with id: {user_id} does not have the {parameters['amount']} credits required"
+                    )
+
+
+class SQLiteDatastore(Datastore):
+    """
+    Datastore backed by a local SQLite database, for the deployments running on a single node and for the tests.
+    The reads do not leave the process, so the metadata is read without a network round trip.
+    All should access this class using the SQLiteDatastore.instance() method.
+    """
+    __singleton_instance = None
+    __singleton_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "SQLiteDatastore":
+        if not cls.__singleton_instance:
+            with cls.__singleton_lock:
+                if not cls.__singleton_instance:
+                    cls.__singleton_instance = cls(path=PySubsSettings.get_config(EnvConstants.SQLITE_DATASTORE_PATH))
+        return cls.__singleton_instance
+
+    def __init__(self, path: str):
+        """
+        Creates the tables and their indexes in a database in WAL mode, so that the readers are not blocked
+        by the writes of the workers
+        :param path:
+        """
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def unit_of_work(self) -> SQLiteUnitOfWork:
+        return SQLiteUnitOfWork(datastore=self)
+
+    def upsert_media(self, media: MediaModel) -> MediaModel:
+        with self.unit_of_work() as unit_of_work:
+            unit_of_work.upsert_media(media)
+        return media
+
+    def upsert_subtitle(self, subtitle: SubtitleModel) -> SubtitleModel:
+        with self.unit_of_work() as unit_of_work:
+            unit_of_work.upsert_subtitle(subtitle)
+        return subtitle
+
+    @staticmethod
+    def subtitle_to_row(subtitle: SubtitleModel) -> dict:
+        """
+        encodes the subtitle to its row, the content is compressed with the codec of the subtitle documents
+        and stored in a single blob as the rows are not limited in size
+        :param subtitle:
+        :return:
+        """
+        row = _to_row(subtitle.dict(exclude={"content"}))
+        row.update(content_encoding=None, content_size=None, content=None)
+        if subtitle.content is not None:
+            encoded = subtitle_codec.encode_content(subtitle.content)
+            row.update(content_encoding=encoded.encoding, content_size=encoded.size, content=b"".join(encoded.chunks))
+        return row
+
+    @staticmethod
+    def subtitle_from_row(row: sqlite3.Row) -> SubtitleModel:
+        subtitle = dict(row)
+        encoding = subtitle.pop("content_encoding", None)
+        subtitle.pop("content_size", None)
+        if (content := subtitle.pop("content", None)) is not None:
+            subtitle["content"] = subtitle_codec.decode_content(encoding, [content])
+        return SubtitleModel(**subtitle)
+
+    def get_user(self, user_id: str) -> Optional[UserModel]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+        if row is None:
+            raise UserNotFoundError(f"User with id: {user_id} was not found in sqlite.")
+        return UserModel(**dict(row))
+
+    def upsert_user(self, user: UserModel) -> UserModel:
+        row = _to_row(user.dict())
+        with self._connect() as conn:
+            conn.execute(_upsert_statement("users", row), row)
+        return user
+
+    def get_media(self, media_id: str) -> MediaModel:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM media WHERE id = ?", (media_id,)).fetchone()
+        if row is not None:
+            return MediaModel(**dict(row))
+
+    def get_subtitle_for_media(self, media_id: str) -> SubtitleModel:
+        """
+        reads a subtitle of the given media.
+        TODO: a media can have multiple subtitles, this method has to be updated to provision that later.
+        :param media_id:
+        :return:
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM subtitles WHERE media_id = ? LIMIT 1", (media_id,)).fetchone()
+        if row is not None:
+            return self.subtitle_from_row(row)
+
+    def get_subtitle(self, subtitle_id: str) -> Optional[SubtitleModel]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM subtitles WHERE id = ?", (subtitle_id,)).fetchone()
+        if row is not None:
+            return self.subtitle_from_row(row)
+
+    def get_history_for_user(
+            self,
+            user_id: str,
+            last_created_at: Optional[datetime | str] = None,
+            count: int = 100,
+            include_content: bool = True
+    ) -> list[MediaSubtitlesModel]:
+        """
+        Gets the media entities with subtitles for a given user, the page is read through the index
+        on the user id and the creation time and its subtitles through the index on the media id.
+        The page is continued from last_created_at, which is either a datetime or its ISO 8601 text.
+        :param user_id:
+        :param last_created_at:
+        :param count:
+        :param include_content:
+        :return:
+        """
+        with self._connect() as conn:
+            if last_created_at:
+                medias = conn.execute(
+                    "SELECT * FROM media WHERE user_id = ? AND created_at < ? ORDER BY created_at DESC LIMIT ?",
+                    (user_id, parse_history_cursor(last_created_at).isoformat(), count)
+                ).fetchall()
+            else:
+                medias = conn.execute(
+                    "SELECT * FROM media WHERE user_id = ? ORDER BY created_at DESC LIMIT ?", (user_id, count)
+                ).fetchall()
+            media_models = [MediaModel(**dict(m)) for m in medias]
+            columns = "*" if include_content else SUBTITLE_SUMMARY_COLUMNS
+            subtitles: dict[str, list[SubtitleModel]] = {}
+            media_ids = [media.id for media in media_models]
+            for i in range(0, len(media_ids), IN_QUERY_LIMIT):
+                chunk = media_ids[i:i + IN_QUERY_LIMIT]
+                rows = conn.execute(
+                    f"SELECT {columns} FROM subtitles WHERE media_id IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for row in rows:
+                    subtitle = self.subtitle_from_row(row)
+                    subtitles.setdefault(subtitle.media_id, []).append(subtitle)
+        return [MediaSubtitlesModel(media=media, subtitles=subtitles.get(media.id, [])) for media in media_models]
+
+    def acquire_generation_lock(self, media_id: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        takes the generation lock of the media in a transaction on the generation_locks table
+        :param media_id:
+        :param owner:
+        :param ttl_seconds:
+        :return:
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            lock = conn.execute("SELECT * FROM generation_locks WHERE media_id = ?", (media_id,)).fetchone()
+            if lock and lock["owner"] != owner and lock["expires_at"] > now:
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO generation_locks (media_id, owner, expires_at) VALUES (?, ?, ?)",
+                (media_id, owner, now + ttl_seconds)
+            )
+            return True
+
+    def release_generation_lock(self, media_id: str, owner: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM generation_locks WHERE media_id = ? AND owner = ?", (media_id, owner))
+
+    def get_cached_transcription(self, cache_key: str) -> Optional[TranscriptionCacheModel]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM transcription_cache WHERE id = ?", (cache_key,)).fetchone()
+        if row is not None:
+            return TranscriptionCacheModel(**dict(row))
+
+    def upsert_cached_transcription(self, entry: TranscriptionCacheModel) -> TranscriptionCacheModel:
+        row = _to_row(entry.dict())
+        with self._connect() as conn:
+            conn.execute(_upsert_statement("transcription_cache", row), row)
+        return entry
@@ -0,0 +1,45 @@
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+"""
+Storage codec of the subtitle content. The SRT body is compressed and the compressed body is split into chunks,
+so that a long transcript does not hit the size limit of a datastore document.
+"""
+
+ENCODING_ZLIB: str = "zlib"
+COMPRESSION_LEVEL: int = 6
+# the compressed bytes stored in a single document, well below the 1 MiB limit of a Firestore document
+CHUNK_BYTES: int = 512 * 1024
+
+
+@dataclass
+class EncodedContent:
+    encoding: str
+    chunks: list[bytes]
+    size: int
+
+
+def encode_content(content: str, chunk_bytes: int = CHUNK_BYTES) -> EncodedContent:
+    """
+    compresses the subtitle content and splits the compressed body into chunks of at most chunk_bytes
+    :param content:
+    :param chunk_bytes:
+    :return:
+    """
+    raw = content.encode("utf-8")
+    compressed = zlib.compress(raw, COMPRESSION_LEVEL)
+    chunks = [compressed[i:i + chunk_bytes] for i in range(0, len(compressed), chunk_bytes)] or [b""]
+    return EncodedContent(encoding=ENCODING_ZLIB, chunks=chunks, size=len(raw))
+
+
+def decode_content(encoding: Optional[str], chunks: list[bytes]) -> str:
+    """
+    joins the chunks and decompresses the subtitle content
+    :param encoding:
+    :param chunks:
+    :return:
+    """
+    if encoding != ENCODING_ZLIB:
+        raise ValueError(f"Unknown subtitle content encoding: {encoding}")
+    return zlib.decompress(b"".join(chunks)).decode("utf-8")
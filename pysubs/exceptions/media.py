@@ -6,9 +6,21 @@ class UnsupportedMediaDownloadError(Exception):
     """Raise when unsupported media download is attempted """
 
 
+class InvalidMediaUrlError(Exception):
+    """Raise when the url of the media cannot be parsed by its media manager"""
+
+
 class NotEnoughCreditsToPerformGenerationError(Exception):
     """Raise when enough credits are not available for user to perform subtitle generation"""
 
 
 class DecodingMediaDurationError(Exception):
     """Raise when probing media for finding duration results in error"""
+
+
+class UploadTooLargeError(Exception):
+    """Raise when the uploaded file is larger than the allowed size"""
+
+
+class ScratchQuotaExceededError(Exception):
+    """Raise when the files of a job do not fit in its scratch space quota or in the disk budget"""
@@ -1,2 +1,6 @@
 class UnspecifiedMediaSourceTypeError(Exception):
     """Raise when meda dataclass has unspecified media source type."""
+
+
+class InvalidDecodingProfileError(Exception):
+    """Raise when the requested decoding profile is not one of the known profiles"""
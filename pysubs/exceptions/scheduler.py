@@ -0,0 +1,9 @@
+class JobQueueFullError(Exception):
+    """Raise when the job queue is full and no more jobs can be accepted for now."""
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DecodingProfileConflictError(Exception):
+    """Raise when the media is already being generated with another decoding profile than the requested one"""
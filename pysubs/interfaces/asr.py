@@ -1,4 +1,5 @@
 from abc import ABCMeta, abstractmethod
+from typing import Optional
 
 from pysubs.utils.models import Media
 
@@ -8,10 +9,11 @@ class ASR(metaclass=ABCMeta):
     This class is an abstract class which has to be implemented by all audio speech recognition services
     """
     @abstractmethod
-    def process_audio(self, audio: Media) -> dict[str, list | dict]:
+    def process_audio(self, audio: Media, profile: Optional[str] = None) -> dict[str, list | dict]:
         """
         Process the audio by the speech transcriptor and returns a dict with all the required details
         :param audio:
+        :param profile: the name of the decoding profile, the configured profile is used when it is not given
         :return:
         """
         pass
@@ -2,13 +2,72 @@ from abc import ABCMeta, abstractmethod
 from datetime import datetime
 from typing import Optional
 
-from pysubs.dal.datastore_models import MediaModel, SubtitleModel, UserModel, MediaSubtitlesModel
+from pysubs.dal.datastore_models import MediaModel, SubtitleModel, UserModel, MediaSubtitlesModel, \
+    TranscriptionCacheModel
+
+
+class UnitOfWork(metaclass=ABCMeta):
+    """
+    Abstract class of a set of writes which are committed together, either all of them are applied or none.
+    Used as a context manager the writes are committed when the block exits without an error.
+    """
+    def __enter__(self) -> "UnitOfWork":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.commit()
+
+    @abstractmethod
+    def upsert_media(self, media: MediaModel) -> None:
+        """
+        adds the upsert of the media to the unit of work
+        :param media:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def upsert_subtitle(self, subtitle: SubtitleModel) -> None:
+        """
+        adds the upsert of the subtitle to the unit of work
+        :param subtitle:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def decrement_credits(self, user_id: str, amount: int) -> None:
+        """
+        adds the decrement of the credits of the user to the unit of work,
+        the decrement has to be applied atomically on the current credits of the user
+        :param user_id:
+        :param amount:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def commit(self) -> None:
+        """
+        applies all the writes of the unit of work at once
+        :return:
+        """
+        pass
 
 
 class Datastore(metaclass=ABCMeta):
     """
     Abstract class which has to be implemented by all data stores
     """
+    @abstractmethod
+    def unit_of_work(self) -> UnitOfWork:
+        """
+        starts a unit of work, so that the writes of a subtitle generation are committed together
+        :return:
+        """
+        pass
+
     @abstractmethod
     def upsert_media(self, media: MediaModel) -> MediaModel:
         """
@@ -64,19 +123,72 @@ class Datastore(metaclass=ABCMeta):
         """
         pass
 
+    @abstractmethod
+    def get_subtitle(self, subtitle_id: str) -> Optional[SubtitleModel]:
+        """
+        gets the subtitle with the given subtitle id
+        :param subtitle_id:
+        :return:
+        """
+        pass
+
     @abstractmethod
     def get_history_for_user(
             self,
             user_id: str,
-            last_created_at: Optional[datetime] = None,
-            count: int = 100
+            last_created_at: Optional[datetime | str] = None,
+            count: int = 100,
+            include_content: bool = True
     ) -> list[MediaSubtitlesModel]:
         """
         gets the history for a given user
-        can be paginated by using count and last created at
+        can be paginated by using count and last created at, given as a datetime or as its ISO 8601 text
+        the content of the subtitles is left out when include_content is False
         :param user_id:
         :param last_created_at:
         :param count:
+        :param include_content:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def acquire_generation_lock(self, media_id: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        takes the lock for generating the subtitles of the given media, so that only one process across
+        all the instances generates them. Returns False when another owner holds a lock which has not expired.
+        :param media_id:
+        :param owner:
+        :param ttl_seconds:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def release_generation_lock(self, media_id: str, owner: str) -> None:
+        """
+        releases the lock for generating the subtitles of the given media, when it is still held by the owner.
+        A lock which has expired and has been taken by another owner is left to that owner.
+        :param media_id:
+        :param owner:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def get_cached_transcription(self, cache_key: str) -> Optional[TranscriptionCacheModel]:
+        """
+        gets the cached transcription for the given content addressed cache key
+        :param cache_key:
+        :return:
+        """
+        pass
+
+    @abstractmethod
+    def upsert_cached_transcription(self, entry: TranscriptionCacheModel) -> TranscriptionCacheModel:
+        """
+        upserts the cached transcription
+        :param entry:
         :return:
         """
         pass
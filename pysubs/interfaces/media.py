@@ -76,7 +76,7 @@ class MediaManager(metaclass=ABCMeta):
     def convert(self, media: Media, to_type: MediaType) -> Media:
         """
         Media conversion has to be done here.
-        All video files will have to be converted to mp3 so that the ASR can process it.
+        All video files will have to be converted to pcm audio or mp3 so that the ASR can process it.
         :param media:
         :param to_type:
         :return:
@@ -1,24 +1,61 @@
+import asyncio
 import logging
 import re
-from fastapi import FastAPI, Request, Depends, HTTPException, UploadFile
+import threading
+from typing import AsyncIterator, Optional
+
+from fastapi import FastAPI, Request, Depends, HTTPException, UploadFile, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
-from pytube.exceptions import RegexMatchError
-from starlette_validation_uploadfile import ValidateUploadFileMiddleware
 
-from pysubs.dal.datastore_models import UserModel
-from pysubs.dal.firestore import FirestoreDatastore
-from pysubs.utils.auth import get_current_user
-from pysubs.utils.constants import LogConstants
+from pysubs.dal.datastore_models import UserModel, parse_history_cursor
+from pysubs.dal.factory import get_datastore
+from pysubs.dal.job_store import JobStatus
+from pysubs.exceptions.media import UploadTooLargeError, ScratchQuotaExceededError, InvalidMediaUrlError
+from pysubs.exceptions.models import InvalidDecodingProfileError
+from pysubs.exceptions.scheduler import JobQueueFullError, DecodingProfileConflictError
+from pysubs.utils import ffmpeg_utils
+from pysubs.utils.auth import get_current_user, get_current_user_for_events, get_token_cache, \
+    issue_stream_token
+from pysubs.utils.event_bus import JobEventBus, JobEventStatus
+from pysubs.utils.constants import LogConstants, EnvConstants
+from pysubs.utils.decoding import get_decoding_profile
+from pysubs.utils.executors import BlockingExecutors, ExecutorKind, run_blocking
+from pysubs.utils.model_registry import WhisperModelRegistry
 from pysubs.utils.settings import PySubsSettings
-from pysubs.utils.models import GeneralResponse, SubtitleResponse, HistoryResponse, GenerateResponse
+from pysubs.utils.scratch import ScratchSpace
+from pysubs.utils.single_flight import InFlightRegistry
+from pysubs.utils.models import GeneralResponse, SubtitleResponse, HistoryResponse, GenerateResponse, \
+    StreamTokenResponse
 from pysubs.utils.pysubs_manager import start_youtube_transcribe_worker, get_subtitle_generation_status, get_history, \
-    check_if_user_can_generate, start_video_file_transcribe_worker, get_yt_media_info
+    check_if_user_can_generate, start_video_file_transcribe_worker, get_yt_media_info, start_job_workers, \
+    get_job_scheduler, get_job_status, get_in_flight_media_id, get_subtitle_content, runs_job_workers, poll_job_event
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(LogConstants.LOGGER_NAME)
 PySubsSettings.instance()
-FirestoreDatastore.instance()
+
+
+class StripEventStreamQueryFilter(logging.Filter):
+    """
+    Strips the query string of the event stream requests from the access log,
+    so that the stream tokens of the clients which still pass them in the url are not logged
+    """
+    def filter(self, record: logging.LogRecord) -> bool:
+        # the arguments of the uvicorn access log are the client, the method, the path, the version and the status
+        if isinstance(record.args, tuple) and len(record.args) == 5 and isinstance(record.args[2], str) and \
+                record.args[2].startswith("/subtitle/events?"):
+            record.args = record.args[:2] + (record.args[2].split("?", 1)[0],) + record.args[3:]
+        return True
+
+
+logging.getLogger("uvicorn.access").addFilter(StripEventStreamQueryFilter())
+
+# a comment is sent on the idle event streams, so that the proxies do not close them
+SSE_KEEP_ALIVE_SECONDS: int = 15
+# the interval at which the event streams read the job store, when the jobs are run by the worker processes
+SSE_POLL_SECONDS: int = 1
 
 app = FastAPI()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -33,12 +70,51 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-# app.add_middleware(
-#     ValidateUploadFileMiddleware,
-#     app_path="/subtitles/videofile/generate",
-#     max_size=250000000,
-#     file_type=["video/mp4"]
-# )
+
+
+@app.middleware("http")
+async def reject_large_uploads(request: Request, call_next):
+    """
+    Rejects the uploads whose declared size is over the limit before the body is read,
+    the size of the uploads without a declared size is enforced while the upload is being copied
+    """
+    if request.url.path == "/subtitles/videofile/generate":
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and \
+                int(content_length) > int(PySubsSettings.get_config(EnvConstants.MAX_UPLOAD_BYTES)):
+            return JSONResponse(status_code=413, content={"detail": "The uploaded file is too large"})
+    return await call_next(request)
+
+
+@app.on_event("startup")
+def preload_whisper_models():
+    """
+    Warms up the model registry in the background, so that the first job does not pay for loading the weights
+    and the health check can answer while the models are being loaded.
+    The models are not loaded by an API process which does not run the workers.
+    """
+    if not runs_job_workers():
+        return
+    preload = PySubsSettings.get_config(EnvConstants.WHISPER_PRELOAD_MODELS) or ""
+    if names := [name.strip() for name in preload.split(",") if name.strip()]:
+        threading.Thread(target=WhisperModelRegistry.instance().preload, args=(names,), daemon=True).start()
+
+
+@app.on_event("startup")
+def resume_jobs():
+    """
+    Starts the job workers, the jobs left unfinished by a previous run are resumed by them
+    """
+    if runs_job_workers():
+        start_job_workers()
+
+
+@app.on_event("shutdown")
+def stop_executors():
+    """
+    Stops the executors of the blocking calls of the API handlers
+    """
+    BlockingExecutors.instance().shutdown()
 
 
 @app.get("/health")
@@ -46,6 +122,28 @@ async def root():
     return {"status": "OK"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    return await run_blocking(ExecutorKind.IO, collect_metrics)
+
+
+def collect_metrics() -> dict:
+    metrics = {
+        "models": WhisperModelRegistry.instance().stats(),
+        "jobs": get_job_scheduler().stats(),
+        "in_flight": InFlightRegistry.instance().stats(),
+        "probe_cache": ffmpeg_utils.probe_cache.stats(),
+        "token_cache": get_token_cache().stats(),
+        "scratch": ScratchSpace.instance().stats(),
+        "executors": BlockingExecutors.instance().stats(),
+        "events": JobEventBus.instance().stats(),
+    }
+    # only the Firestore datastore keeps the users in a cache, the SQLite reads do not leave the process
+    if user_cache := getattr(get_datastore(), "user_cache", None):
+        metrics["user_cache"] = user_cache.stats()
+    return metrics
+
+
 # @app.get("/upload")
 # async def upload_video() -> GeneralResponse:
 #     return GeneralResponse(status="OK")
@@ -73,25 +171,120 @@ async def get_status(
     json_data = await request.json()
     media_id = json_data.get("media_id")
     if verify_media_id(media_id):
-        media, subtitle = get_subtitle_generation_status(media_id=media_id)
-        if media and subtitle:
-            return SubtitleResponse(
-                status="OK",
-                subtitle_id=subtitle.id,
-                video_id=media.id,
-                video_url=media.media_url,
-                title=media.title,
-                video_length=media.duration,
-                thumbnail=media.thumbnail_url,
-                subtitle=subtitle.content,
-                created_at=subtitle.created_at
-            )
-        else:
-            return SubtitleResponse(status="pending")
+        return await run_blocking(ExecutorKind.IO, get_status_response, media_id=media_id)
     else:
         raise HTTPException(status_code=403, detail="Invalid Media ID")
 
 
+@app.post("/subtitle/events/token")
+async def create_stream_token(
+        request: Request,
+        user: UserModel = Depends(get_current_user)
+) -> StreamTokenResponse:
+    """
+    Issues the short lived token the event stream of the media is opened with,
+    as the browsers cannot set the authorization header of an event stream
+    """
+    json_data = await request.json()
+    media_id = json_data.get("media_id")
+    if not verify_media_id(media_id):
+        raise HTTPException(status_code=403, detail="Invalid Media ID")
+    return StreamTokenResponse(
+        status="OK",
+        stream_token=issue_stream_token(user_id=user.id, media_id=media_id),
+        expires_in=int(PySubsSettings.get_config(EnvConstants.STREAM_TOKEN_TTL_SECONDS))
+    )
+
+
+@app.get("/subtitle/events")
+async def stream_status_events(
+        media_id: str,
+        user: UserModel = Depends(get_current_user_for_events)
+) -> StreamingResponse:
+    """
+    Streams the stage transitions of the subtitle generation and the final subtitle as server sent events,
+    the stream ends with the final subtitle or the failure of the generation
+    """
+    if not verify_media_id(media_id):
+        raise HTTPException(status_code=403, detail="Invalid Media ID")
+    return StreamingResponse(
+        stream_job_events(media_id=media_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def stream_job_events(media_id: str) -> AsyncIterator[str]:
+    """
+    Pushes the events of the job from the event bus, the datastore is only read when the job has already finished
+    or when the final event does not carry the subtitle.
+    The jobs run by the worker processes do not publish to the event bus of this process,
+    their events are read from the job store instead.
+    :param media_id:
+    :return:
+    """
+    async with JobEventBus.instance().subscribe(media_id) as subscription:
+        job = await run_blocking(ExecutorKind.IO, get_job_status, media_id=media_id)
+        if job is None or job.status not in JobStatus.ACTIVE:
+            response = await run_blocking(ExecutorKind.IO, get_status_response, media_id=media_id)
+            yield format_server_sent_event(response)
+            return
+        yield format_server_sent_event(SubtitleResponse(status=JobEventStatus.PENDING, stage=job.stage))
+        stage = job.stage
+        poll_seconds = SSE_KEEP_ALIVE_SECONDS if runs_job_workers() else SSE_POLL_SECONDS
+        idle_seconds = 0
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=poll_seconds)
+            except asyncio.TimeoutError:
+                event = await run_blocking(ExecutorKind.IO, poll_job_event, job_id=media_id, stage=stage)
+            if event is None:
+                idle_seconds += poll_seconds
+                if idle_seconds >= SSE_KEEP_ALIVE_SECONDS:
+                    idle_seconds = 0
+                    yield ": keep-alive\n\n"
+                continue
+            idle_seconds = 0
+            stage = event.stage or stage
+            if event.status == JobEventStatus.OK and not event.data:
+                yield format_server_sent_event(
+                    await run_blocking(ExecutorKind.IO, get_status_response, media_id=media_id)
+                )
+            else:
+                yield format_server_sent_event(SubtitleResponse(status=event.status, stage=event.stage, **event.data))
+            if event.final:
+                return
+
+
+def format_server_sent_event(response: SubtitleResponse) -> str:
+    return f"event: {response.status}\ndata: {response.json(exclude_none=True)}\n\n"
+
+
+def get_status_response(media_id: str) -> SubtitleResponse:
+    """
+    Reads the subtitle of the media from the datastore, or the state of its job while it is being generated
+    :param media_id:
+    :return:
+    """
+    media, subtitle = get_subtitle_generation_status(media_id=media_id)
+    if media and subtitle:
+        return SubtitleResponse(
+            status="OK",
+            subtitle_id=subtitle.id,
+            video_id=media.id,
+            video_url=media.media_url,
+            title=media.title,
+            video_length=media.duration,
+            thumbnail=media.thumbnail_url,
+            subtitle=subtitle.content,
+            created_at=subtitle.created_at
+        )
+    job = get_job_status(media_id=media_id)
+    if job and job.status == JobStatus.FAILED:
+        return SubtitleResponse(status="failed", stage=job.stage)
+    return SubtitleResponse(status="pending", stage=job.stage if job else None)
+
+
 @app.post("/subtitles/yt/generate")
 async def generate_subtitles_for_youtube(
         request: Request,
@@ -99,10 +292,23 @@ async def generate_subtitles_for_youtube(
 ) -> GenerateResponse:
     json_data = await request.json()
     video_url = json_data.get("video_url")
+    decoding_profile = verify_decoding_profile(json_data.get("decoding_profile"))
     if video_url and verify_url(video_url):
         try:
-            video_info = get_yt_media_info(video_url=video_url, user=user)
-        except RegexMatchError:
+            # the media of the url is created with pytube and the job is read from the job store
+            if media_id := await run_blocking(
+                    ExecutorKind.YOUTUBE,
+                    get_in_flight_media_id,
+                    video_url=video_url,
+                    user=user,
+                    decoding_profile=decoding_profile
+            ):
+                return GenerateResponse(status="OK", media_id=media_id)
+        except DecodingProfileConflictError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        try:
+            video_info = await run_blocking(ExecutorKind.YOUTUBE, get_yt_media_info, video_url=video_url, user=user)
+        except InvalidMediaUrlError:
             raise HTTPException(status_code=403, detail="Invalid YouTube video url")
         if not check_if_user_can_generate(video_info, user):
             raise HTTPException(status_code=403, detail="Not enough credits to perform generation")
@@ -110,7 +316,18 @@ async def generate_subtitles_for_youtube(
             raise HTTPException(
                 status_code=403, detail="Videos with more than 10 minutes of length is not supported at the moment."
             )
-        media_id = start_youtube_transcribe_worker(video_url=video_url, user=user)
+        try:
+            media_id = await run_blocking(
+                ExecutorKind.IO,
+                start_youtube_transcribe_worker,
+                video_url=video_url,
+                user=user,
+                decoding_profile=decoding_profile
+            )
+        except JobQueueFullError as e:
+            raise queue_full_exception(e)
+        except DecodingProfileConflictError as e:
+            raise HTTPException(status_code=409, detail=str(e))
         return GenerateResponse(status="OK", media_id=media_id)
     else:
         raise HTTPException(status_code=403, detail="Invalid URL")
@@ -123,12 +340,48 @@ async def get_media_and_subtitles_history(
 ) -> HistoryResponse:
     json_data = await request.json()
     last_created_at = json_data.get("last_created_at")
+    if last_created_at is not None:
+        try:
+            last_created_at = parse_history_cursor(last_created_at)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=403, detail="Invalid last_created_at")
     if count := json_data.get("count"):
         count = int(count)
-    subtitles = get_history(last_created_at=last_created_at, count=count, user=user)
+    # only a JSON boolean is accepted, bool() would take the strings "false" and "0" for true
+    if not isinstance(summary := json_data.get("summary", False), bool):
+        raise HTTPException(status_code=403, detail="Invalid summary")
+    subtitles = await run_blocking(
+        ExecutorKind.IO, get_history, last_created_at=last_created_at, count=count, user=user, summary=summary
+    )
     return HistoryResponse(status="OK", subtitles=subtitles)
 
 
+@app.post("/subtitle/content")
+async def get_subtitle_content_for_history(
+        request: Request,
+        user: UserModel = Depends(get_current_user)
+) -> SubtitleResponse:
+    json_data = await request.json()
+    subtitle_id = json_data.get("subtitle_id")
+    if subtitle_id and verify_media_id(subtitle_id):
+        media, subtitle = await run_blocking(ExecutorKind.IO, get_subtitle_content, subtitle_id=subtitle_id, user=user)
+        if media and subtitle:
+            return SubtitleResponse(
+                status="OK",
+                subtitle_id=subtitle.id,
+                video_id=media.id,
+                video_url=media.media_url,
+                title=media.title,
+                video_length=media.duration,
+                thumbnail=media.thumbnail_url,
+                subtitle=subtitle.content,
+                created_at=subtitle.created_at
+            )
+        raise HTTPException(status_code=404, detail="Subtitle not found")
+    else:
+        raise HTTPException(status_code=403, detail="Invalid Subtitle ID")
+
+
 @app.get("/get_user_info")
 async def get_user_details(
         _: Request,
@@ -140,12 +393,35 @@ async def get_user_details(
 @app.post("/subtitles/videofile/generate")
 async def upload_file_and_generate_subtitles(
         file: UploadFile,
+        decoding_profile: Optional[str] = Form(None),
         user: UserModel = Depends(get_current_user)
 ) -> GenerateResponse:
-    media_id = start_video_file_transcribe_worker(file=file, user=user)
+    decoding_profile = verify_decoding_profile(decoding_profile)
+    try:
+        media_id = await run_blocking(
+            ExecutorKind.MEDIA,
+            start_video_file_transcribe_worker,
+            file=file,
+            user=user,
+            decoding_profile=decoding_profile
+        )
+    except JobQueueFullError as e:
+        raise queue_full_exception(e)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ScratchQuotaExceededError as e:
+        raise HTTPException(status_code=507, detail=str(e))
     return GenerateResponse(status="OK", media_id=media_id)
 
 
+def queue_full_exception(error: JobQueueFullError) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Too many subtitle generations are in progress, please try again later.",
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
 def verify_url(url: str):
     regex = ("((http|https)://)(www.)?" +
              "[a-zA-Z0-9@:%._\\+~#?&//=]" +
@@ -156,6 +432,18 @@ def verify_url(url: str):
     return re.search(p, url)
 
 
+def verify_decoding_profile(decoding_profile: Optional[str]) -> str:
+    """
+    Resolves the decoding profile requested for the generation, the configured profile is used when none is requested
+    :param decoding_profile:
+    :return:
+    """
+    try:
+        return get_decoding_profile(decoding_profile).name
+    except InvalidDecodingProfileError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+
 def verify_media_id(media_id: str):
     regex = r"[A-Fa-f0-9]{64}$"
     p = re.compile(regex)
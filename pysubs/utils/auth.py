@@ -1,11 +1,20 @@
+import hashlib
 import logging
-import firebase_admin.auth
-from fastapi import Depends
+import secrets
+import threading
+import time
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query
 from fastapi.security import OAuth2PasswordBearer
 
 from pysubs.dal.datastore_models import UserModel
-from pysubs.dal.firestore import FirestoreDatastore
-from pysubs.utils.constants import LogConstants
+from pysubs.dal.factory import get_datastore
+from pysubs.utils.cache import LRUCache
+from pysubs.utils.constants import LogConstants, EnvConstants
+from pysubs.utils.executors import run_blocking, ExecutorKind
+from pysubs.utils.firebase import get_firebase_app
+from pysubs.utils.settings import PySubsSettings
 
 """
 Uses the bearer token to authenticate all the requests to the API endpoints
@@ -13,29 +22,132 @@ Uses the bearer token to authenticate all the requests to the API endpoints
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 logger = logging.getLogger(LogConstants.LOGGER_NAME)
+# The caches are created on their first use, as their size is read from the settings which load the .env file
+_token_caches: dict[str, LRUCache] = {}
+_token_caches_lock = threading.Lock()
+
+
+def _get_token_cache(name: str) -> LRUCache:
+    if (cache := _token_caches.get(name)) is None:
+        with _token_caches_lock:
+            if (cache := _token_caches.get(name)) is None:
+                PySubsSettings.instance()
+                cache = _token_caches[name] = LRUCache(
+                    maxsize=int(PySubsSettings.get_config(EnvConstants.TOKEN_CACHE_SIZE))
+                )
+    return cache
+
+
+def get_token_cache() -> LRUCache:
+    """
+    The claims of the verified tokens keyed by the hash of the token, every entry expires with its token
+    :return:
+    """
+    return _get_token_cache("id_tokens")
+
+
+def get_stream_token_cache() -> LRUCache:
+    """
+    The short lived tokens of the event streams, every token maps to the user and the media it was issued for
+    :return:
+    """
+    return _get_token_cache("stream_tokens")
 
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserModel:
     """
-    Gets the token and gets the corresponding user from firebase
+    Gets the token and gets the corresponding user from firebase,
+    the verification of the token and the datastore read run on the io executor
+    :param token:
+    :return:
+    """
+    return await run_blocking(ExecutorKind.IO, get_user_for_token, token)
+
+
+async def get_current_user_for_events(
+        media_id: str,
+        token: Optional[str] = Depends(optional_oauth2_scheme),
+        stream_token: Optional[str] = Query(None)
+) -> UserModel:
+    """
+    Gets the user from the bearer token or from the stream_token query parameter,
+    as the browsers cannot set the authorization header of an event stream.
+    The id token is never accepted in the query string, which ends up in the access logs of the proxies,
+    the stream token is issued by issue_stream_token and is only valid for the events of one media for a short time
+    :param media_id:
+    :param token:
+    :param stream_token:
+    :return:
+    """
+    if token:
+        return await run_blocking(ExecutorKind.IO, get_user_for_token, token)
+    if stream_token and (user_id := redeem_stream_token(stream_token, media_id)) is not None:
+        return await run_blocking(ExecutorKind.IO, get_datastore().get_user, user_id=user_id)
+    raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+
+
+def issue_stream_token(user_id: str, media_id: str) -> str:
+    """
+    Issues a random token which authenticates the user on the event stream of the media
+    for STREAM_TOKEN_TTL_SECONDS
+    :param user_id:
+    :param media_id:
+    :return:
+    """
+    stream_token = secrets.token_urlsafe(32)
+    get_stream_token_cache().put(
+        hashlib.sha256(stream_token.encode("utf-8")).hexdigest(),
+        (user_id, media_id),
+        ttl_seconds=float(PySubsSettings.get_config(EnvConstants.STREAM_TOKEN_TTL_SECONDS))
+    )
+    return stream_token
+
+
+def redeem_stream_token(stream_token: str, media_id: str) -> Optional[str]:
+    """
+    Gets the id of the user the stream token was issued to,
+    or None when the token has expired or was issued for another media
+    :param stream_token:
+    :param media_id:
+    :return:
+    """
+    issued = get_stream_token_cache().get(hashlib.sha256(stream_token.encode("utf-8")).hexdigest())
+    if issued is None or issued[1] != media_id:
+        return None
+    return issued[0]
+
+
+def get_user_for_token(token: str) -> UserModel:
+    """
+    Decodes the token and reads the user it belongs to from the datastore
     :param token:
     :return:
     """
     user = decode_token(token)
     user_id = user.get("user_id")
-    ds_user = FirestoreDatastore.instance().get_user(user_id=user_id)
+    ds_user = get_datastore().get_user(user_id=user_id)
     return ds_user
 
 
 def decode_token(token: str) -> dict:
     """
-    Takes the token, decodes it and verifies the user account belonging to the token
+    Takes the token, decodes it and verifies the user account belonging to the token.
+    The claims of a verified token are cached until the token expires,
+    so the repeated requests with the same token are not verified again.
     :param token:
     :return:
     """
+    cache_key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    if (user := get_token_cache().get(cache_key)) is not None:
+        return user
+    import firebase_admin.auth
+    get_firebase_app()
     try:
         user = firebase_admin.auth.verify_id_token(token)
+        if (ttl_seconds := user.get("exp", 0) - time.time()) > 0:
+            get_token_cache().put(cache_key, user, ttl_seconds=ttl_seconds)
         return user
     except (ValueError, firebase_admin.auth.InvalidIdTokenError) as e:
         logger.error(f"Invalid token received as part of the request. Error: {e}")
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    A thread safe in memory cache which keeps the most recently used entries up to the given size.
+    The entries expire after ttl_seconds when it is given.
+    The on_evict function is called with the key and the value of every entry which leaves the cache.
+    """
+    def __init__(
+            self,
+            maxsize: int,
+            ttl_seconds: Optional[float] = None,
+            on_evict: Optional[Callable[[Hashable, Any], None]] = None
+    ):
+        """
+        Initializing the cache
+        :param maxsize:
+        :param ttl_seconds:
+        :param on_evict:
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, tuple[Any, Optional[float]]] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the cached value of the key, or the default when it is not cached or has expired
+        :param key:
+        :param default:
+        :return:
+        """
+        with self._lock:
+            value, expires_at = self._entries.get(key, (_MISSING, None))
+            if value is not _MISSING and (expires_at is None or expires_at > time.monotonic()):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return value
+            self._misses += 1
+            if value is not _MISSING:
+                del self._entries[key]
+        if value is not _MISSING:
+            self._evicted(key, value)
+        return default
+
+    def put(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Caches the value of the key, evicting the least recently used entries over the size of the cache
+        :param key:
+        :param value:
+        :param ttl_seconds: overrides the ttl of the cache for this entry
+        :return:
+        """
+        ttl_seconds = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds is not None else None
+        evicted = []
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                evicted.append(self._entries.popitem(last=False))
+        for evicted_key, (evicted_value, _) in evicted:
+            self._evicted(evicted_key, evicted_value)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            value, _ = self._entries.pop(key, (_MISSING, None))
+        if value is not _MISSING:
+            self._evicted(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = list(self._entries.items())
+            self._entries.clear()
+        for key, (value, _) in entries:
+            self._evicted(key, value)
+
+    def _evicted(self, key: Hashable, value: Any) -> None:
+        if self.on_evict:
+            self.on_evict(key, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
@@ -0,0 +1,230 @@
+import logging
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import numpy as np
+
+from pysubs.utils.constants import EnvConstants, LogConstants
+from pysubs.utils.settings import PySubsSettings
+
+logger = logging.getLogger(LogConstants.LOGGER_NAME)
+
+SAMPLE_RATE: int = 16000
+FRAME_SECONDS: float = 0.03
+
+
+@dataclass
+class AudioChunk:
+    """
+    A slice of the decoded audio. The core range is the part of the audio this chunk is responsible for,
+    the padded range adds the overlap on both sides so that words at the boundaries are not cut.
+    """
+    index: int
+    core_start: int
+    core_end: int
+    pad_start: int
+    pad_end: int
+
+
+def find_split_points(
+        audio: np.ndarray,
+        chunk_seconds: float,
+        search_seconds: float,
+        sample_rate: int = SAMPLE_RATE
+) -> list[int]:
+    """
+    Finds the sample offsets at which the audio can be split, each split point is the quietest frame
+    within `search_seconds` of the targeted chunk length
+    :param audio:
+    :param chunk_seconds:
+    :param search_seconds:
+    :param sample_rate:
+    :return:
+    """
+    frame = int(FRAME_SECONDS * sample_rate)
+    frames = len(audio) // frame
+    if frames == 0:
+        return []
+    energy = np.sqrt(np.mean(np.square(audio[:frames * frame].reshape(frames, frame)), axis=1))
+    chunk_frames = int(chunk_seconds * sample_rate) // frame
+    search_frames = int(search_seconds * sample_rate) // frame
+    split_points: list[int] = []
+    last = 0
+    while frames - last > chunk_frames + search_frames:
+        target = last + chunk_frames
+        low = max(last + 1, target - search_frames)
+        high = min(frames, target + search_frames + 1)
+        quietest = low + int(np.argmin(energy[low:high]))
+        split_points.append(quietest * frame + frame // 2)
+        last = quietest
+    return split_points
+
+
+def split_audio(
+        audio: np.ndarray,
+        chunk_seconds: float,
+        overlap_seconds: float,
+        sample_rate: int = SAMPLE_RATE
+) -> list[AudioChunk]:
+    """
+    Splits the audio at silence boundaries into chunks of about `chunk_seconds` with `overlap_seconds` of padding
+    :param audio:
+    :param chunk_seconds:
+    :param overlap_seconds:
+    :param sample_rate:
+    :return:
+    """
+    search_seconds = min(chunk_seconds / 4, 10.0)
+    boundaries = [0] + find_split_points(audio, chunk_seconds, search_seconds, sample_rate) + [len(audio)]
+    overlap = int(overlap_seconds * sample_rate)
+    return [
+        AudioChunk(
+            index=index,
+            core_start=start,
+            core_end=end,
+            pad_start=max(0, start - overlap),
+            pad_end=min(len(audio), end + overlap)
+        ) for index, (start, end) in enumerate(zip(boundaries, boundaries[1:]))
+    ]
+
+
+def stitch_segments(chunk_results: list[tuple[AudioChunk, dict]], sample_rate: int = SAMPLE_RATE) -> dict:
+    """
+    Stitches the results of the chunks back together. The timestamps are shifted by the offset of the chunk,
+    segments are kept only by the chunk whose core range contains their midpoint and repeated overlap
+    segments are dropped.
+    :param chunk_results:
+    :param sample_rate:
+    :return:
+    """
+    segments: list[dict] = []
+    language_durations: Counter = Counter()
+    for chunk, result in sorted(chunk_results, key=lambda item: item[0].index):
+        offset = chunk.pad_start / sample_rate
+        core_start = chunk.core_start / sample_rate
+        core_end = chunk.core_end / sample_rate
+        for segment in result.get("segments", []):
+            start = segment["start"] + offset
+            end = segment["end"] + offset
+            if not core_start <= (start + end) / 2 < core_end:
+                continue
+            text = segment["text"]
+            if segments and segments[-1]["text"].strip() == text.strip() and start < segments[-1]["end"]:
+                continue
+            segments.append({**segment, "id": len(segments), "start": start, "end": end, "text": text})
+        if result.get("language"):
+            language_durations[result["language"]] += core_end - core_start
+    language = language_durations.most_common(1)[0][0] if language_durations else None
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": language,
+    }
+
+
+def transcribe_chunk(model_name: str, audio: np.ndarray, options: dict) -> dict:
+    """
+    Transcribes a single chunk, this runs inside the worker processes of the pool
+    :param model_name:
+    :param audio:
+    :param options:
+    :return:
+    """
+    from pysubs.utils.model_registry import WhisperModelRegistry
+    with WhisperModelRegistry.instance().use_model(model_name) as model:
+        result = model.transcribe(audio, **options)
+    return {
+        "segments": [
+            {key: segment[key] for key in ("id", "start", "end", "text") if key in segment}
+            for segment in result["segments"]
+        ],
+        "language": result.get("language"),
+    }
+
+
+def _initialize_worker(model_name: str, threads: int) -> None:
+    """
+    Loads the model once per worker process and splits the cores between the workers
+    :param model_name:
+    :param threads:
+    :return:
+    """
+    import torch
+    from pysubs.utils.model_registry import WhisperModelRegistry
+    torch.set_num_threads(threads)
+    WhisperModelRegistry.instance().get_model(model_name)
+
+
+class ChunkedTranscriptionPool:
+    """
+    A singleton process pool which transcribes the chunks of the audio in parallel.
+    The worker processes are started once and keep their model loaded between the jobs.
+    """
+    __singleton_instance = None
+    __singleton_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "ChunkedTranscriptionPool":
+        if not cls.__singleton_instance:
+            with cls.__singleton_lock:
+                if not cls.__singleton_instance:
+                    cls.__singleton_instance = cls(
+                        workers=int(PySubsSettings.get_config(EnvConstants.WHISPER_CHUNKED_WORKERS)),
+                        chunk_seconds=float(PySubsSettings.get_config(EnvConstants.WHISPER_CHUNK_SECONDS)),
+                        overlap_seconds=float(PySubsSettings.get_config(EnvConstants.WHISPER_CHUNK_OVERLAP_SECONDS)),
+                    )
+        return cls.__singleton_instance
+
+    def __init__(self, workers: int, chunk_seconds: float, overlap_seconds: float):
+        self.workers = workers
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
+        self._executors: dict[str, ProcessPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 1
+
+    def should_chunk(self, audio: np.ndarray) -> bool:
+        return self.enabled and len(audio) > self.chunk_seconds * SAMPLE_RATE
+
+    def transcribe(self, model_name: str, audio: np.ndarray, options: Optional[dict] = None) -> dict[str, Any]:
+        """
+        Splits the audio and transcribes the chunks in parallel, the result has the same shape as the
+        result of whisper's transcribe
+        :param model_name:
+        :param audio:
+        :param options:
+        :return:
+        """
+        chunks = split_audio(audio, self.chunk_seconds, self.overlap_seconds)
+        logger.info(f"Transcribing {len(chunks)} chunks in parallel on {self.workers} processes")
+        executor = self._get_executor(model_name)
+        futures = [
+            (chunk, executor.submit(transcribe_chunk, model_name, audio[chunk.pad_start:chunk.pad_end], options or {}))
+            for chunk in chunks
+        ]
+        return stitch_segments([(chunk, future.result()) for chunk, future in futures])
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for executor in self._executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+            self._executors.clear()
+
+    def _get_executor(self, model_name: str) -> ProcessPoolExecutor:
+        with self._lock:
+            if model_name not in self._executors:
+                self._executors[model_name] = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_initialize_worker,
+                    initargs=(model_name, max(1, (os.cpu_count() or 1) // self.workers)),
+                )
+            return self._executors[model_name]
@@ -8,6 +8,66 @@ class EnvConstants:
     YOUTUBE = "YouTube"
     VIDEO_MANAGER = "VIDEO_MANAGER"
     AWS_S3_BUCKET = "AWS_S3_BUCKET"
+    WHISPER_MODEL = "WHISPER_MODEL"
+    WHISPER_PRELOAD_MODELS = "WHISPER_PRELOAD_MODELS"
+    WHISPER_MODEL_MEMORY_BUDGET_MB = "WHISPER_MODEL_MEMORY_BUDGET_MB"
+    WHISPER_CHUNKED_WORKERS = "WHISPER_CHUNKED_WORKERS"
+    WHISPER_CHUNK_SECONDS = "WHISPER_CHUNK_SECONDS"
+    WHISPER_CHUNK_OVERLAP_SECONDS = "WHISPER_CHUNK_OVERLAP_SECONDS"
+    AUDIO_FORMAT = "AUDIO_FORMAT"
+    YOUTUBE_MIN_AUDIO_BITRATE_KBPS = "YOUTUBE_MIN_AUDIO_BITRATE_KBPS"
+    WORKER_COUNT = "WORKER_COUNT"
+    JOB_QUEUE_SIZE = "JOB_QUEUE_SIZE"
+    JOB_RETRY_AFTER_SECONDS = "JOB_RETRY_AFTER_SECONDS"
+    JOB_STORE_PATH = "JOB_STORE_PATH"
+    JOB_MAX_ATTEMPTS = "JOB_MAX_ATTEMPTS"
+    JOB_RETRY_BASE_SECONDS = "JOB_RETRY_BASE_SECONDS"
+    JOB_LEASE_SECONDS = "JOB_LEASE_SECONDS"
+    GENERATION_LOCK_SECONDS = "GENERATION_LOCK_SECONDS"
+    MAX_UPLOAD_BYTES = "MAX_UPLOAD_BYTES"
+    SCRATCH_DIR = "SCRATCH_DIR"
+    SCRATCH_WORKSPACE_QUOTA_BYTES = "SCRATCH_WORKSPACE_QUOTA_BYTES"
+    SCRATCH_BUDGET_BYTES = "SCRATCH_BUDGET_BYTES"
+    SCRATCH_GRACE_SECONDS = "SCRATCH_GRACE_SECONDS"
+    API_IO_WORKERS = "API_IO_WORKERS"
+    TOKEN_CACHE_SIZE = "TOKEN_CACHE_SIZE"
+    STREAM_TOKEN_TTL_SECONDS = "STREAM_TOKEN_TTL_SECONDS"
+    USER_CACHE_SIZE = "USER_CACHE_SIZE"
+    USER_CACHE_TTL_SECONDS = "USER_CACHE_TTL_SECONDS"
+    USER_WATCH_LIMIT = "USER_WATCH_LIMIT"
+    API_YOUTUBE_WORKERS = "API_YOUTUBE_WORKERS"
+    API_MEDIA_WORKERS = "API_MEDIA_WORKERS"
+    DATASTORE_BACKEND = "DATASTORE_BACKEND"
+    SQLITE_DATASTORE_PATH = "SQLITE_DATASTORE_PATH"
+    PROCESS_ROLE = "PROCESS_ROLE"
+    WORKER_PROCESSES = "WORKER_PROCESSES"
+    WHISPER_QUANTIZATION = "WHISPER_QUANTIZATION"
+    WHISPER_QUANTIZED_CACHE_DIR = "WHISPER_QUANTIZED_CACHE_DIR"
+    DECODING_PROFILE = "DECODING_PROFILE"
+    WHISPER_FAST_MODEL = "WHISPER_FAST_MODEL"
+    WHISPER_ACCURATE_MODEL = "WHISPER_ACCURATE_MODEL"
+
+
+class DatastoreBackend:
+    FIRESTORE = "firestore"
+    SQLITE = "sqlite"
+
+
+class ProcessRole:
+    # the API runs the job workers in process, which keeps the whole service runnable as a single process
+    ALL = "all"
+    # the API only queues the jobs and reads their status, the jobs are run by `python -m pysubs.worker`
+    API = "api"
+    WORKER = "worker"
+
+
+class DecodingProfileName:
+    # greedy decoding with a smaller model and without the temperature fallback
+    FAST = "fast"
+    # the whisper defaults with the configured WHISPER_MODEL
+    BALANCED = "balanced"
+    # beam search with a larger model
+    ACCURATE = "accurate"
 
 
 class LogConstants:
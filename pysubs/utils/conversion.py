@@ -1,27 +1,42 @@
 import base64
 import os
-import tempfile
 import uuid
 
 from pysubs.exceptions.media import UnsupportedMediaConversionError
-from pysubs.utils.ffmpeg_utils import ffmpeg_convert
+from pysubs.utils.ffmpeg_utils import ffmpeg_convert, decode_to_pcm, get_pcm_sidecar_path, load_pcm
 from pysubs.utils.models import ConvertedFile, Media, MediaType
 
 
 def convert_to_mp3(media: Media) -> ConvertedFile:
     """
-    Conversion utility function to take the media object and convert the video to mp3 using ffmpeg
+    Conversion utility function to take the media object and convert the video to mp3 using ffmpeg,
+    the mp3 is written next to the video, so that it is removed with the workspace of the media
     :param media:
     :return:
     """
     if media.file_type != MediaType.MP4:
         raise UnsupportedMediaConversionError(f"Unsupported file type conversion tried. {media.file_type}")
     mp3_filename = f"{str(uuid.uuid4())}.mp3"
-    temp_audio_filepath = os.path.join(tempfile.gettempdir(), mp3_filename)
+    temp_audio_filepath = os.path.join(os.path.dirname(media.local_storage_path), mp3_filename)
     ffmpeg_convert(source=media.local_storage_path, dest=temp_audio_filepath, codec="mp3")
     return ConvertedFile(local_storage_path=temp_audio_filepath)
 
 
+def convert_to_pcm(media: Media) -> ConvertedFile:
+    """
+    Conversion utility function to take the media object and decode the audio of the video to 16 kHz mono pcm
+    in memory using ffmpeg, without writing an intermediate audio file.
+    When the audio has already been decoded while analysing the media, it is mapped from the disk instead.
+    :param media:
+    :return:
+    """
+    if media.file_type != MediaType.MP4:
+        raise UnsupportedMediaConversionError(f"Unsupported file type conversion tried. {media.file_type}")
+    if media.local_storage_path and os.path.exists(pcm_path := get_pcm_sidecar_path(media.local_storage_path)):
+        return ConvertedFile(pcm=load_pcm(pcm_path))
+    return ConvertedFile(pcm=decode_to_pcm(source=media.local_storage_path))
+
+
 def get_base64_src_for_image(image_filepath: str) -> str:
     """
     Get the image file path, encodes to base64, and adds the url scheme
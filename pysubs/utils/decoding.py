@@ -0,0 +1,71 @@
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from pysubs.exceptions.models import InvalidDecodingProfileError
+from pysubs.utils.constants import EnvConstants, DecodingProfileName
+from pysubs.utils.settings import PySubsSettings
+
+"""
+The decoding profiles trade the accuracy of the transcription for its latency, a profile picks the whisper model
+and the decoding options the model is run with. The profile is chosen per job, the configured DECODING_PROFILE
+is used for the jobs which do not choose one.
+"""
+
+
+@dataclass(frozen=True)
+class DecodingProfile:
+    name: str
+    # the setting holding the name of the whisper model of the profile
+    model_setting: str
+    # the keyword arguments of whisper's transcribe
+    options: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def model_name(self) -> str:
+        return PySubsSettings.get_config(self.model_setting)
+
+
+DECODING_PROFILES: dict[str, DecodingProfile] = {
+    DecodingProfileName.FAST: DecodingProfile(
+        name=DecodingProfileName.FAST,
+        model_setting=EnvConstants.WHISPER_FAST_MODEL,
+        # a single greedy pass, the segments are not re-decoded at higher temperatures when they look wrong
+        # and the previous text is not fed back as the prompt, which also keeps the model out of repetition loops.
+        # The model runs in fp32 as the workers run on the CPU, which does not support fp16,
+        # instead of whisper warning and falling back to fp32 on every call
+        options={"temperature": 0.0, "condition_on_previous_text": False, "fp16": False},
+    ),
+    DecodingProfileName.BALANCED: DecodingProfile(
+        name=DecodingProfileName.BALANCED,
+        model_setting=EnvConstants.WHISPER_MODEL,
+    ),
+    DecodingProfileName.ACCURATE: DecodingProfile(
+        name=DecodingProfileName.ACCURATE,
+        model_setting=EnvConstants.WHISPER_ACCURATE_MODEL,
+        # beam search on the first pass and the best of the sampled candidates on the fallback passes
+        options={"beam_size": 5, "best_of": 5},
+    ),
+}
+
+
+def get_profile_model_names() -> list[str]:
+    """
+    Gets the names of the whisper models of all the decoding profiles
+    :return:
+    """
+    return list(dict.fromkeys(profile.model_name for profile in DECODING_PROFILES.values()))
+
+
+def get_decoding_profile(name: Optional[str] = None) -> DecodingProfile:
+    """
+    Gets the decoding profile with the given name, or the configured profile when the name is not given,
+    raises InvalidDecodingProfileError for the unknown names
+    :param name:
+    :return:
+    """
+    name = name or PySubsSettings.get_config(EnvConstants.DECODING_PROFILE)
+    if (profile := DECODING_PROFILES.get(name.lower())) is None:
+        raise InvalidDecodingProfileError(
+            f"Unknown decoding profile: {name}, the profiles are: {', '.join(DECODING_PROFILES)}"
+        )
+    return profile
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from pysubs.utils.constants import LogConstants
+
+logger = logging.getLogger(LogConstants.LOGGER_NAME)
+
+
+class JobEventStatus:
+    PENDING = "pending"
+    OK = "OK"
+    FAILED = "failed"
+
+
+@dataclass
+class JobEvent:
+    job_id: str
+    status: str
+    stage: Optional[str] = None
+    data: dict = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def final(self) -> bool:
+        return self.status != JobEventStatus.PENDING
+
+
+class JobSubscription:
+    """
+    The events of a job delivered to an async consumer, the events are published from the worker threads
+    and handed over to the event loop of the consumer
+    """
+    def __init__(self, bus: "JobEventBus", job_id: str, loop: asyncio.AbstractEventLoop):
+        self.bus = bus
+        self.job_id = job_id
+        self.loop = loop
+        self.queue: asyncio.Queue[JobEvent] = asyncio.Queue()
+
+    async def __aenter__(self) -> "JobSubscription":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.bus.unsubscribe(self)
+
+    async def get(self) -> JobEvent:
+        return await self.queue.get()
+
+    def deliver(self, event: JobEvent) -> None:
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+
+class JobEventBus:
+    """
+    An in process publish subscribe bus of the stage transitions and the outcome of the jobs.
+    The workers publish the events of a job and the clients waiting for the job are pushed the events,
+    so the waiting clients do not read the datastore until the job has finished.
+    All should access this class using the JobEventBus.instance() method.
+    """
+    __singleton_instance = None
+    __singleton_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "JobEventBus":
+        if not cls.__singleton_instance:
+            with cls.__singleton_lock:
+                if not cls.__singleton_instance:
+                    cls.__singleton_instance = cls()
+        return cls.__singleton_instance
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: dict[str, list[JobSubscription]] = {}
+        self._published = 0
+        self._delivered = 0
+
+    def subscribe(self, job_id: str) -> JobSubscription:
+        """
+        Subscribes the running event loop to the events of the job, use the subscription as an async context manager
+        so that it is removed once the consumer is gone
+        :param job_id:
+        :return:
+        """
+        subscription = JobSubscription(bus=self, job_id=job_id, loop=asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.setdefault(job_id, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: JobSubscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.job_id, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.job_id, None)
+
+    def publish(self, event: JobEvent) -> None:
+        """
+        Pushes the event to the subscribers of its job, this can be called from any thread
+        :param event:
+        :return:
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(event.job_id, []))
+            self._published += 1
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(event)
+            except RuntimeError as e:
+                # the event loop of the subscriber has been closed
+                logger.warning(f"Dropping the event of the job: {event.job_id}, error: {e}")
+                self.unsubscribe(subscription)
+                continue
+            with self._lock:
+                self._delivered += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "jobs": len(self._subscriptions),
+                "subscribers": sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+                "published": self._published,
+                "delivered": self._delivered,
+            }
@@ -0,0 +1,87 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from pysubs.utils.constants import EnvConstants
+from pysubs.utils.settings import PySubsSettings
+
+T = TypeVar("T")
+
+
+class ExecutorKind:
+    # datastore and token verification calls, which mostly wait on the remote end
+    IO = "io"
+    # YouTube lookups, which can take seconds and are kept apart so that they cannot starve the datastore reads
+    YOUTUBE = "youtube"
+    # uploads, ffmpeg and other work which keeps the disk and the cpu busy
+    MEDIA = "media"
+
+
+class BlockingExecutors:
+    """
+    The thread pools on which the API handlers run the blocking pytube, ffmpeg and datastore calls,
+    so that a slow call does not stall the event loop and every other request with it.
+    Every kind of work has its own sized pool, so that a burst of uploads cannot starve the datastore reads.
+    All should access this class using the BlockingExecutors.instance() method.
+    """
+    __singleton_instance = None
+    __singleton_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "BlockingExecutors":
+        if not cls.__singleton_instance:
+            with cls.__singleton_lock:
+                if not cls.__singleton_instance:
+                    cls.__singleton_instance = cls(sizes={
+                        ExecutorKind.IO: int(PySubsSettings.get_config(EnvConstants.API_IO_WORKERS)),
+                        ExecutorKind.YOUTUBE: int(PySubsSettings.get_config(EnvConstants.API_YOUTUBE_WORKERS)),
+                        ExecutorKind.MEDIA: int(PySubsSettings.get_config(EnvConstants.API_MEDIA_WORKERS)),
+                    })
+        return cls.__singleton_instance
+
+    def __init__(self, sizes: dict[str, int]):
+        """
+        Initializing a thread pool of the given size for every kind of work
+        :param sizes:
+        """
+        self.sizes = sizes
+        self._executors = {
+            kind: ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"pysubs-api-{kind}")
+            for kind, size in sizes.items()
+        }
+
+    async def run(self, kind: str, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Runs the blocking function on the pool of the given kind and waits for its result without blocking the loop
+        :param kind:
+        :param fn:
+        :param args:
+        :param kwargs:
+        :return:
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executors[kind], functools.partial(fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        return {
+            kind: {"workers": self.sizes[kind], "queued": executor._work_queue.qsize()}
+            for kind, executor in self._executors.items()
+        }
+
+    def shutdown(self) -> None:
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_blocking(kind: str, fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    helper function to run a blocking function on the executor of the given kind from an async handler
+    :param kind:
+    :param fn:
+    :param args:
+    :param kwargs:
+    :return:
+    """
+    return await BlockingExecutors.instance().run(kind, fn, *args, **kwargs)
@@ -1,10 +1,19 @@
 import os
+import re
 import tempfile
 import uuid
 
-import ffmpeg
+import numpy as np
 
 from pysubs.exceptions.media import DecodingMediaDurationError
+from pysubs.utils.cache import LRUCache
+from pysubs.utils.models import MediaAnalysis
+
+PCM_SAMPLE_RATE: int = 16000
+DURATION_PATTERN = re.compile(rb"Duration: (\d+):(\d{2}):(\d{2}(?:\.\d+)?)")
+
+# The analysis of the files which have already been analysed, keyed by the path, size and modification time
+probe_cache = LRUCache(maxsize=256)
 
 
 def ffmpeg_convert(source: str, dest: str, codec: str):
@@ -15,15 +24,98 @@ def ffmpeg_convert(source: str, dest: str, codec: str):
     :param codec:
     :return:
     """
+    import ffmpeg
     ffmpeg.input(source).output(dest, acodec=codec).run()
 
 
+def decode_to_pcm(source: str, sample_rate: int = PCM_SAMPLE_RATE) -> np.ndarray:
+    """
+    decodes the audio of the source file straight to mono float32 pcm at the given sample rate through a pipe,
+    this is the input format of whisper, so the audio does not have to be decoded again
+    :param source:
+    :param sample_rate:
+    :return:
+    """
+    import ffmpeg
+    out, _ = ffmpeg.input(
+        source, threads=0
+    ).output(
+        "pipe:", format="f32le", acodec="pcm_f32le", ac=1, ar=sample_rate
+    ).run(capture_stdout=True, capture_stderr=True)
+    return np.frombuffer(out, np.float32)
+
+
+def get_pcm_sidecar_path(media_file_path: str) -> str:
+    """
+    The path of the decoded audio written next to the media file by analyse_media
+    :param media_file_path:
+    :return:
+    """
+    return f"{media_file_path}.f32"
+
+
+def load_pcm(pcm_path: str) -> np.ndarray:
+    """
+    maps the decoded audio written by analyse_media into memory without reading it upfront
+    :param pcm_path:
+    :return:
+    """
+    return np.memmap(pcm_path, dtype=np.float32, mode="c")
+
+
+def _get_probe_cache_key(media_file_path: str) -> tuple:
+    stat = os.stat(media_file_path)
+    return media_file_path, stat.st_size, stat.st_mtime_ns
+
+
+def _parse_duration(ffmpeg_log: bytes) -> float:
+    """
+    parses the duration of the input from the log which ffmpeg writes to stderr
+    :param ffmpeg_log:
+    :return:
+    """
+    if not (match := DURATION_PATTERN.search(ffmpeg_log)):
+        raise DecodingMediaDurationError(f"Unknown error in decoding media duration: {ffmpeg_log[-500:]!r}")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def analyse_media(media_file_path: str, sample_rate: int = PCM_SAMPLE_RATE) -> MediaAnalysis:
+    """
+    demuxes the media file once with a single ffmpeg run which has two outputs, the scaled thumbnail
+    and the audio decoded to mono float32 pcm, the duration is read from the log of the same run.
+    The pcm and the thumbnail are written next to the media file, so the conversion does not have to decode
+    the audio again and the files are removed with the workspace of the media.
+    The result is cached for the file, so it is not analysed twice.
+    :param media_file_path:
+    :param sample_rate:
+    :return:
+    """
+    cache_key = _get_probe_cache_key(media_file_path)
+    if (analysis := probe_cache.get(cache_key)) and os.path.exists(analysis.thumbnail_path):
+        return analysis
+    import ffmpeg
+    thumbnail_path = os.path.join(os.path.dirname(media_file_path), f"{str(uuid.uuid4())}.jpg")
+    pcm_path = get_pcm_sidecar_path(media_file_path)
+    source = ffmpeg.input(media_file_path, threads=0)
+    thumbnail = source.video.filter('scale', 300, -1).output(thumbnail_path, ss=1, vframes=1)
+    audio = source.audio.output(pcm_path, format="f32le", acodec="pcm_f32le", ac=1, ar=sample_rate)
+    _, err = ffmpeg.merge_outputs(thumbnail, audio).overwrite_output().run(capture_stdout=True, capture_stderr=True)
+    analysis = MediaAnalysis(duration=_parse_duration(err), thumbnail_path=thumbnail_path, pcm_path=pcm_path)
+    probe_cache.put(cache_key, analysis)
+    return analysis
+
+
 def get_media_duration(media_file_path: str) -> float:
     """
-    gets the media file path and gets the media duration using ffmpeg
+    gets the media file path and gets the media duration using ffmpeg,
+    the duration of a file which has already been analysed is taken from the probe cache
     :param media_file_path:
     :return:
     """
+    if os.path.exists(media_file_path) and (analysis := probe_cache.get(_get_probe_cache_key(media_file_path))):
+        return analysis.duration
+    import ffmpeg
     media_details = ffmpeg.probe(media_file_path)
     try:
         duration = float(media_details["format"]["duration"])
@@ -41,6 +133,7 @@ def create_thumbnail(media_file_path: str) -> str:
     # Get thumbnail
     # https://github.com/kkroening/ffmpeg-python/blob/master/examples/README.md
     thumbnail_path = os.path.join(tempfile.gettempdir(), f"{str(uuid.uuid4())}.jpg")
+    import ffmpeg
     ffmpeg.input(
         media_file_path, ss=1
     ).filter(
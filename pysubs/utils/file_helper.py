@@ -1,3 +1,13 @@
+import hashlib
+import os
+from typing import BinaryIO, Optional
+
+from pysubs.exceptions.media import UploadTooLargeError
+from pysubs.utils.models import IngestedFile
+
+COPY_CHUNK_BYTES: int = 1024 * 1024
+
+
 def write_content_to_file(local_storage_path: str, file_content: str | bytes) -> str:
     """
     file utility helper function to save content to a file at the given path.
@@ -8,3 +18,35 @@ def write_content_to_file(local_storage_path: str, file_content: str | bytes) ->
     with open(local_storage_path, "wb") as video:
         video.write(file_content)
     return local_storage_path
+
+
+def copy_stream_to_file(
+        source: BinaryIO,
+        local_storage_path: str,
+        max_bytes: Optional[int] = None,
+        chunk_bytes: int = COPY_CHUNK_BYTES
+) -> IngestedFile:
+    """
+    file utility helper function to copy a stream to a file at the given path in fixed size chunks, hashing
+    the content on the way. Raises UploadTooLargeError as soon as more than max_bytes are read
+    and removes the partially written file.
+    :param source:
+    :param local_storage_path:
+    :param max_bytes:
+    :param chunk_bytes:
+    :return:
+    """
+    sha256 = hashlib.sha256()
+    byte_count = 0
+    try:
+        with open(local_storage_path, "wb") as destination:
+            while chunk := source.read(chunk_bytes):
+                byte_count += len(chunk)
+                if max_bytes is not None and byte_count > max_bytes:
+                    raise UploadTooLargeError(f"The uploaded file is larger than the limit of {max_bytes} bytes")
+                sha256.update(chunk)
+                destination.write(chunk)
+    except UploadTooLargeError:
+        os.remove(local_storage_path)
+        raise
+    return IngestedFile(local_storage_path=local_storage_path, byte_count=byte_count, sha256=sha256.hexdigest())
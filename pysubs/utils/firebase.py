@@ -0,0 +1,22 @@
+import threading
+
+"""
+The default Firebase app is shared by the token verification and the Firestore datastore,
+it is initialized by whichever of them is used first
+"""
+
+__app_lock = threading.Lock()
+
+
+def get_firebase_app():
+    """
+    Returns the default Firebase app, initializing it on the first call.
+    firebase_admin is imported here, so that the API does not load it until the first request needs it.
+    :return:
+    """
+    import firebase_admin
+    with __app_lock:
+        try:
+            return firebase_admin.get_app()
+        except ValueError:
+            return firebase_admin.initialize_app()
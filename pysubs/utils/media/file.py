@@ -1,7 +1,6 @@
 import hashlib
 import json
 import os.path
-import tempfile
 import uuid
 from collections import OrderedDict
 from datetime import timedelta
@@ -15,7 +14,11 @@ from pysubs.interfaces.media import MediaManager
 from pysubs.utils import file_helper
 from pysubs.utils import conversion
 from pysubs.utils import ffmpeg_utils
-from pysubs.utils.models import MediaType, Media, ConvertedFile, MediaSource
+from pysubs.utils.constants import EnvConstants
+from pysubs.utils.scratch import ScratchSpace
+from pysubs.utils.models import MediaType, Media, ConvertedFile, MediaSource, IngestedFile, \
+    MediaAnalysis
+from pysubs.utils.settings import PySubsSettings
 
 
 class FileMediaManager(MediaManager):
@@ -65,6 +68,10 @@ class FileMediaManager(MediaManager):
     ) -> Media:
         """
         Gets the media info.
+        The upload is streamed to the disk in chunks, so the memory used does not grow with the size of the file,
+        UploadTooLargeError is raised as soon as the file is larger than the allowed size.
+        The duration, the thumbnail and the decoded audio are produced by a single ffmpeg run.
+        All the files are written to the scratch workspace of the media, which is limited by its quota.
         TODO: Use this function to get information about the video and raise exception
         if the uploaded file is unsupported
         :param media:
@@ -72,25 +79,35 @@ class FileMediaManager(MediaManager):
         :return:
         """
         file = media.source_file.file
-        content = file.read()
-        temp_dir = tempfile.gettempdir()
+        media_id = media.id if media.id else FileMediaManager.generate_media_id(media=media, user=user)
+        scratch = ScratchSpace.instance()
         video_filename = FileMediaManager.make_filename_unique(filename=media.source_file.filename)
-        local_storage_path = os.path.join(temp_dir, video_filename)
-        file_helper.write_content_to_file(local_storage_path=local_storage_path, file_content=content)
-        file.close()
-        duration = ffmpeg_utils.get_media_duration(media_file_path=local_storage_path)
-        thumbnail_path = ffmpeg_utils.create_thumbnail(media_file_path=local_storage_path)
-        base64_url = conversion.get_base64_src_for_image(image_filepath=thumbnail_path)
+        local_storage_path = scratch.get_path(workspace_id=media_id, filename=video_filename)
+        try:
+            ingested: IngestedFile = file_helper.copy_stream_to_file(
+                source=file,
+                local_storage_path=local_storage_path,
+                max_bytes=min(
+                    int(PySubsSettings.get_config(EnvConstants.MAX_UPLOAD_BYTES)), scratch.remaining(media_id)
+                )
+            )
+        finally:
+            file.close()
+        analysis: MediaAnalysis = ffmpeg_utils.analyse_media(media_file_path=local_storage_path)
+        base64_url = conversion.get_base64_src_for_image(image_filepath=analysis.thumbnail_path)
+        if os.path.exists(analysis.thumbnail_path):
+            os.remove(analysis.thumbnail_path)
         return Media(
-            id=FileMediaManager.generate_media_id(media=media, user=user),
+            id=media_id,
             title=os.path.basename(local_storage_path),
             thumbnail_url=base64_url,
-            duration=timedelta(seconds=duration),
+            duration=timedelta(seconds=analysis.duration),
             content=None,
             source=MediaSource.RAW_FILE,
             file_type=MediaType.MP4,
             local_storage_path=local_storage_path,
             source_url=local_storage_path,
+            content_id=f"sha256:{ingested.sha256}",
         )
 
     @staticmethod
@@ -119,14 +136,17 @@ class FileMediaManager(MediaManager):
 
     def convert(self, media: Media, to_type: MediaType) -> Media:
         """
-        Converts the video to mo3 file for further processing
+        Converts the video to in memory pcm audio or to an mp3 file for further processing
         :param media:
         :param to_type:
         :return:
         """
-        if to_type != MediaType.MP3:
+        if to_type == MediaType.PCM:
+            converted: ConvertedFile = conversion.convert_to_pcm(media=media)
+        elif to_type == MediaType.MP3:
+            converted: ConvertedFile = conversion.convert_to_mp3(media=media)
+        else:
             raise UnsupportedMediaConversionError(f"Converting to {to_type} is not supported at this moment.")
-        converted: ConvertedFile = conversion.convert_to_mp3(media=media)
         converted_media = Media(
             id=media.id,
             title=media.title,
@@ -136,6 +156,8 @@ class FileMediaManager(MediaManager):
             file_type=to_type,
             local_storage_path=converted.local_storage_path,
             source_url=media.source_url,
-            thumbnail_url=media.thumbnail_url
+            thumbnail_url=media.thumbnail_url,
+            pcm=converted.pcm,
+            content_id=media.content_id
         )
         return converted_media
@@ -1,20 +1,25 @@
 import hashlib
 import json
 import logging
-import tempfile
+import os
 from datetime import timedelta
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 from collections import OrderedDict
 
 from fastapi import UploadFile
-from pytube import YouTube
 
 from pysubs.dal.datastore_models import UserModel
-from pysubs.utils.constants import LogConstants
-from pysubs.exceptions.media import UnsupportedMediaConversionError, UnsupportedMediaDownloadError
+from pysubs.utils.constants import LogConstants, EnvConstants
+from pysubs.exceptions.media import UnsupportedMediaConversionError, UnsupportedMediaDownloadError, \
+    ScratchQuotaExceededError, InvalidMediaUrlError
 from pysubs.interfaces.media import MediaManager
-from pysubs.utils.conversion import convert_to_mp3
-from pysubs.utils.models import MediaType, Media, YouTubeVideo, ConvertedFile, MediaSource
+from pysubs.utils.conversion import convert_to_mp3, convert_to_pcm
+from pysubs.utils.models import MediaType, Media, YouTubeVideo, ConvertedFile, MediaSource, DownloadedStream
+from pysubs.utils.scratch import ScratchSpace
+from pysubs.utils.settings import PySubsSettings
+
+if TYPE_CHECKING:
+    from pytube import Stream, StreamQuery
 
 
 class YouTubeMediaManager(MediaManager):
@@ -30,11 +35,26 @@ class YouTubeMediaManager(MediaManager):
             id=None,
             source=MediaSource.YOUTUBE,
             file_type=MediaType.MP4,
-            source_url=video_source
+            source_url=video_source,
+            content_id=YouTubeMediaManager.get_content_id(video_url=video_source)
         )
         media.id = YouTubeMediaManager.generate_media_id(media=media, user=user)
         return media
 
+    @staticmethod
+    def get_content_id(video_url: Optional[str]) -> Optional[str]:
+        """
+        Gets the canonical identity of the video content, which is the same for all the urls of a YouTube video
+        :param video_url:
+        :return:
+        """
+        from pytube import extract
+        from pytube.exceptions import RegexMatchError
+        try:
+            return f"youtube:{extract.video_id(video_url)}"
+        except (RegexMatchError, TypeError):
+            return None
+
     @staticmethod
     def generate_media_id(
             media: Media,
@@ -64,8 +84,13 @@ class YouTubeMediaManager(MediaManager):
         :param user:
         :return:
         """
+        from pytube import YouTube
+        from pytube.exceptions import RegexMatchError
         video_url = media.source_url
-        yt = YouTube(video_url)
+        try:
+            yt = YouTube(video_url)
+        except RegexMatchError:
+            raise InvalidMediaUrlError(f"The url: {video_url} is not a YouTube video url")
         media_id = media.id if media.id else YouTubeMediaManager.generate_media_id(media, user)
         return Media(
             id=media_id,
@@ -77,6 +102,7 @@ class YouTubeMediaManager(MediaManager):
             file_type=MediaType.MP4,
             local_storage_path=None,
             source_url=video_url,
+            content_id=YouTubeMediaManager.get_content_id(video_url=video_url),
         )
 
     def upload(self, media: Media) -> Media:
@@ -84,29 +110,38 @@ class YouTubeMediaManager(MediaManager):
 
     def download(self, media: Media) -> Media:
         """
-        Downloads the video from YouTube for further processing
+        Downloads the video from YouTube to the scratch workspace of the media for further processing
         :param media:
         :return:
         """
         if media.file_type != MediaType.MP4:
             raise UnsupportedMediaDownloadError(f"Downloading media with format: `{media.file_type}` is not supported")
-        video_metadata: YouTubeVideo = YouTubeMediaManager._download_from_youtube(video_url=media.source_url)
+        scratch = ScratchSpace.instance()
+        video_metadata: YouTubeVideo = YouTubeMediaManager._download_from_youtube(
+            video_url=media.source_url,
+            output_path=scratch.workspace(workspace_id=media.id),
+            max_bytes=scratch.remaining(workspace_id=media.id)
+        )
         media.title = video_metadata.title
         media.duration = video_metadata.duration
         media.local_storage_path = video_metadata.local_storage_path
         media.thumbnail_url = video_metadata.thumbnail_url
+        media.stream = video_metadata.stream
         return media
 
     def convert(self, media: Media, to_type: MediaType) -> Media:
         """
-        Converts the video to mp3 for further processing
+        Converts the video to in memory pcm audio or to mp3 for further processing
         :param media:
         :param to_type:
         :return:
         """
-        if to_type != MediaType.MP3:
+        if to_type == MediaType.PCM:
+            converted: ConvertedFile = convert_to_pcm(media=media)
+        elif to_type == MediaType.MP3:
+            converted: ConvertedFile = convert_to_mp3(media=media)
+        else:
             raise UnsupportedMediaConversionError(f"Converting to {to_type} is not supported at this moment.")
-        converted: ConvertedFile = convert_to_mp3(media=media)
         converted_media = Media(
             id=media.id,
             title=media.title,
@@ -116,26 +151,74 @@ class YouTubeMediaManager(MediaManager):
             file_type=to_type,
             local_storage_path=converted.local_storage_path,
             source_url=media.source_url,
-            thumbnail_url=media.thumbnail_url
+            thumbnail_url=media.thumbnail_url,
+            pcm=converted.pcm,
+            stream=media.stream,
+            content_id=media.content_id
         )
         return converted_media
 
     @staticmethod
-    def _download_from_youtube(video_url: str) -> YouTubeVideo:
+    def _select_stream(streams: "StreamQuery", min_audio_kbps: int) -> Optional["Stream"]:
         """
-        This helper function contains the logic to download the video from YouTube
+        Selects the stream to download, only the audio is needed for the transcription.
+        The smallest audio only stream with at least the given bitrate is preferred, then the best audio only stream
+        and the smallest progressive mp4 is used only when the video has no audio only streams.
+        :param streams:
+        :param min_audio_kbps:
+        :return:
+        """
+        audio_streams = streams.filter(only_audio=True).order_by("abr")
+        for stream in audio_streams:
+            if YouTubeMediaManager._parse_kbps(stream.abr) >= min_audio_kbps:
+                return stream
+        if audio_streams:
+            return audio_streams.last()
+        return streams.filter(progressive=True, file_extension="mp4").order_by("resolution").asc().first()
+
+    @staticmethod
+    def _parse_kbps(bitrate: Optional[str]) -> int:
+        """
+        Parses the bitrate strings of pytube like `48kbps`
+        :param bitrate:
+        :return:
+        """
+        digits = "".join(filter(str.isdigit, bitrate or ""))
+        return int(digits) if digits else 0
+
+    @staticmethod
+    def _download_from_youtube(video_url: str, output_path: str, max_bytes: Optional[int] = None) -> YouTubeVideo:
+        """
+        This helper function contains the logic to download the video from YouTube,
+        the download is refused when the stream is larger than max_bytes
         :param video_url:
+        :param output_path:
+        :param max_bytes:
         :return:
         """
+        from pytube import YouTube
         try:
             yt = YouTube(video_url)
             title = yt.title
             thumbnail_url = yt.thumbnail_url
-            downloader = yt.streams.filter(
-                progressive=True, file_extension="mp4"
-            ).order_by('resolution').desc().first()
+            min_audio_kbps = int(PySubsSettings.get_config(EnvConstants.YOUTUBE_MIN_AUDIO_BITRATE_KBPS))
+            downloader = YouTubeMediaManager._select_stream(yt.streams, min_audio_kbps=min_audio_kbps)
+            if max_bytes is not None and downloader.filesize > max_bytes:
+                raise ScratchQuotaExceededError(
+                    f"The stream of {downloader.filesize} bytes does not fit in the workspace of {max_bytes} bytes"
+                )
             filepath = downloader.download(
-                output_path=tempfile.gettempdir(),
+                output_path=output_path,
+            )
+            stream = DownloadedStream(
+                itag=downloader.itag,
+                bitrate=downloader.bitrate or YouTubeMediaManager._parse_kbps(downloader.abr) * 1000 or None,
+                byte_count=os.path.getsize(filepath),
+                only_audio=not downloader.includes_video_track
+            )
+            logging.getLogger(LogConstants.LOGGER_NAME).info(
+                f"Downloaded stream itag: {stream.itag}, bitrate: {stream.bitrate}, bytes: {stream.byte_count} "
+                f"for the url: {video_url}"
             )
             return YouTubeVideo(
                 title=title,
@@ -143,7 +226,8 @@ class YouTubeMediaManager(MediaManager):
                 duration=timedelta(seconds=yt.length),
                 content=None,
                 local_storage_path=filepath,
-                thumbnail_url=thumbnail_url
+                thumbnail_url=thumbnail_url,
+                stream=stream
             )
         except AttributeError as e:
             logging.getLogger(LogConstants.LOGGER_NAME).error(
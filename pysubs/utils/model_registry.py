@@ -0,0 +1,240 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+from pysubs.utils import quantization
+from pysubs.utils.constants import EnvConstants, LogConstants
+from pysubs.utils.settings import PySubsSettings
+
+logger = logging.getLogger(LogConstants.LOGGER_NAME)
+
+
+def load_whisper_model(name: str, quantization_mode: Optional[str] = None) -> Any:
+    """
+    Loads the whisper model with the given name from the disk (or downloads it on the first run).
+    With the int8 quantization the linear layers are quantized for the CPU inference,
+    the configured quantization is used when it is not given.
+    :param name:
+    :param quantization_mode:
+    :return:
+    """
+    import whisper
+    quantization_mode = quantization_mode or PySubsSettings.get_config(EnvConstants.WHISPER_QUANTIZATION)
+    if quantization_mode == quantization.QUANTIZATION_INT8:
+        return quantization.load_quantized_model(
+            name,
+            loader=lambda n: whisper.load_model(n, device="cpu"),
+            cache_dir=PySubsSettings.get_config(EnvConstants.WHISPER_QUANTIZED_CACHE_DIR)
+        )
+    if quantization_mode != quantization.QUANTIZATION_NONE:
+        raise ValueError(f"Unknown whisper quantization: {quantization_mode}")
+    return whisper.load_model(name)
+
+
+def get_model_resident_bytes(model: Any) -> int:
+    """
+    Computes the memory held by the parameters and the buffers of a torch module,
+    including the packed weights of the quantized layers which are neither of them
+    :param model:
+    :return:
+    """
+    tensors = list(model.parameters()) + list(model.buffers())
+    for module in model.modules():
+        if hasattr(module, "_packed_params") and callable(getattr(module, "weight", None)):
+            tensors.append(module.weight())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+@dataclass
+class LoadedModel:
+    name: str
+    model: Any
+    load_seconds: float
+    resident_bytes: int
+    last_used_at: float
+    # held while the model transcribes, as whisper hooks the kv cache of a transcription into the shared decoder
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    # the transcriptions holding or waiting for the lock, the model is not evicted while there are any
+    users: int = 0
+
+
+class WhisperModelRegistry:
+    """
+    A singleton which keeps the loaded whisper models of this process, so that all the jobs share one copy of the
+    weights. Each model size is loaded only once and the least recently used sizes are evicted once the
+    memory budget is exceeded. All should access this class using the WhisperModelRegistry.instance() method.
+    """
+    __singleton_instance = None
+    __singleton_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "WhisperModelRegistry":
+        if not cls.__singleton_instance:
+            with cls.__singleton_lock:
+                if not cls.__singleton_instance:
+                    budget_mb = int(PySubsSettings.get_config(EnvConstants.WHISPER_MODEL_MEMORY_BUDGET_MB))
+                    cls.__singleton_instance = cls(memory_budget_bytes=budget_mb * 1024 * 1024)
+        return cls.__singleton_instance
+
+    def __init__(
+            self,
+            memory_budget_bytes: int,
+            loader: Callable[[str], Any] = load_whisper_model,
+            sizer: Callable[[Any], int] = get_model_resident_bytes
+    ):
+        """
+        Initializing the registry with the memory budget, the loader and the sizer can be swapped for testing
+        :param memory_budget_bytes:
+        :param loader:
+        :param sizer:
+        """
+        self.memory_budget_bytes = memory_budget_bytes
+        self._loader = loader
+        self._sizer = sizer
+        self._models: OrderedDict[str, LoadedModel] = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: dict[str, threading.Lock] = {}
+
+    def get_model(self, name: str) -> Any:
+        """
+        Returns the loaded model with the given name, loading it if this process has not loaded it yet.
+        Concurrent callers asking for the same model wait for a single load.
+        The model must not be used for more than one transcription at a time, see use_model.
+        :param name:
+        :return:
+        """
+        return self._get_loaded(name).model
+
+    @contextmanager
+    def use_model(self, name: str) -> Iterator[Any]:
+        """
+        Lends the model with the given name to a single transcription. Whisper installs the kv cache hooks
+        of a transcription on the decoder modules of the model, so the concurrent transcriptions of a shared model
+        would write into each other's caches, they wait for each other instead.
+        The model is not evicted from the registry while it is in use.
+        :param name:
+        :return:
+        """
+        loaded = self._get_loaded(name, use=True)
+        try:
+            with loaded.lock:
+                yield loaded.model
+        finally:
+            with self._lock:
+                loaded.users -= 1
+                self._evict()
+
+    def _get_loaded(self, name: str, use: bool = False) -> LoadedModel:
+        """
+        Returns the registry entry of the model, loading the model if it is not loaded.
+        The entry is counted as in use before the registry lock is released when use is True.
+        :param name:
+        :param use:
+        :return:
+        """
+        with self._lock:
+            if loaded := self._touch(name, use):
+                return loaded
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            with self._lock:
+                if loaded := self._touch(name, use):
+                    return loaded
+            started_at = time.perf_counter()
+            model = self._loader(name)
+            load_seconds = time.perf_counter() - started_at
+            resident_bytes = self._sizer(model)
+            logger.info(
+                f"Loaded whisper model `{name}` in {load_seconds:.2f}s, resident size: {resident_bytes} bytes"
+            )
+            with self._lock:
+                loaded = self._models[name] = LoadedModel(
+                    name=name,
+                    model=model,
+                    load_seconds=load_seconds,
+                    resident_bytes=resident_bytes,
+                    last_used_at=time.time(),
+                    users=int(use)
+                )
+                self._evict(keep=name)
+            return loaded
+
+    def preload(self, names: list[str]) -> None:
+        """
+        Loads the given models ahead of the first job, so that the first request does not pay for the loading
+        :param names:
+        :return:
+        """
+        for name in names:
+            self.get_model(name)
+
+    def evict(self, name: str) -> bool:
+        """
+        Drops the model with the given name from the registry, returns True if it was loaded
+        Jobs which are still holding a reference to the model can continue to use it.
+        :param name:
+        :return:
+        """
+        with self._lock:
+            return self._models.pop(name, None) is not None
+
+    def stats(self) -> dict:
+        """
+        Returns the load times and resident sizes of the loaded models
+        :return:
+        """
+        with self._lock:
+            return {
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "resident_bytes": self._resident_bytes(),
+                "models": {
+                    name: {
+                        "load_seconds": loaded.load_seconds,
+                        "resident_bytes": loaded.resident_bytes,
+                        "last_used_at": loaded.last_used_at,
+                        "users": loaded.users,
+                    } for name, loaded in self._models.items()
+                }
+            }
+
+    def _touch(self, name: str, use: bool = False) -> Optional[LoadedModel]:
+        """
+        Marks the model as most recently used and counts it as in use when use is True,
+        has to be called with the lock held
+        :param name:
+        :param use:
+        :return:
+        """
+        loaded = self._models.get(name)
+        if loaded:
+            loaded.last_used_at = time.time()
+            loaded.users += int(use)
+            self._models.move_to_end(name)
+        return loaded
+
+    def _resident_bytes(self) -> int:
+        return sum(loaded.resident_bytes for loaded in self._models.values())
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """
+        Evicts the least recently used models until the registry fits in the memory budget,
+        has to be called with the lock held. The model which was just loaded (or the most recently used one
+        when keep is not given) and the models in use are never evicted,
+        the registry is brought back within the budget once they are released.
+        :param keep:
+        :return:
+        """
+        keep = keep or next(reversed(self._models), None)
+        while self._resident_bytes() > self.memory_budget_bytes:
+            name = next((n for n, loaded in self._models.items() if n != keep and not loaded.users), None)
+            if name is None:
+                logger.warning(
+                    f"Whisper models in use exceed the memory budget of {self.memory_budget_bytes} bytes"
+                )
+                return
+            self._models.pop(name)
+            logger.info(f"Evicted whisper model `{name}` from the registry to stay within the memory budget")
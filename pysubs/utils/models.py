@@ -3,6 +3,7 @@ from enum import Enum, auto
 from typing import Optional
 from datetime import timedelta, datetime
 
+import numpy as np
 from fastapi import UploadFile
 from pydantic import BaseModel
 
@@ -18,6 +19,11 @@ class GenerateResponse(GeneralResponse):
     media_id: str
 
 
+class StreamTokenResponse(GeneralResponse):
+    stream_token: str
+    expires_in: int
+
+
 class VideoMetadataResponse(GeneralResponse):
     video_url: str
     title: str
@@ -36,7 +42,7 @@ class Subtitle(BaseModel):
 
 
 class SubtitleResponse(GeneralResponse, Subtitle):
-    pass
+    stage: Optional[str]
 
 
 class UserResponse(GeneralResponse, UserModel):
@@ -51,6 +57,7 @@ class HistoryResponse(GeneralResponse):
 class MediaType(Enum):
     MP3 = auto()
     MP4 = auto()
+    PCM = auto()
     UNKNOWN = auto()
 
 
@@ -61,6 +68,14 @@ class MediaSource(Enum):
 
 
 # Data
+@dataclass
+class DownloadedStream:
+    itag: int
+    bitrate: Optional[int]
+    byte_count: int
+    only_audio: bool
+
+
 @dataclass
 class Media:
     source: MediaSource
@@ -73,11 +88,51 @@ class Media:
     source_file: Optional[UploadFile] = None
     duration: Optional[timedelta] = None
     local_storage_path: Optional[str] = None
+    pcm: Optional[np.ndarray] = None
+    stream: Optional[DownloadedStream] = None
+    content_id: Optional[str] = None
 
     @property
     def filename(self) -> str:
         return f"{self.id}.{self.file_type}"
 
+    def to_dict(self) -> dict:
+        """
+        Serializes the media so that it can be persisted with the job, the content, the uploaded file
+        and the decoded audio are not included
+        :return:
+        """
+        return {
+            "id": self.id,
+            "source": self.source.value,
+            "file_type": self.file_type.name,
+            "title": self.title,
+            "thumbnail_url": self.thumbnail_url,
+            "source_url": self.source_url,
+            "duration": self.duration.total_seconds() if self.duration is not None else None,
+            "local_storage_path": self.local_storage_path,
+            "content_id": self.content_id,
+        }
+
+    @staticmethod
+    def from_dict(data: dict) -> "Media":
+        """
+        Creates the media from the dict created by to_dict
+        :param data:
+        :return:
+        """
+        return Media(
+            id=data.get("id"),
+            source=MediaSource(data["source"]),
+            file_type=MediaType[data["file_type"]],
+            title=data.get("title"),
+            thumbnail_url=data.get("thumbnail_url"),
+            source_url=data.get("source_url"),
+            duration=timedelta(seconds=data["duration"]) if data.get("duration") is not None else None,
+            local_storage_path=data.get("local_storage_path"),
+            content_id=data.get("content_id"),
+        )
+
 
 @dataclass
 class Transcription:
@@ -85,6 +140,9 @@ class Transcription:
     content: str
     language: str
     media_id: str
+    decoding_profile: Optional[str] = None
+    # the transcription time over the length of the audio
+    real_time_factor: Optional[float] = None
 
 
 @dataclass
@@ -95,6 +153,7 @@ class YouTubeVideo:
     content: Optional[bytes]
     thumbnail_url: Optional[str]
     local_storage_path: str
+    stream: Optional[DownloadedStream] = None
 
 
 @dataclass
@@ -108,5 +167,20 @@ class VideoFile:
 
 
 @dataclass
-class ConvertedFile:
+class MediaAnalysis:
+    duration: float
+    thumbnail_path: str
+    pcm_path: Optional[str] = None
+
+
+@dataclass
+class IngestedFile:
     local_storage_path: str
+    byte_count: int
+    sha256: str
+
+
+@dataclass
+class ConvertedFile:
+    local_storage_path: Optional[str] = None
+    pcm: Optional[np.ndarray] = None
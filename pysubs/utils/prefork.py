@@ -0,0 +1,235 @@
+import gc
+import logging
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Optional
+
+from pysubs.utils.constants import LogConstants
+
+logger = logging.getLogger(LogConstants.LOGGER_NAME)
+
+WorkerTarget = Callable[[threading.Event], None]
+
+
+@dataclass
+class ProcessMemory:
+    """The memory of a process in bytes, the shared pages are mapped by other processes as well"""
+    rss: int
+    pss: int
+    shared: int
+    private: int
+
+
+def read_process_memory(pid: int) -> Optional[ProcessMemory]:
+    """
+    Reads the memory of the process from /proc/<pid>/smaps_rollup, returns None where it is not available
+    :param pid:
+    :return:
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    values = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 3 and parts[2] == "kB":
+            values[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return ProcessMemory(
+        rss=values.get("Rss", 0),
+        pss=values.get("Pss", 0),
+        shared=values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0),
+        private=values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    )
+
+
+class PreforkSupervisor:
+    """
+    Loads the models once in the supervising process and forks the worker processes afterwards,
+    so that the workers share the pages of the weights copy-on-write instead of loading a copy each.
+    The objects created before the fork are frozen out of the garbage collector, which would otherwise
+    write to their pages while scanning them. Crashed workers are restarted with a backoff.
+    """
+    def __init__(
+            self,
+            processes: int,
+            preload: Callable[[], None],
+            target: WorkerTarget,
+            restart_seconds: float = 1,
+            max_restart_seconds: float = 60,
+            report_seconds: float = 300
+    ):
+        """
+        Initializing the supervisor, nothing is loaded or forked until run() is called
+        :param processes: the number of the worker processes
+        :param preload: loads what the workers share, it runs once in the supervising process
+        :param target: runs in every worker process until the given event is set
+        :param restart_seconds: the delay before a crashed worker is restarted, doubled on every consecutive crash
+        :param max_restart_seconds:
+        :param report_seconds: the interval of the memory reports in the log
+        """
+        self.processes = processes
+        self.preload = preload
+        self.target = target
+        self.restart_seconds = restart_seconds
+        self.max_restart_seconds = max_restart_seconds
+        self.report_seconds = report_seconds
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._workers: dict[int, int] = {}
+        self._started_at: dict[int, float] = {}
+        self._crashes: dict[int, int] = {}
+        self._pending: dict[int, float] = {}
+        self._restarts = 0
+
+    def run(self) -> None:
+        """
+        Preloads, forks the workers and supervises them until stop() is called
+        :return:
+        """
+        self.preload()
+        gc.collect()
+        gc.freeze()
+        for index in range(self.processes):
+            self._spawn(index)
+        reported_at = time.monotonic()
+        try:
+            while not self._stopping.wait(timeout=0.2):
+                self._reap()
+                self._restart_due()
+                if time.monotonic() - reported_at >= self.report_seconds:
+                    reported_at = time.monotonic()
+                    logger.info(f"Memory of the worker processes: {self.stats()}")
+        finally:
+            self._shutdown()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def get_worker_pids(self) -> list[int]:
+        with self._lock:
+            return list(self._workers)
+
+    def stats(self) -> dict:
+        """
+        Returns the memory of the supervisor and of every worker, the shared bytes of a worker are the pages
+        it still shares with the supervisor and the other workers
+        :return:
+        """
+        with self._lock:
+            workers = dict(self._workers)
+            restarts = self._restarts
+        supervisor = read_process_memory(os.getpid())
+        memory = {pid: read_process_memory(pid) for pid in workers}
+        return {
+            "processes": self.processes,
+            "restarts": restarts,
+            "supervisor": asdict(supervisor) if supervisor else None,
+            "workers": [
+                {"index": index, "pid": pid, **(asdict(memory[pid]) if memory[pid] else {})}
+                for pid, index in sorted(workers.items(), key=lambda item: item[1])
+            ],
+        }
+
+    def _spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(index)
+        with self._lock:
+            self._workers[pid] = index
+            self._started_at[index] = time.monotonic()
+        logger.info(f"Started the worker process {index} with the pid: {pid}")
+
+    def _run_worker(self, index: int) -> None:
+        """
+        The body of a forked worker process, which never returns to the caller
+        :param index:
+        :return:
+        """
+        code = 0
+        try:
+            stopped = threading.Event()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: stopped.set())
+            self.target(stopped)
+        except BaseException as e:
+            logger.exception(f"Worker process {index} failed with error: {e}")
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def _reap(self) -> None:
+        """
+        Collects the exited workers and schedules their restart
+        :return:
+        """
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            with self._lock:
+                index = self._workers.pop(pid, None)
+                if index is None:
+                    continue
+                # a worker which ran for longer than the longest delay is not crash looping
+                lived = time.monotonic() - self._started_at.get(index, 0)
+                crashes = 0 if lived > self.max_restart_seconds else self._crashes.get(index, 0)
+                self._crashes[index] = crashes + 1
+                delay = min(self.max_restart_seconds, self.restart_seconds * 2 ** crashes)
+                self._pending[index] = time.monotonic() + delay
+            logger.warning(
+                f"Worker process {index} with the pid: {pid} exited with the code: "
+                f"{os.waitstatus_to_exitcode(status)}, restarting it in {delay}s"
+            )
+
+    def _restart_due(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            due = [index for index, restart_at in self._pending.items() if restart_at <= now]
+            for index in due:
+                del self._pending[index]
+                self._restarts += 1
+        for index in due:
+            self._spawn(index)
+
+    def _shutdown(self, timeout_seconds: float = 30) -> None:
+        """
+        Stops the workers, the ones which do not exit in time are killed
+        :param timeout_seconds:
+        :return:
+        """
+        for pid in self.get_worker_pids():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + timeout_seconds
+        while self.get_worker_pids() and time.monotonic() < deadline:
+            self._reap_stopped()
+            time.sleep(0.05)
+        for pid in self.get_worker_pids():
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        with self._lock:
+            self._workers.clear()
+
+    def _reap_stopped(self) -> None:
+        for pid in self.get_worker_pids():
+            try:
+                finished, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                finished = pid
+            if finished:
+                with self._lock:
+                    self._workers.pop(pid, None)
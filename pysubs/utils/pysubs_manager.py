@@ -1,27 +1,49 @@
 import hashlib
 import json
 import logging
-import threading
+import time
 from collections import OrderedDict
 from datetime import datetime, timedelta
+from http.client import IncompleteRead
 from typing import Optional
+from urllib.error import URLError
 
 from fastapi import UploadFile, HTTPException
-from google.api_core.exceptions import PermissionDenied
-from pysubs.dal.datastore_models import MediaModel, SubtitleModel, UserModel
-from pysubs.dal.firestore import FirestoreDatastore
+from pysubs.dal.datastore_models import MediaModel, SubtitleModel, UserModel, JobModel, TranscriptionCacheModel
+from pysubs.dal.factory import get_datastore
+from pysubs.dal.job_store import JobStatus
 from pysubs.exceptions.media import NotEnoughCreditsToPerformGenerationError
+from pysubs.exceptions.scheduler import JobQueueFullError, DecodingProfileConflictError
 from pysubs.interfaces.asr import ASR
 from pysubs.interfaces.media import MediaManager
 from pysubs.utils.models import Media, MediaType, Transcription, Subtitle
 from pysubs.utils.transcriber import WhisperTranscriber
 from pysubs.utils.media.youtube import YouTubeMediaManager
 from pysubs.utils.media.file import FileMediaManager
-from pysubs.utils.constants import LogConstants
+from pysubs.utils.constants import LogConstants, EnvConstants, ProcessRole, DecodingProfileName
+from pysubs.utils.decoding import get_decoding_profile
+from pysubs.utils.quantization import QUANTIZATION_NONE
+from pysubs.utils.event_bus import JobEventBus, JobEvent, JobEventStatus
+from pysubs.utils.scheduler import JobScheduler
+from pysubs.utils.scratch import ScratchSpace
+from pysubs.utils.single_flight import InFlightRegistry
+from pysubs.utils.settings import PySubsSettings
 
 logger = logging.getLogger(LogConstants.LOGGER_NAME)
 
 SECONDS_PER_ONE_CREDIT: int = 300
+# the language is detected by the ASR, the cache entries are keyed by this until the language can be requested
+AUTO_DETECT_LANGUAGE: str = "auto"
+
+YOUTUBE_JOB: str = "youtube"
+VIDEO_FILE_JOB: str = "video_file"
+
+
+class JobStage:
+    DOWNLOADING = "downloading"
+    CONVERTING = "converting"
+    TRANSCRIBING = "transcribing"
+    SAVING = "saving"
 
 
 def get_yt_media_info(video_url: str, user: UserModel) -> Media:
@@ -44,72 +66,350 @@ def check_if_user_can_generate(media: Media, user: UserModel) -> bool:
     :param user:
     :return:
     """
-    duration = media.duration
     available_credits = user.credits
-    required_credits = (duration.seconds // SECONDS_PER_ONE_CREDIT) or 1
+    required_credits = get_required_credits(media)
     if available_credits - required_credits >= 0:
         return True
     else:
         return False
 
 
-def process_yt_video_url_and_generate_subtitles(video: Media, user: UserModel):
+def get_required_credits(media: Media) -> int:
+    """
+    helper function to get the credits required to generate the subtitles of the media
+    :param media:
+    :return:
+    """
+    return (media.duration.seconds // SECONDS_PER_ONE_CREDIT) or 1
+
+
+def process_yt_video_url_and_generate_subtitles(
+        video: Media, user: UserModel, job_id: Optional[str] = None, decoding_profile: Optional[str] = None
+):
     """
     helper function to process the video from YouTube url and generate the subtitles
     :param video:
     :param user:
+    :param job_id:
+    :param decoding_profile:
     :return:
     """
-    audio = get_audio_from_yt_video(video=video, user=user)
+    if save_cached_transcription(media=video, user=user, decoding_profile=decoding_profile):
+        logger.info(f"Subtitles served from the transcription cache for the video url: {video.source_url}")
+        return
+    audio = get_audio_from_yt_video(video=video, user=user, job_id=job_id)
     logger.info(f"Audio generated for the video url: {video.source_url}")
-    transcription = get_subtitles_from_audio(audio=audio)
+    report_job_stage(job_id, JobStage.TRANSCRIBING)
+    transcription = get_subtitles_from_audio(audio=audio, decoding_profile=decoding_profile)
+    report_job_decoding(job_id, transcription)
     logger.info(f"Audio transcription finished for the video url: {video.source_url}")
+    report_job_stage(job_id, JobStage.SAVING)
     save_transcription_attempt(audio, transcription, user)
+    cache_transcription(audio, transcription)
     logger.info("Saved data to datastore.")
 
 
-def process_uploaded_file_and_generate_subtitles(video: Media, user: UserModel):
+def process_uploaded_file_and_generate_subtitles(
+        video: Media, user: UserModel, job_id: Optional[str] = None, decoding_profile: Optional[str] = None
+):
     """
     helper function to process the uploaded video file and generate the subtitles
     :param video:
     :param user:
+    :param job_id:
+    :param decoding_profile:
     :return:
     """
-    audio = get_audio_from_video_file(video=video, user=user)
+    if save_cached_transcription(media=video, user=user, decoding_profile=decoding_profile):
+        logger.info(f"Subtitles served from the transcription cache for the uploaded video file.")
+        return
+    audio = get_audio_from_video_file(video=video, user=user, job_id=job_id)
     logger.info(f"Audio generated for the uploaded video file.")
-    transcription = get_subtitles_from_audio(audio=audio)
+    report_job_stage(job_id, JobStage.TRANSCRIBING)
+    transcription = get_subtitles_from_audio(audio=audio, decoding_profile=decoding_profile)
+    report_job_decoding(job_id, transcription)
     logger.info(f"Audio transcription finished for the video file.")
+    report_job_stage(job_id, JobStage.SAVING)
     save_transcription_attempt(audio, transcription, user)
+    cache_transcription(audio, transcription)
     logger.info("Saved data to datastore.")
 
 
-def get_audio_from_yt_video(video: Media, user: UserModel) -> Media:
+def get_audio_from_yt_video(video: Media, user: UserModel, job_id: Optional[str] = None) -> Media:
     """
     helper function to get the audio file from the YouTube video url
     :param video:
     :param user:
+    :param job_id:
     :return:
     """
     mgr: MediaManager = YouTubeMediaManager()
     video = mgr.get_media_info(media=video, user=user)
+    report_job_stage(job_id, JobStage.DOWNLOADING)
     video = mgr.download(media=video)
-    audio = mgr.convert(media=video, to_type=MediaType.MP3)
+    report_job_stage(job_id, JobStage.CONVERTING)
+    audio = mgr.convert(media=video, to_type=get_audio_conversion_type())
+    ScratchSpace.instance().check_quota(workspace_id=video.id)
     return audio
 
 
-def get_audio_from_video_file(video: Media, user: UserModel) -> Media:
+def get_audio_from_video_file(video: Media, user: UserModel, job_id: Optional[str] = None) -> Media:
     """
     helper function to get the audio file from the uploaded video file
     :param video:
     :param user:
+    :param job_id:
     :return:
     """
     mgr: MediaManager = FileMediaManager()
     video = mgr.download(media=video)
-    audio = mgr.convert(media=video, to_type=MediaType.MP3)
+    report_job_stage(job_id, JobStage.CONVERTING)
+    audio = mgr.convert(media=video, to_type=get_audio_conversion_type())
+    ScratchSpace.instance().check_quota(workspace_id=video.id)
     return audio
 
 
+def report_job_decoding(job_id: Optional[str], transcription: Transcription) -> None:
+    """
+    helper function to record the decoding profile of the job and the real-time factor of its transcription
+    :param job_id:
+    :param transcription:
+    :return:
+    """
+    logger.info(
+        f"Transcribed the media: {transcription.media_id} with the decoding profile: {transcription.decoding_profile} "
+        f"at the real-time factor: {transcription.real_time_factor}"
+    )
+    if job_id:
+        get_job_scheduler().set_decoding(
+            job_id=job_id,
+            decoding_profile=transcription.decoding_profile,
+            real_time_factor=transcription.real_time_factor
+        )
+
+
+def report_job_stage(job_id: Optional[str], stage: str) -> None:
+    """
+    helper function to record the stage the job has reached and to push it to the clients waiting for the job
+    :param job_id:
+    :param stage:
+    :return:
+    """
+    if job_id:
+        get_job_scheduler().set_stage(job_id=job_id, stage=stage)
+        JobEventBus.instance().publish(JobEvent(job_id=job_id, status=JobEventStatus.PENDING, stage=stage))
+
+
+def run_youtube_job(job_id: str, payload: dict) -> None:
+    """
+    job handler which restores the media and the user of a YouTube job from its payload and processes it
+    :param job_id:
+    :param payload:
+    :return:
+    """
+    process_yt_video_url_and_generate_subtitles(
+        video=Media.from_dict(payload["media"]),
+        user=UserModel.parse_obj(payload["user"]),
+        job_id=job_id,
+        decoding_profile=payload.get("decoding_profile")
+    )
+
+
+def run_video_file_job(job_id: str, payload: dict) -> None:
+    """
+    job handler which restores the media and the user of an uploaded file job from its payload and processes it
+    :param job_id:
+    :param payload:
+    :return:
+    """
+    process_uploaded_file_and_generate_subtitles(
+        video=Media.from_dict(payload["media"]),
+        user=UserModel.parse_obj(payload["user"]),
+        job_id=job_id,
+        decoding_profile=payload.get("decoding_profile")
+    )
+
+
+def get_retryable_job_errors() -> tuple[type[BaseException], ...]:
+    """
+    helper function to get the errors of the download and datastore calls which are worth another attempt,
+    the libraries defining them are imported here so that they are not loaded with the API.
+    The ffmpeg errors are not retried, the media which cannot be decoded fails the same way on every attempt.
+    :return:
+    """
+    from google.api_core.exceptions import ServiceUnavailable, DeadlineExceeded
+    return URLError, IncompleteRead, ConnectionError, TimeoutError, ServiceUnavailable, DeadlineExceeded
+
+
+def get_job_scheduler() -> JobScheduler:
+    """
+    helper function to get the job scheduler with the job handlers registered
+    :return:
+    """
+    scheduler = JobScheduler.instance()
+    retryable_errors = get_retryable_job_errors()
+    scheduler.register_handler(YOUTUBE_JOB, run_youtube_job, retryable_errors=retryable_errors)
+    scheduler.register_handler(VIDEO_FILE_JOB, run_video_file_job, retryable_errors=retryable_errors)
+    scheduler.add_finished_listener(finish_in_flight_generation)
+    scheduler.add_finished_listener(release_job_workspace)
+    scheduler.add_finished_listener(publish_job_finished)
+    return scheduler
+
+
+def publish_job_finished(job: JobModel, succeeded: bool) -> None:
+    """
+    job listener which pushes the outcome of the finished job to the clients waiting for it,
+    the subtitle itself is pushed when it is saved
+    :param job:
+    :param succeeded:
+    :return:
+    """
+    JobEventBus.instance().publish(JobEvent(
+        job_id=job.id, status=JobEventStatus.OK if succeeded else JobEventStatus.FAILED, stage=job.stage
+    ))
+
+
+def release_job_workspace(job: JobModel, succeeded: bool) -> None:
+    """
+    job listener which removes the scratch workspace with the temporary media files of the finished job
+    :param job:
+    :param succeeded:
+    :return:
+    """
+    ScratchSpace.instance().release(workspace_id=job.id)
+
+
+def finish_in_flight_generation(job: JobModel, succeeded: bool) -> None:
+    """
+    job listener which removes the finished YouTube generations from the in flight registry and releases
+    the generation lock with the owner recorded in the job, which is the API process when it does not run the workers
+    :param job:
+    :param succeeded:
+    :return:
+    """
+    if job.kind == YOUTUBE_JOB:
+        InFlightRegistry.instance().finish(media_id=job.id, owner=job.payload.get("generation_lock_owner"))
+
+
+def get_in_flight_media_id(video_url: str, user: UserModel, decoding_profile: Optional[str] = None) -> Optional[str]:
+    """
+    helper function to get the media id of the generation for the YouTube video url if it is already in flight,
+    raises DecodingProfileConflictError when it is being generated with another decoding profile
+    :param video_url:
+    :param user:
+    :param decoding_profile:
+    :return:
+    """
+    media = YouTubeMediaManager.create_media(video_source=video_url, user=user)
+    discard_generation_finished_elsewhere(media_id=media.id)
+    if not InFlightRegistry.instance().is_in_flight(media.id):
+        return None
+    check_in_flight_decoding_profile(media_id=media.id, decoding_profile=get_decoding_profile(decoding_profile).name)
+    return media.id
+
+
+def check_in_flight_decoding_profile(media_id: str, decoding_profile: str) -> None:
+    """
+    helper function to check that a request attached to the generation in flight for the media asked for the same
+    decoding profile, raises DecodingProfileConflictError otherwise, as it would get the subtitles of the other one
+    :param media_id:
+    :param decoding_profile:
+    :return:
+    """
+    job = get_job_status(media_id=media_id)
+    if job is None or job.status not in JobStatus.ACTIVE:
+        return
+    if (in_flight_profile := job.payload.get("decoding_profile")) and in_flight_profile != decoding_profile:
+        raise DecodingProfileConflictError(
+            f"The media is being generated with the decoding profile: {in_flight_profile}, "
+            f"the generation with the decoding profile: {decoding_profile} can be requested once it has finished"
+        )
+
+
+def discard_generation_finished_elsewhere(media_id: str) -> None:
+    """
+    helper function to remove the generation from the in flight registry of an API process which does not run
+    the workers, as the job listeners removing the finished generations run in the worker processes.
+    The generation lock of the API process is released with it, in case the worker could not release it.
+    :param media_id:
+    :return:
+    """
+    registry = InFlightRegistry.instance()
+    if runs_job_workers() or not registry.is_in_flight(media_id):
+        return
+    if (job := get_job_status(media_id=media_id)) is None or job.status not in JobStatus.ACTIVE:
+        registry.discard(media_id)
+
+
+def runs_job_workers() -> bool:
+    """
+    helper function to check whether the jobs are run by this process or by the worker processes
+    :return:
+    """
+    return PySubsSettings.get_config(EnvConstants.PROCESS_ROLE) != ProcessRole.API
+
+
+def poll_job_event(job_id: str, stage: Optional[str]) -> Optional[JobEvent]:
+    """
+    helper function to read the event of a job run by another process from the job store,
+    returns the event when the job has moved past the given stage or has finished
+    :param job_id:
+    :param stage:
+    :return:
+    """
+    job = get_job_status(media_id=job_id)
+    if job is None or job.status == JobStatus.FAILED:
+        return JobEvent(job_id=job_id, status=JobEventStatus.FAILED, stage=job.stage if job else None)
+    if job.status == JobStatus.SUCCEEDED:
+        return JobEvent(job_id=job_id, status=JobEventStatus.OK, stage=job.stage)
+    if job.stage != stage:
+        return JobEvent(job_id=job_id, status=JobEventStatus.PENDING, stage=job.stage)
+    return None
+
+
+def start_job_workers() -> None:
+    """
+    starts the job workers, which also resumes the jobs left unfinished by a previous run.
+    The scratch space is swept first, keeping the workspaces of those jobs and the recent uploads of the API.
+    :return:
+    """
+    scheduler = get_job_scheduler()
+    ScratchSpace.instance().sweep(keep=scheduler.get_active_job_ids())
+    scheduler.start()
+
+
+def create_job_payload(
+        media: Media,
+        user: UserModel,
+        decoding_profile: Optional[str] = None,
+        generation_lock_owner: Optional[str] = None
+) -> dict:
+    payload = {"media": media.to_dict(), "user": json.loads(user.json()), "decoding_profile": decoding_profile}
+    if generation_lock_owner:
+        payload["generation_lock_owner"] = generation_lock_owner
+    return payload
+
+
+def get_job_status(media_id: str) -> Optional[JobModel]:
+    """
+    helper function to get the job of the subtitle generation for the given media
+    :param media_id:
+    :return:
+    """
+    return get_job_scheduler().get_job(job_id=media_id)
+
+
+def get_audio_conversion_type() -> MediaType:
+    """
+    helper function to get the audio type the videos are converted to before transcription.
+    The audio is decoded in memory to pcm by default, the mp3 file can still be chosen from the settings.
+    :return:
+    """
+    if PySubsSettings.get_config(EnvConstants.AUDIO_FORMAT).lower() == "mp3":
+        return MediaType.MP3
+    return MediaType.PCM
+
+
 def generate_transcription_id(media_id: str, language: str) -> str:
     """
     Helper function to generate the transcription id
@@ -126,66 +426,241 @@ def generate_transcription_id(media_id: str, language: str) -> str:
     return hashlib.sha256(key_helper).hexdigest()
 
 
-def get_subtitles_from_audio(audio: Media) -> Transcription:
+def get_transcription_model_name(decoding_profile: Optional[str] = None) -> str:
     """
-    helper function to generate the transcription
+    helper function to get the name of the ASR model the subtitles are generated with
+    :param decoding_profile:
+    :return:
+    """
+    return get_decoding_profile(decoding_profile).model_name
+
+
+def get_quantization_mode() -> str:
+    """
+    helper function to get the quantization mode of the whisper models the subtitles are generated with
+    :return:
+    """
+    return PySubsSettings.get_config(EnvConstants.WHISPER_QUANTIZATION)
+
+
+def generate_cache_key(
+        content_id: str,
+        model_name: str,
+        language: str,
+        decoding_profile: Optional[str] = None,
+        quantization_mode: Optional[str] = None
+) -> str:
+    """
+    Helper function to generate the key of the transcription cache from the identity of the media content,
+    so that the same content is transcribed only once for all the users
+    :param content_id:
+    :param model_name:
+    :param language:
+    :param decoding_profile:
+    :param quantization_mode:
+    :return:
+    """
+    key_helper_dict = OrderedDict({
+        "content_id": content_id,
+        "model_name": model_name,
+        "language": language
+    })
+    # the balanced profile decodes with the whisper defaults, its key is kept the same as the keys of the entries
+    # cached before the profiles were introduced
+    if decoding_profile and decoding_profile != DecodingProfileName.BALANCED:
+        key_helper_dict["decoding_profile"] = decoding_profile
+    # the quantized models transcribe differently, the unquantized ones keep the keys cached before quantization
+    if quantization_mode and quantization_mode != QUANTIZATION_NONE:
+        key_helper_dict["quantization_mode"] = quantization_mode
+    key_helper = json.dumps(key_helper_dict).encode("utf-8")
+    return hashlib.sha256(key_helper).hexdigest()
+
+
+def get_cached_transcription(media: Media, decoding_profile: Optional[str] = None) -> Optional[TranscriptionCacheModel]:
+    """
+    helper function to get the cached transcription of the media content
+    :param media:
+    :param decoding_profile:
+    :return:
+    """
+    if not media.content_id:
+        return None
+    profile = get_decoding_profile(decoding_profile)
+    cache_key = generate_cache_key(
+        content_id=media.content_id,
+        model_name=profile.model_name,
+        language=AUTO_DETECT_LANGUAGE,
+        decoding_profile=profile.name,
+        quantization_mode=get_quantization_mode()
+    )
+    return get_datastore().get_cached_transcription(cache_key=cache_key)
+
+
+def save_cached_transcription(media: Media, user: UserModel, decoding_profile: Optional[str] = None) -> bool:
+    """
+    creates the media and subtitle records of the user from the cached transcription of the media content,
+    returns False when the content has not been transcribed yet with the decoding profile
+    :param media:
+    :param user:
+    :param decoding_profile:
+    :return:
+    """
+    if not (cached := get_cached_transcription(media, decoding_profile=decoding_profile)):
+        return False
+    media.title = media.title or cached.title
+    media.duration = media.duration or timedelta(seconds=cached.duration)
+    media.thumbnail_url = media.thumbnail_url or cached.thumbnail_url
+    transcription = Transcription(
+        id=generate_transcription_id(media_id=media.id, language=cached.detected_language),
+        content=cached.content,
+        language=cached.detected_language,
+        media_id=media.id
+    )
+    save_transcription_attempt(media, transcription, user)
+    return True
+
+
+def cache_transcription(audio: Media, transcription: Transcription) -> None:
+    """
+    stores the transcription in the transcription cache keyed by the identity of the media content
+    :param audio:
+    :param transcription:
+    :return:
+    """
+    if not audio.content_id:
+        return
+    profile = get_decoding_profile(transcription.decoding_profile)
+    entry = TranscriptionCacheModel(
+        id=generate_cache_key(
+            content_id=audio.content_id,
+            model_name=profile.model_name,
+            language=AUTO_DETECT_LANGUAGE,
+            decoding_profile=profile.name,
+            quantization_mode=get_quantization_mode()
+        ),
+        content_id=audio.content_id,
+        model_name=profile.model_name,
+        language=AUTO_DETECT_LANGUAGE,
+        detected_language=transcription.language,
+        content=transcription.content,
+        title=audio.title,
+        duration=audio.duration.seconds,
+        thumbnail_url=audio.thumbnail_url,
+        created_at=datetime.utcnow()
+    )
+    from google.api_core.exceptions import PermissionDenied
+    try:
+        get_datastore().upsert_cached_transcription(entry)
+    except PermissionDenied as e:
+        logger.error(f"Error due to insufficient permissions for adding data to Firestore, error: {e}")
+
+
+def get_subtitles_from_audio(audio: Media, decoding_profile: Optional[str] = None) -> Transcription:
+    """
+    helper function to generate the transcription with the decoding profile, the configured profile is used
+    when it is not given. The real-time factor of the transcription is measured along.
     :param audio:
+    :param decoding_profile:
     :return:
     """
+    profile = get_decoding_profile(decoding_profile)
     transcriber: ASR = WhisperTranscriber()
-    result = transcriber.process_audio(audio=audio)
+    started_at = time.perf_counter()
+    result = transcriber.process_audio(audio=audio, profile=profile.name)
+    elapsed = time.perf_counter() - started_at
     language = transcriber.get_detected_language(processed_data=result)
     content = transcriber.generate_subtitles(processed_data=result)
     return Transcription(
         id=generate_transcription_id(media_id=audio.id, language=language),
         content=content,
         language=language,
-        media_id=audio.id
+        media_id=audio.id,
+        decoding_profile=profile.name,
+        real_time_factor=elapsed / audio.duration.total_seconds() if audio.duration else None
     )
 
 
-def start_youtube_transcribe_worker(video_url: str, user: UserModel) -> str:
+def start_youtube_transcribe_worker(video_url: str, user: UserModel, decoding_profile: Optional[str] = None) -> str:
     """
-    starts the worker in a separate thread
+    queues the job for the worker pool, raises JobQueueFullError when the queue is full
+    a video which has already been transcribed is served from the transcription cache right away
+    and a request for a video which is already being generated is attached to the running job
     :param video_url:
     :param user:
+    :param decoding_profile:
     :return:
     """
+    decoding_profile = get_decoding_profile(decoding_profile).name
     media = YouTubeMediaManager.create_media(video_source=video_url, user=user)
-    thr = threading.Thread(target=process_yt_video_url_and_generate_subtitles, args=(media, user,))
-    thr.start()
-    return media.id
+    if save_cached_transcription(media=media, user=user, decoding_profile=decoding_profile):
+        return media.id
+    discard_generation_finished_elsewhere(media_id=media.id)
+    scheduler = get_job_scheduler()
+    registry = InFlightRegistry.instance()
+    media_id, started = registry.run_once(
+        media.id,
+        lambda: scheduler.submit(
+            job_id=media.id,
+            kind=YOUTUBE_JOB,
+            payload=create_job_payload(
+                media=media, user=user, decoding_profile=decoding_profile, generation_lock_owner=registry.owner
+            )
+        )
+    )
+    if not started:
+        check_in_flight_decoding_profile(media_id=media_id, decoding_profile=decoding_profile)
+    return media_id
 
 
-def start_video_file_transcribe_worker(file: UploadFile, user: UserModel) -> Optional[str]:
+def start_video_file_transcribe_worker(
+        file: UploadFile, user: UserModel, decoding_profile: Optional[str] = None
+) -> Optional[str]:
     """
-    starts the worker in a separate thread
+    queues the job for the worker pool, raises JobQueueFullError when the queue is full
+    the queue is checked before reading the upload so that a full queue rejects the request early
     :param file:
     :param user:
+    :param decoding_profile:
     :return:
     """
+    decoding_profile = get_decoding_profile(decoding_profile).name
+    scheduler = get_job_scheduler()
+    if scheduler.is_full():
+        raise JobQueueFullError("The job queue is full.", retry_after=scheduler.retry_after())
     mgr: MediaManager = FileMediaManager()
     media = FileMediaManager.create_media(video_source=file, user=user)
-    video = mgr.get_media_info(media=media, user=user)
-    if not check_if_user_can_generate(video, user):
-        raise HTTPException(status_code=403, detail="Not enough credits to perform generation")
-    else:
-        thr = threading.Thread(target=process_uploaded_file_and_generate_subtitles, args=(video, user))
-        thr.start()
-        return video.id
+    try:
+        video = mgr.get_media_info(media=media, user=user)
+        if not check_if_user_can_generate(video, user):
+            raise HTTPException(status_code=403, detail="Not enough credits to perform generation")
+        elif save_cached_transcription(media=video, user=user, decoding_profile=decoding_profile):
+            ScratchSpace.instance().release(workspace_id=media.id)
+            return video.id
+        else:
+            return scheduler.submit(
+                job_id=video.id,
+                kind=VIDEO_FILE_JOB,
+                payload=create_job_payload(media=video, user=user, decoding_profile=decoding_profile)
+            )
+    except BaseException:
+        ScratchSpace.instance().release(workspace_id=media.id)
+        raise
 
 
 def save_transcription_attempt(audio: Media, transcription: Transcription, user: UserModel) -> None:
     """
     Saves the transcription attempt in the datastore
+    The media, the subtitle and the deduction of the credits are committed together in one unit of work,
+    so a failure cannot leave a subtitle without its deduction.
     :param audio:
     :param transcription:
     :param user:
     :return:
     """
-    fs = FirestoreDatastore.instance()
-    ds_user = fs.get_user(user.id)
-    ds_user.credits = get_remaining_credits(media=audio, user=user)
+    from google.api_core.exceptions import PermissionDenied
+    ds = get_datastore()
+    ds_user = ds.get_user(user.id)
+    get_remaining_credits(media=audio, user=ds_user)
     current_time = datetime.utcnow()
     ds_media = MediaModel(
         id=audio.id,
@@ -195,7 +670,10 @@ def save_transcription_attempt(audio: Media, transcription: Transcription, user:
         media_url=audio.source_url,
         media_source=audio.source.value,
         thumbnail_url=audio.thumbnail_url,
-        created_at=current_time
+        created_at=current_time,
+        stream_itag=audio.stream.itag if audio.stream else None,
+        stream_bitrate=audio.stream.bitrate if audio.stream else None,
+        stream_bytes=audio.stream.byte_count if audio.stream else None,
     )
     expire_at = current_time + timedelta(days=10)
     ds_subtitle = SubtitleModel(
@@ -207,11 +685,23 @@ def save_transcription_attempt(audio: Media, transcription: Transcription, user:
     )
 
     try:
-        fs.upsert_media(ds_media)
-        fs.upsert_subtitle(ds_subtitle)
-        fs.upsert_user(ds_user)
+        with ds.unit_of_work() as unit_of_work:
+            unit_of_work.upsert_media(ds_media)
+            unit_of_work.upsert_subtitle(ds_subtitle)
+            unit_of_work.decrement_credits(user_id=ds_user.id, amount=get_required_credits(audio))
     except PermissionDenied as e:
         logger.error(f"Error due to insufficient permissions for adding data to Firestore, error: {e}")
+        return
+    JobEventBus.instance().publish(JobEvent(job_id=ds_media.id, status=JobEventStatus.OK, data={
+        "subtitle_id": ds_subtitle.id,
+        "video_id": ds_media.id,
+        "video_url": ds_media.media_url,
+        "title": ds_media.title,
+        "video_length": ds_media.duration,
+        "thumbnail": ds_media.thumbnail_url,
+        "subtitle": ds_subtitle.content,
+        "created_at": ds_subtitle.created_at,
+    }))
 
 
 def get_subtitle_generation_status(media_id: str) -> tuple[Optional[MediaModel], Optional[SubtitleModel]]:
@@ -220,24 +710,32 @@ def get_subtitle_generation_status(media_id: str) -> tuple[Optional[MediaModel],
     :param media_id:
     :return:
     """
-    fs = FirestoreDatastore.instance()
-    if media := fs.get_media(media_id=media_id):
-        if subtitle := fs.get_subtitle_for_media(media_id=media_id):
+    ds = get_datastore()
+    if media := ds.get_media(media_id=media_id):
+        if subtitle := ds.get_subtitle_for_media(media_id=media_id):
             return media, subtitle
-    else:
-        return None, None
+    return None, None
 
 
-def get_history(last_created_at: Optional[datetime], count: int, user: UserModel) -> list[Subtitle]:
+def get_history(
+        last_created_at: Optional[datetime],
+        count: int,
+        user: UserModel,
+        summary: bool = False
+) -> list[Subtitle]:
     """
     helper function to get the previous subtitle generation entries
+    in the summary mode the subtitle content is left out, it can be fetched with get_subtitle_content
     :param last_created_at:
     :param count:
     :param user:
+    :param summary:
     :return:
     """
-    fs = FirestoreDatastore.instance()
-    history = fs.get_history_for_user(user_id=user.id, last_created_at=last_created_at, count=count)
+    ds = get_datastore()
+    history = ds.get_history_for_user(
+        user_id=user.id, last_created_at=last_created_at, count=count, include_content=not summary
+    )
     resp: list[Subtitle] = []
     for item in history:
         media = item.media
@@ -257,6 +755,21 @@ def get_history(last_created_at: Optional[datetime], count: int, user: UserModel
     return resp
 
 
+def get_subtitle_content(subtitle_id: str, user: UserModel) -> tuple[Optional[MediaModel], Optional[SubtitleModel]]:
+    """
+    helper function to get a subtitle with its content and its media, the subtitle is returned
+    only when its media belongs to the user
+    :param subtitle_id:
+    :param user:
+    :return:
+    """
+    ds = get_datastore()
+    if subtitle := ds.get_subtitle(subtitle_id=subtitle_id):
+        if (media := ds.get_media(media_id=subtitle.media_id)) and media.user_id == user.id:
+            return media, subtitle
+    return None, None
+
+
 def get_remaining_credits(media: Media, user: UserModel) -> int:
     """
     helper function to get the remaining credits a user has
@@ -264,9 +777,8 @@ def get_remaining_credits(media: Media, user: UserModel) -> int:
     :param user:
     :return:
     """
-    duration = media.duration
     available_credits = user.credits
-    required_credits = (duration.seconds // SECONDS_PER_ONE_CREDIT) or 1
+    required_credits = get_required_credits(media)
     if available_credits - required_credits < 0:
         raise NotEnoughCreditsToPerformGenerationError(
             f"Not enough credits available to generate subtitles for the media: {media.title}"
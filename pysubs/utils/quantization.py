@@ -0,0 +1,80 @@
+import logging
+import os
+import tempfile
+from typing import Any, Callable
+
+from pysubs.utils.constants import LogConstants
+
+"""
+Dynamic int8 quantization of the whisper models for the CPU inference.
+The weights of the linear layers are stored in int8 and the activations are quantized on the fly,
+the quantized models are cached on the disk so that they are not quantized again on every load.
+torch is imported in the functions, so that importing this module does not load it.
+"""
+
+QUANTIZATION_NONE: str = "none"
+QUANTIZATION_INT8: str = "int8"
+
+logger = logging.getLogger(LogConstants.LOGGER_NAME)
+
+
+def quantize_dynamic_int8(model: Any) -> Any:
+    """
+    Quantizes the linear layers of the model to int8. Whisper uses a subclass of the torch linear layer,
+    which is not picked up by the quantization, so its layers are swapped for the plain linear layers first,
+    they only differ in casting the weights to the type of the input.
+    :param model:
+    :return:
+    """
+    import torch
+    for module in list(model.modules()):
+        for child_name, child in list(module.named_children()):
+            if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+                linear = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                linear.weight = child.weight
+                linear.bias = child.bias
+                setattr(module, child_name, linear)
+    return torch.ao.quantization.quantize_dynamic(model.float().eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def get_quantized_cache_path(cache_dir: str, name: str, quantization: str) -> str:
+    """
+    Gets the path of the cached quantized model, the path includes the torch version
+    as the pickled quantized modules are not portable between the versions
+    :param cache_dir:
+    :param name:
+    :param quantization:
+    :return:
+    """
+    import torch
+    return os.path.join(cache_dir, f"whisper-{name}-{quantization}-torch-{torch.__version__}.pt")
+
+
+def load_quantized_model(name: str, loader: Callable[[str], Any], cache_dir: str) -> Any:
+    """
+    Loads the int8 quantized model from the disk cache, or loads the model with the loader, quantizes it
+    and writes it to the cache
+    :param name:
+    :param loader:
+    :param cache_dir:
+    :return:
+    """
+    import torch
+    cache_path = get_quantized_cache_path(cache_dir, name, QUANTIZATION_INT8)
+    if os.path.exists(cache_path):
+        try:
+            return torch.load(cache_path, map_location="cpu", weights_only=False)
+        except Exception as e:
+            logger.warning(f"Loading the quantized model from {cache_path} failed with error: {e}, quantizing it again")
+    model = quantize_dynamic_int8(loader(name))
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            torch.save(model, f)
+        os.replace(temp_path, cache_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return model
@@ -0,0 +1,299 @@
+import logging
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from pysubs.dal.datastore_models import JobModel
+from pysubs.dal.job_store import SQLiteJobStore, JobStatus
+from pysubs.exceptions.scheduler import JobQueueFullError
+from pysubs.utils.constants import EnvConstants, LogConstants, ProcessRole
+from pysubs.utils.settings import PySubsSettings
+
+logger = logging.getLogger(LogConstants.LOGGER_NAME)
+
+JobHandler = Callable[[str, dict], None]
+JobFinishedListener = Callable[[JobModel, bool], None]
+
+
+class JobScheduler:
+    """
+    A singleton which runs the subtitle generation jobs on a fixed number of worker threads.
+    The jobs are persisted in the job store and wait in a bounded queue, once it is full new jobs are rejected,
+    so that a burst of requests cannot start an unbounded number of whisper and ffmpeg runs.
+    Unfinished jobs are resumed when the workers start and the attempts failing with a retryable error
+    are retried with an exponential backoff.
+    An API process without workers only persists the jobs, they are claimed by the worker processes
+    sharing the job store.
+    All should access this class using the JobScheduler.instance() method.
+    """
+    __singleton_instance = None
+    __singleton_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "JobScheduler":
+        if not cls.__singleton_instance:
+            with cls.__singleton_lock:
+                if not cls.__singleton_instance:
+                    cls.__singleton_instance = cls(
+                        store=SQLiteJobStore.instance(),
+                        workers=int(PySubsSettings.get_config(EnvConstants.WORKER_COUNT)),
+                        max_queue_size=int(PySubsSettings.get_config(EnvConstants.JOB_QUEUE_SIZE)),
+                        default_retry_after=int(PySubsSettings.get_config(EnvConstants.JOB_RETRY_AFTER_SECONDS)),
+                        max_attempts=int(PySubsSettings.get_config(EnvConstants.JOB_MAX_ATTEMPTS)),
+                        retry_base_seconds=float(PySubsSettings.get_config(EnvConstants.JOB_RETRY_BASE_SECONDS)),
+                        lease_seconds=float(PySubsSettings.get_config(EnvConstants.JOB_LEASE_SECONDS)),
+                        run_workers=PySubsSettings.get_config(EnvConstants.PROCESS_ROLE) != ProcessRole.API,
+                    )
+        return cls.__singleton_instance
+
+    def __init__(
+            self,
+            store: SQLiteJobStore,
+            workers: int,
+            max_queue_size: int,
+            default_retry_after: int = 30,
+            max_attempts: int = 3,
+            retry_base_seconds: float = 5,
+            lease_seconds: float = 60,
+            poll_seconds: float = 1,
+            run_workers: bool = True
+    ):
+        """
+        Initializing the scheduler, the worker threads are started with the first job or by calling start()
+        :param store:
+        :param workers:
+        :param max_queue_size:
+        :param default_retry_after:
+        :param max_attempts:
+        :param retry_base_seconds:
+        :param lease_seconds:
+        :param poll_seconds:
+        :param run_workers: whether this process runs the jobs, otherwise it only queues them
+        """
+        self.store = store
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.default_retry_after = default_retry_after
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.run_workers = run_workers
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._handlers: dict[str, tuple[JobHandler, tuple[type[BaseException], ...]]] = {}
+        self._finished_listeners: list[JobFinishedListener] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._threads: list[threading.Thread] = []
+        self._running: set[str] = set()
+        self._completed = 0
+        self._failed = 0
+        self._retried = 0
+        self._total_job_seconds = 0.0
+
+    def register_handler(
+            self,
+            kind: str,
+            handler: JobHandler,
+            retryable_errors: tuple[type[BaseException], ...] = ()
+    ) -> None:
+        """
+        Registers the function which runs the jobs of the given kind with the job id and the job payload.
+        The attempts failing with one of the retryable errors are retried.
+        :param kind:
+        :param handler:
+        :param retryable_errors:
+        :return:
+        """
+        with self._lock:
+            self._handlers[kind] = (handler, retryable_errors)
+
+    def add_finished_listener(self, listener: JobFinishedListener) -> None:
+        """
+        Adds a function which is called with the job and whether it succeeded once the job has finished,
+        the attempts which are going to be retried do not finish the job
+        :param listener:
+        :return:
+        """
+        with self._lock:
+            if listener not in self._finished_listeners:
+                self._finished_listeners.append(listener)
+
+    def submit(self, job_id: str, kind: str, payload: dict) -> str:
+        """
+        Persists the job and returns its id, raises JobQueueFullError when the queue is full.
+        When a job with the same id is already queued or running, its id is returned without queueing another one.
+        :param job_id:
+        :param kind:
+        :param payload:
+        :return:
+        """
+        self.start()
+        if (existing := self.store.get(job_id)) and existing.status in JobStatus.ACTIVE:
+            return job_id
+        if self.is_full():
+            raise JobQueueFullError(
+                f"The job queue is full with {self.max_queue_size} jobs waiting.", retry_after=self.retry_after()
+            )
+        self.store.enqueue(job_id=job_id, kind=kind, payload=payload, max_attempts=self.max_attempts)
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def start(self) -> None:
+        """
+        Starts the worker threads and the lease keeper, the unfinished jobs in the store are picked up from here.
+        Nothing is started in a process which does not run the workers.
+        :return:
+        """
+        with self._lock:
+            if self._threads or not self.run_workers:
+                return
+            for index in range(self.workers):
+                thr = threading.Thread(target=self._work, name=f"pysubs-worker-{index}", daemon=True)
+                thr.start()
+                self._threads.append(thr)
+            thr = threading.Thread(target=self._keep_leases, name="pysubs-lease-keeper", daemon=True)
+            thr.start()
+            self._threads.append(thr)
+
+    def get_job(self, job_id: str) -> Optional[JobModel]:
+        return self.store.get(job_id)
+
+    def get_active_job_ids(self) -> list[str]:
+        return self.store.get_active_ids()
+
+    def set_stage(self, job_id: str, stage: str) -> None:
+        self.store.set_stage(job_id=job_id, stage=stage)
+
+    def set_decoding(self, job_id: str, decoding_profile: str, real_time_factor: Optional[float]) -> None:
+        self.store.set_decoding(job_id=job_id, decoding_profile=decoding_profile, real_time_factor=real_time_factor)
+
+    def is_full(self) -> bool:
+        return self.store.count(JobStatus.QUEUED) >= self.max_queue_size
+
+    def retry_after(self) -> int:
+        """
+        Estimates the seconds after which a slot is likely to be free again in the queue
+        :return:
+        """
+        with self._lock:
+            if not self._completed:
+                return self.default_retry_after
+            average_job_seconds = self._total_job_seconds / self._completed
+        return max(1, math.ceil(average_job_seconds * (self.store.count(JobStatus.QUEUED) / max(1, self.workers))))
+
+    def stats(self) -> dict:
+        """
+        Returns the queue depth and the utilization of the workers
+        :return:
+        """
+        queue_depth = self.store.count(JobStatus.QUEUED)
+        with self._lock:
+            busy = len(self._running)
+            return {
+                "run_workers": self.run_workers,
+                "queue_depth": queue_depth,
+                "max_queue_size": self.max_queue_size,
+                "workers": self.workers,
+                "busy_workers": busy,
+                "utilization": busy / self.workers if self.workers else 0.0,
+                "completed": self._completed,
+                "failed": self._failed,
+                "retried": self._retried,
+                "average_job_seconds": self._total_job_seconds / self._completed if self._completed else None,
+            }
+
+    def _work(self) -> None:
+        """
+        The loop of the worker threads
+        :return:
+        """
+        while True:
+            job = self.store.claim(owner=self.owner, lease_seconds=self.lease_seconds)
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=self.poll_seconds)
+                continue
+            self._run(job)
+
+    def _run(self, job: JobModel) -> None:
+        """
+        Runs a claimed job and records the outcome of the attempt in the store
+        :param job:
+        :return:
+        """
+        with self._lock:
+            self._running.add(job.id)
+            handler, retryable_errors = self._handlers.get(job.kind, (None, ()))
+        started_at = time.perf_counter()
+        outcome = "completed"
+        try:
+            if handler is None:
+                raise LookupError(f"No handler is registered for the jobs of kind `{job.kind}`")
+            handler(job.id, job.payload)
+            if not self.store.complete(job.id, owner=self.owner):
+                outcome = "lost"
+        except Exception as e:
+            if isinstance(e, retryable_errors) and job.attempts < job.max_attempts:
+                outcome = "retried"
+                retry_in = self.retry_base_seconds * 2 ** (job.attempts - 1)
+                logger.warning(f"Attempt {job.attempts} of job {job.id} failed, retrying in {retry_in}s. Error: {e}")
+            else:
+                outcome, retry_in = "failed", None
+                logger.exception(f"Job {job.id} failed with error: {e}")
+            if not self.store.fail(job.id, owner=self.owner, error=repr(e), retry_in=retry_in):
+                outcome = "lost"
+        finally:
+            with self._lock:
+                self._running.discard(job.id)
+                if outcome == "retried":
+                    self._retried += 1
+                elif outcome != "lost":
+                    self._completed += 1
+                    self._failed += int(outcome == "failed")
+                    self._total_job_seconds += time.perf_counter() - started_at
+            if outcome == "lost":
+                # the lease expired while the job was running, the worker which claimed it again owns its outcome
+                logger.warning(f"Job {job.id} was claimed by another worker, the outcome of this attempt is dropped")
+            elif outcome != "retried":
+                self._notify_finished(job, outcome == "completed")
+
+    def _notify_finished(self, job: JobModel, succeeded: bool) -> None:
+        with self._lock:
+            listeners = list(self._finished_listeners)
+        for listener in listeners:
+            try:
+                listener(job, succeeded)
+            except Exception as e:
+                logger.exception(f"Finished listener of the job {job.id} failed with error: {e}")
+
+    def _fail_abandoned(self) -> None:
+        """
+        Fails the jobs whose workers stopped on their last attempt, a job which crashes its worker
+        would otherwise be resumed forever
+        :return:
+        """
+        for job in self.store.fail_abandoned():
+            logger.error(f"Job {job.id} failed after its worker stopped on all the {job.attempts} attempts")
+            with self._lock:
+                self._failed += 1
+            self._notify_finished(job, False)
+
+    def _keep_leases(self) -> None:
+        """
+        Extends the leases of the jobs running in this process, so that they are not claimed by other workers,
+        and fails the abandoned jobs which have used up their attempts
+        :return:
+        """
+        while True:
+            self._fail_abandoned()
+            time.sleep(self.lease_seconds / 3)
+            with self._lock:
+                running = list(self._running)
+            for job_id in running:
+                self.store.extend_lease(job_id=job_id, owner=self.owner, lease_seconds=self.lease_seconds)
@@ -0,0 +1,261 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Callable, Iterable, Optional
+
+from pysubs.exceptions.media import ScratchQuotaExceededError
+from pysubs.utils.constants import EnvConstants, LogConstants
+from pysubs.utils.settings import PySubsSettings
+
+logger = logging.getLogger(LogConstants.LOGGER_NAME)
+
+
+class ScratchSpace:
+    """
+    Manages the disk space used for the temporary media files. Every job gets its own workspace directory
+    under the scratch root, keyed by the media id, which is limited by a byte quota and removed when the job ends.
+    The workspaces of finished jobs are evicted in the least recently used order when the scratch root grows
+    over the disk budget, the workspaces left behind by a previous run are swept on startup.
+    The API and the worker processes share the scratch root, so the workspaces of the queued and running jobs
+    are read from the shared job store, and the workspaces written to within the grace period are never removed,
+    as they may belong to an upload of another process which has not been queued yet.
+    All should access this class using the ScratchSpace.instance() method.
+    """
+    __singleton_instance = None
+    __singleton_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "ScratchSpace":
+        if not cls.__singleton_instance:
+            with cls.__singleton_lock:
+                if not cls.__singleton_instance:
+                    from pysubs.dal.job_store import SQLiteJobStore
+                    cls.__singleton_instance = cls(
+                        root=PySubsSettings.get_config(EnvConstants.SCRATCH_DIR),
+                        workspace_quota_bytes=int(PySubsSettings.get_config(EnvConstants.SCRATCH_WORKSPACE_QUOTA_BYTES)),
+                        budget_bytes=int(PySubsSettings.get_config(EnvConstants.SCRATCH_BUDGET_BYTES)),
+                        grace_seconds=float(PySubsSettings.get_config(EnvConstants.SCRATCH_GRACE_SECONDS)),
+                        get_active_ids=lambda: SQLiteJobStore.instance().get_active_ids(),
+                    )
+        return cls.__singleton_instance
+
+    def __init__(
+            self,
+            root: str,
+            workspace_quota_bytes: int,
+            budget_bytes: int,
+            grace_seconds: float = 0,
+            get_active_ids: Optional[Callable[[], Iterable[str]]] = None
+    ):
+        """
+        Initializing the scratch space, the root directory is created when it does not exist
+        :param root:
+        :param workspace_quota_bytes:
+        :param budget_bytes:
+        :param grace_seconds: the workspaces and files modified within this many seconds are not removed
+        :param get_active_ids: returns the ids of the queued and running jobs of all the processes
+        """
+        self.root = root
+        self.workspace_quota_bytes = workspace_quota_bytes
+        self.budget_bytes = budget_bytes
+        self.grace_seconds = grace_seconds
+        self.get_active_ids = get_active_ids
+        self._lock = threading.Lock()
+        self._active: set[str] = set()
+        self._released = 0
+        self._evicted = 0
+        self._swept = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    def workspace(self, workspace_id: str) -> str:
+        """
+        Returns the workspace directory of the job, creating it when needed.
+        The workspaces of the finished jobs are evicted first when the scratch root is over the disk budget,
+        a new workspace is refused with ScratchQuotaExceededError when the running jobs alone are over the budget.
+        :param workspace_id:
+        :return:
+        """
+        path = self._get_workspace_path(workspace_id)
+        with self._lock:
+            created = workspace_id not in self._active
+            self._active.add(workspace_id)
+            os.makedirs(path, exist_ok=True)
+            os.utime(path)
+            if (used := self._enforce_budget()) > self.budget_bytes and created:
+                self._active.discard(workspace_id)
+                shutil.rmtree(path, ignore_errors=True)
+                raise ScratchQuotaExceededError(
+                    f"The scratch space uses {used} bytes, which is over its budget of {self.budget_bytes} bytes"
+                )
+        return path
+
+    def get_path(self, workspace_id: str, filename: str) -> str:
+        """
+        Returns the path of a file in the workspace of the job
+        :param workspace_id:
+        :param filename:
+        :return:
+        """
+        return os.path.join(self.workspace(workspace_id), os.path.basename(filename))
+
+    def remaining(self, workspace_id: str) -> int:
+        """
+        Returns the bytes which can still be written to the workspace of the job
+        :param workspace_id:
+        :return:
+        """
+        return max(0, self.workspace_quota_bytes - self.usage(workspace_id))
+
+    def usage(self, workspace_id: str) -> int:
+        return self._get_size(self._get_workspace_path(workspace_id))
+
+    def check_quota(self, workspace_id: str) -> None:
+        """
+        Raises ScratchQuotaExceededError when the files of the job are over the quota of its workspace
+        :param workspace_id:
+        :return:
+        """
+        if (usage := self.usage(workspace_id)) > self.workspace_quota_bytes:
+            raise ScratchQuotaExceededError(
+                f"The workspace of the job: {workspace_id} uses {usage} bytes, "
+                f"which is over the quota of {self.workspace_quota_bytes} bytes"
+            )
+
+    def release(self, workspace_id: str) -> None:
+        """
+        Removes the workspace of the job with all its files
+        :param workspace_id:
+        :return:
+        """
+        path = self._get_workspace_path(workspace_id)
+        with self._lock:
+            self._active.discard(workspace_id)
+            if os.path.exists(path):
+                shutil.rmtree(path, ignore_errors=True)
+                self._released += 1
+
+    def sweep(self, keep: Iterable[str] = ()) -> int:
+        """
+        Removes everything under the scratch root except the workspaces of the given jobs and of the jobs
+        which are queued or running in any process, and the entries still within the grace period.
+        This is run on startup to clean up after the previous run.
+        :param keep:
+        :return:
+        """
+        keep = set(keep)
+        swept = 0
+        with self._lock:
+            self._active.update(keep)
+            active = self._get_active()
+            now = time.time()
+            for entry in os.scandir(self.root):
+                if entry.name in active or self._is_within_grace(entry.path, now):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                else:
+                    os.remove(entry.path)
+                swept += 1
+            self._swept += swept
+        if swept:
+            logger.info(f"Swept {swept} orphaned entries from the scratch space at: {self.root}")
+        return swept
+
+    def stats(self) -> dict:
+        with self._lock:
+            workspaces = [entry for entry in os.scandir(self.root) if entry.is_dir(follow_symlinks=False)]
+            return {
+                "root": self.root,
+                "workspaces": len(workspaces),
+                "active_workspaces": len(self._active),
+                "used_bytes": sum(self._get_size(entry.path) for entry in workspaces),
+                "budget_bytes": self.budget_bytes,
+                "workspace_quota_bytes": self.workspace_quota_bytes,
+                "released": self._released,
+                "evicted": self._evicted,
+                "swept": self._swept,
+            }
+
+    def _get_workspace_path(self, workspace_id: str) -> str:
+        if not workspace_id or os.path.basename(workspace_id) != workspace_id or workspace_id in (".", ".."):
+            raise ValueError(f"Invalid workspace id: {workspace_id}")
+        return os.path.join(self.root, workspace_id)
+
+    def _enforce_budget(self) -> int:
+        """
+        Evicts the least recently used workspaces of the finished jobs until the scratch root fits in the budget
+        and returns the bytes used after the eviction, the caller must hold the lock
+        :return:
+        """
+        workspaces = sorted(
+            (entry for entry in os.scandir(self.root) if entry.is_dir(follow_symlinks=False)),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        sizes = {entry.name: self._get_size(entry.path) for entry in workspaces}
+        used = sum(sizes.values())
+        active = None
+        now = time.time()
+        for entry in workspaces:
+            if used <= self.budget_bytes:
+                return used
+            active = self._get_active() if active is None else active
+            if entry.name in active or self._is_within_grace(entry.path, now):
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            used -= sizes[entry.name]
+            self._evicted += 1
+            logger.info(f"Evicted the workspace: {entry.name} to keep the scratch space in its budget")
+        if used > self.budget_bytes:
+            logger.warning(
+                f"The scratch space uses {used} bytes for the running jobs, which is over its budget "
+                f"of {self.budget_bytes} bytes"
+            )
+        return used
+
+    def _get_active(self) -> set[str]:
+        """
+        Returns the ids of the workspaces in use by this process and by the queued and running jobs of all
+        the processes, the caller must hold the lock
+        :return:
+        """
+        active = set(self._active)
+        if self.get_active_ids is not None:
+            active.update(self.get_active_ids())
+        return active
+
+    def _is_within_grace(self, path: str, now: float) -> bool:
+        """
+        Checks whether the entry or any file in it was modified within the grace period,
+        an upload which is still being written keeps updating the modification time of its file
+        :param path:
+        :param now:
+        :return:
+        """
+        if self.grace_seconds <= 0:
+            return False
+        try:
+            if now - os.path.getmtime(path) < self.grace_seconds:
+                return True
+        except OSError:
+            return False
+        for directory, _, filenames in os.walk(path):
+            for filename in filenames:
+                try:
+                    if now - os.path.getmtime(os.path.join(directory, filename)) < self.grace_seconds:
+                        return True
+                except OSError:
+                    pass
+        return False
+
+    @staticmethod
+    def _get_size(path: str) -> int:
+        size = 0
+        for directory, _, filenames in os.walk(path):
+            for filename in filenames:
+                try:
+                    size += os.path.getsize(os.path.join(directory, filename))
+                except OSError:
+                    pass
+        return size
@@ -1,7 +1,8 @@
 import os
+import tempfile
 import threading
 from dotenv import load_dotenv, find_dotenv
-from pysubs.utils.constants import EnvConstants
+from pysubs.utils.constants import EnvConstants, DatastoreBackend, ProcessRole, DecodingProfileName
 
 
 class PySubsSettings:
@@ -11,7 +12,45 @@ class PySubsSettings:
     __singleton_instance = None
     __singleton_lock = threading.Lock()
     defaults = {
-        EnvConstants.VIDEO_MANAGER: EnvConstants.YOUTUBE
+        EnvConstants.VIDEO_MANAGER: EnvConstants.YOUTUBE,
+        EnvConstants.WHISPER_MODEL: "base",
+        EnvConstants.WHISPER_PRELOAD_MODELS: "base",
+        EnvConstants.WHISPER_MODEL_MEMORY_BUDGET_MB: "2048",
+        EnvConstants.WHISPER_CHUNKED_WORKERS: "0",
+        EnvConstants.WHISPER_CHUNK_SECONDS: "120",
+        EnvConstants.WHISPER_CHUNK_OVERLAP_SECONDS: "1",
+        EnvConstants.AUDIO_FORMAT: "pcm",
+        EnvConstants.YOUTUBE_MIN_AUDIO_BITRATE_KBPS: "48",
+        EnvConstants.WORKER_COUNT: "2",
+        EnvConstants.JOB_QUEUE_SIZE: "16",
+        EnvConstants.JOB_RETRY_AFTER_SECONDS: "30",
+        EnvConstants.JOB_STORE_PATH: os.path.join(tempfile.gettempdir(), "pysubs-jobs.sqlite3"),
+        EnvConstants.JOB_MAX_ATTEMPTS: "3",
+        EnvConstants.JOB_RETRY_BASE_SECONDS: "5",
+        EnvConstants.JOB_LEASE_SECONDS: "60",
+        EnvConstants.GENERATION_LOCK_SECONDS: "3600",
+        EnvConstants.MAX_UPLOAD_BYTES: "250000000",
+        EnvConstants.SCRATCH_DIR: os.path.join(tempfile.gettempdir(), "pysubs-scratch"),
+        EnvConstants.SCRATCH_WORKSPACE_QUOTA_BYTES: "1000000000",
+        EnvConstants.SCRATCH_BUDGET_BYTES: "10000000000",
+        EnvConstants.SCRATCH_GRACE_SECONDS: "300",
+        EnvConstants.API_IO_WORKERS: "32",
+        EnvConstants.TOKEN_CACHE_SIZE: "10000",
+        EnvConstants.STREAM_TOKEN_TTL_SECONDS: "60",
+        EnvConstants.USER_CACHE_SIZE: "10000",
+        EnvConstants.USER_CACHE_TTL_SECONDS: "300",
+        EnvConstants.USER_WATCH_LIMIT: "100",
+        EnvConstants.API_YOUTUBE_WORKERS: "8",
+        EnvConstants.API_MEDIA_WORKERS: "4",
+        EnvConstants.DATASTORE_BACKEND: DatastoreBackend.FIRESTORE,
+        EnvConstants.SQLITE_DATASTORE_PATH: os.path.join(tempfile.gettempdir(), "pysubs-datastore.sqlite3"),
+        EnvConstants.PROCESS_ROLE: ProcessRole.ALL,
+        EnvConstants.WORKER_PROCESSES: "1",
+        EnvConstants.WHISPER_QUANTIZATION: "none",
+        EnvConstants.WHISPER_QUANTIZED_CACHE_DIR: os.path.join(os.path.expanduser("~"), ".cache", "pysubs"),
+        EnvConstants.DECODING_PROFILE: DecodingProfileName.BALANCED,
+        EnvConstants.WHISPER_FAST_MODEL: "tiny",
+        EnvConstants.WHISPER_ACCURATE_MODEL: "small",
     }
 
     def __init__(self):
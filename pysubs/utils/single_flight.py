@@ -0,0 +1,138 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from pysubs.dal.factory import get_datastore
+from pysubs.interfaces.datastore import Datastore
+from pysubs.utils.constants import EnvConstants, LogConstants
+from pysubs.utils.settings import PySubsSettings
+
+logger = logging.getLogger(LogConstants.LOGGER_NAME)
+
+
+@dataclass
+class InFlightGeneration:
+    media_id: str
+    started_at: float = field(default_factory=time.time)
+    attached: int = 0
+
+
+class InFlightRegistry:
+    """
+    Keeps track of the subtitle generations which are in flight, keyed by the media id.
+    A request for a media which is already being generated is attached to the running generation
+    instead of starting another one. The datastore lock coordinates the generations across processes.
+    All should access this class using the InFlightRegistry.instance() method.
+    """
+    __singleton_instance = None
+    __singleton_lock = threading.Lock()
+
+    @classmethod
+    def instance(cls) -> "InFlightRegistry":
+        if not cls.__singleton_instance:
+            with cls.__singleton_lock:
+                if not cls.__singleton_instance:
+                    cls.__singleton_instance = cls(
+                        datastore_factory=get_datastore,
+                        lock_seconds=float(PySubsSettings.get_config(EnvConstants.GENERATION_LOCK_SECONDS)),
+                    )
+        return cls.__singleton_instance
+
+    def __init__(self, datastore_factory: Callable[[], Datastore], lock_seconds: float):
+        """
+        Initializing the registry, the datastore is created on first use
+        :param datastore_factory:
+        :param lock_seconds:
+        """
+        self.datastore_factory = datastore_factory
+        self.lock_seconds = lock_seconds
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, InFlightGeneration] = {}
+        self._attached_elsewhere = 0
+
+    def is_in_flight(self, media_id: str) -> bool:
+        with self._lock:
+            return media_id in self._in_flight
+
+    def run_once(self, media_id: str, start: Callable[[], str]) -> tuple[str, bool]:
+        """
+        Starts the generation of the media with the given start function unless it is already in flight
+        in this process or in another one. Returns the media id and whether this call started the generation.
+        :param media_id:
+        :param start:
+        :return:
+        """
+        with self._lock:
+            if in_flight := self._in_flight.get(media_id):
+                in_flight.attached += 1
+                logger.info(f"Attached a duplicate request to the generation of the media: {media_id}")
+                return media_id, False
+            self._in_flight[media_id] = InFlightGeneration(media_id=media_id)
+        try:
+            acquired = self.datastore_factory().acquire_generation_lock(
+                media_id, owner=self.owner, ttl_seconds=self.lock_seconds
+            )
+        except BaseException:
+            with self._lock:
+                self._in_flight.pop(media_id, None)
+            raise
+        if not acquired:
+            with self._lock:
+                self._in_flight.pop(media_id, None)
+                self._attached_elsewhere += 1
+            logger.info(f"The media: {media_id} is being generated by another process")
+            return media_id, False
+        try:
+            start()
+        except BaseException:
+            self.finish(media_id)
+            raise
+        return media_id, True
+
+    def finish(self, media_id: str, owner: Optional[str] = None) -> None:
+        """
+        Removes the generation from the registry and releases its datastore lock.
+        The owner is the registry which took the lock, which is another process when the job was queued
+        by an API process and run by a worker, it is this registry when it is not given.
+        :param media_id:
+        :param owner:
+        :return:
+        """
+        with self._lock:
+            self._in_flight.pop(media_id, None)
+        self._release(media_id, owner=owner or self.owner)
+
+    def discard(self, media_id: str) -> None:
+        """
+        Removes the generation from the registry and releases the datastore lock this registry took for it,
+        used for the generations which were finished by another process
+        :param media_id:
+        :return:
+        """
+        with self._lock:
+            self._in_flight.pop(media_id, None)
+        self._release(media_id, owner=self.owner)
+
+    def _release(self, media_id: str, owner: str) -> None:
+        try:
+            self.datastore_factory().release_generation_lock(media_id, owner=owner)
+        except Exception as e:
+            logger.error(f"Releasing the generation lock of the media: {media_id} failed with error: {e}")
+
+    def get(self, media_id: str) -> Optional[InFlightGeneration]:
+        with self._lock:
+            return self._in_flight.get(media_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._in_flight),
+                "attached": sum(in_flight.attached for in_flight in self._in_flight.values()),
+                "attached_elsewhere": self._attached_elsewhere,
+            }
@@ -1,9 +1,10 @@
 from io import StringIO
+from typing import Optional
 
 from pysubs.interfaces.asr import ASR
-import whisper
-from whisper.utils import write_srt
-
+from pysubs.utils.chunked_transcription import ChunkedTranscriptionPool
+from pysubs.utils.decoding import get_decoding_profile
+from pysubs.utils.model_registry import WhisperModelRegistry
 from pysubs.utils.models import Media
 
 
@@ -11,19 +12,42 @@ class WhisperTranscriber(ASR):
     """
     Transcription class based on off Whisper
     """
-    def __init__(self):
+    def __init__(self, model_name: Optional[str] = None):
         """
-        Initializer sets the model as base
+        Initializer sets the model name, the model of the decoding profile is used when it is not given.
+        The weights are shared with the other jobs through the model registry.
+        :param model_name:
         """
-        self.model = whisper.load_model("base")
+        self.model_name = model_name
+
+    @property
+    def model(self):
+        return WhisperModelRegistry.instance().get_model(self.model_name or get_decoding_profile().model_name)
 
-    def process_audio(self, audio: Media) -> dict[str, list | dict]:
+    def process_audio(self, audio: Media, profile: Optional[str] = None) -> dict[str, list | dict]:
         """
-        processes the audio content form the media file
+        processes the audio content form the media, the decoded pcm is used when the media carries it
+        long audio is split into chunks which are transcribed in parallel when the chunked mode is enabled.
+        The decoding options are taken from the decoding profile, so is the model unless it was given.
         :param audio:
+        :param profile:
         :return:
         """
-        return self.model.transcribe(audio.local_storage_path)
+        from whisper.audio import load_audio
+        decoding_profile = get_decoding_profile(profile)
+        model_name, options = self.model_name or decoding_profile.model_name, decoding_profile.options
+        pool = ChunkedTranscriptionPool.instance()
+        if audio.pcm is not None:
+            decoded = audio.pcm
+        elif pool.enabled:
+            decoded = load_audio(audio.local_storage_path)
+        else:
+            decoded = None
+        if decoded is not None and pool.should_chunk(decoded):
+            return pool.transcribe(model_name=model_name, audio=decoded, options=options)
+        # the model is shared with the other jobs of the process, so it runs one transcription at a time
+        with WhisperModelRegistry.instance().use_model(model_name) as model:
+            return model.transcribe(audio.local_storage_path if decoded is None else decoded, **options)
 
     def get_detected_language(self, processed_data: dict) -> str:
         """
@@ -39,6 +63,7 @@ class WhisperTranscriber(ASR):
         :param processed_data:
         :return:
         """
+        from whisper.utils import write_srt
         content = StringIO()
         write_srt(processed_data["segments"], file=content)
         return content.getvalue()
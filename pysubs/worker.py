@@ -0,0 +1,90 @@
+import functools
+import logging
+import os
+import signal
+import threading
+
+from pysubs.utils.constants import EnvConstants, LogConstants, ProcessRole
+from pysubs.utils.decoding import get_profile_model_names
+from pysubs.utils.model_registry import WhisperModelRegistry
+from pysubs.utils.prefork import PreforkSupervisor
+from pysubs.utils.pysubs_manager import start_job_workers
+from pysubs.utils.settings import PySubsSettings
+
+"""
+The entry point of the transcription workers, which run the jobs queued by the API processes:
+
+    PROCESS_ROLE=api uvicorn pysubs.main:app
+    python -m pysubs.worker
+
+The API and the workers share the job store, so they have to run on the same node with the same JOB_STORE_PATH
+and SCRATCH_DIR, the uploaded files are handed over to the workers through the scratch space.
+With WORKER_PROCESSES above 1 the models are loaded once and the worker processes are forked from the loaded
+process, sharing the weights copy-on-write.
+"""
+
+logger = logging.getLogger(LogConstants.LOGGER_NAME)
+
+
+def main() -> None:
+    """
+    Loads the models and starts the job workers, which claim the jobs from the job store until the process
+    is stopped. The jobs running when the process stops are resumed once their lease has expired.
+    :return:
+    """
+    logging.basicConfig(level=logging.INFO)
+    os.environ[EnvConstants.PROCESS_ROLE] = ProcessRole.WORKER
+    PySubsSettings.instance()
+    processes = int(PySubsSettings.get_config(EnvConstants.WORKER_PROCESSES))
+    if processes > 1:
+        supervisor = PreforkSupervisor(
+            processes=processes, preload=preload_models, target=functools.partial(run_forked_job_workers, processes)
+        )
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: supervisor.stop())
+        supervisor.run()
+        return
+    stopped = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stopped.set())
+    preload_models()
+    run_job_workers(stopped)
+
+
+def preload_models() -> None:
+    """
+    Loads the configured models and the models of all the decoding profiles, in the supervisor they are loaded
+    before the fork, so that the workers share them instead of loading a private copy on their first job
+    :return:
+    """
+    preload = PySubsSettings.get_config(EnvConstants.WHISPER_PRELOAD_MODELS) or ""
+    names = [name.strip() for name in preload.split(",") if name.strip()]
+    WhisperModelRegistry.instance().preload(list(dict.fromkeys(names + get_profile_model_names())))
+
+
+def run_forked_job_workers(processes: int, stopped: threading.Event) -> None:
+    """
+    Runs the job workers of a forked worker process, the cores are split between the worker processes
+    :param processes:
+    :param stopped:
+    :return:
+    """
+    import torch
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // processes))
+    run_job_workers(stopped)
+
+
+def run_job_workers(stopped: threading.Event) -> None:
+    """
+    Runs the job workers of this process until the given event is set
+    :param stopped:
+    :return:
+    """
+    start_job_workers()
+    logger.info(f"Started the job workers of the process: {os.getpid()}")
+    stopped.wait()
+    logger.info(f"Stopping the job workers of the process: {os.getpid()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,7 @@
+import os
+import tempfile
+
+from pysubs.utils.constants import EnvConstants
 from pysubs.utils.settings import PySubsSettings
 
 
@@ -14,6 +18,7 @@ def pytest_sessionstart(session):
     Called after the Session object has been created and
     before performing collection and entering the run test loop.
     """
+    os.environ.setdefault(EnvConstants.SCRATCH_DIR, tempfile.mkdtemp(prefix="pysubs-scratch-"))
     PySubsSettings.instance()
 
 
@@ -0,0 +1,299 @@
+import copy
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, Optional
+
+from google.cloud import firestore
+
+from pysubs.dal.datastore_models import UserModel, MediaModel, SubtitleModel
+
+
+class FakeWatch:
+    def __init__(self, watchers: list, callback: Callable):
+        self.watchers = watchers
+        self.callback = callback
+
+    def unsubscribe(self) -> None:
+        if self.callback in self.watchers:
+            self.watchers.remove(self.callback)
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, doc_id: str, data: Optional[dict]):
+        self.id = doc_id
+        self._data = copy.deepcopy(data)
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[dict]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field: str) -> Any:
+        return self._data[field]
+
+
+class FakeDocumentReference:
+    def __init__(self, db: "FakeFirestore", collection: str, doc_id: str):
+        self.db = db
+        self.collection = collection
+        self.id = doc_id
+
+    @property
+    def _documents(self) -> dict:
+        return self.db.data.setdefault(self.collection, {})
+
+    def get(self, transaction=None) -> FakeDocumentSnapshot:
+        self.db.round_trip("reads")
+        return FakeDocumentSnapshot(self.id, self._documents.get(self.id))
+
+    def set(self, data: dict, merge: bool = False) -> None:
+        self.db.writes += 1
+        if merge and self.id in self._documents:
+            self._documents[self.id].update(copy.deepcopy(data))
+        else:
+            self._documents[self.id] = copy.deepcopy(data)
+        self._notify()
+
+    def update(self, data: dict) -> None:
+        self.db.writes += 1
+        if self.id not in self._documents:
+            raise KeyError(f"No document to update: {self.collection}/{self.id}")
+        document = self._documents[self.id]
+        for field, value in data.items():
+            if isinstance(value, firestore.Increment):
+                document[field] = document.get(field, 0) + value._value
+            else:
+                document[field] = copy.deepcopy(value)
+        self._notify()
+
+    def delete(self) -> None:
+        self.db.writes += 1
+        self._documents.pop(self.id, None)
+        self._notify()
+
+    def on_snapshot(self, callback: Callable) -> FakeWatch:
+        watchers = self.db.watchers.setdefault((self.collection, self.id), [])
+        watchers.append(callback)
+        callback([FakeDocumentSnapshot(self.id, self._documents.get(self.id))], [], None)
+        return FakeWatch(watchers, callback)
+
+    def _notify(self) -> None:
+        for callback in list(self.db.watchers.get((self.collection, self.id), [])):
+            callback([FakeDocumentSnapshot(self.id, self._documents.get(self.id))], [], None)
+
+
+class FakeWriteBatch:
+    def __init__(self, db: "FakeFirestore"):
+        self.db = db
+        self.writes: list[Callable[[], None]] = []
+
+    def set(self, reference: FakeDocumentReference, data: dict, merge: bool = False) -> None:
+        self.writes.append(lambda: reference.set(data, merge=merge))
+
+    def update(self, reference: FakeDocumentReference, data: dict) -> None:
+        self.writes.append(lambda: reference.update(data))
+
+    def delete(self, reference: FakeDocumentReference) -> None:
+        self.writes.append(reference.delete)
+
+    def commit(self) -> None:
+        self.db.round_trip("commits")
+        with self.db.write_lock:
+            snapshot = copy.deepcopy(self.db.data)
+            try:
+                for write in self.writes:
+                    write()
+            except BaseException:
+                self.db.data = snapshot
+                raise
+
+
+class FakeTransaction(FakeWriteBatch):
+    """
+    The transactions hold the write lock of the stand-in from their begin to their commit or rollback,
+    so they are serialized instead of being retried on contention
+    """
+    _read_only = False
+    _max_attempts = 5
+
+    def __init__(self, db: "FakeFirestore"):
+        super().__init__(db)
+        self._id: Optional[bytes] = None
+
+    def _clean_up(self) -> None:
+        self.writes = []
+
+    def _begin(self, retry_id: Optional[bytes] = None) -> None:
+        self.db.write_lock.acquire()
+        self._id = b"transaction"
+
+    def _commit(self) -> None:
+        try:
+            self.commit()
+        finally:
+            self._release()
+
+    def _rollback(self) -> None:
+        self.writes = []
+        self._release()
+
+    def _release(self) -> None:
+        if self._id is not None:
+            self._id = None
+            self.db.write_lock.release()
+
+
+class FakeQuery:
+    OPERATORS = {
+        "==": lambda value, expected: value == expected,
+        "in": lambda value, expected: value in expected,
+    }
+
+    def __init__(self, db: "FakeFirestore", collection: str):
+        self.db = db
+        self.collection = collection
+        self.filters: list[tuple[str, str, Any]] = []
+        self.order: Optional[tuple[str, str]] = None
+        self.cursor: Optional[dict] = None
+        self.count: Optional[int] = None
+        self.fields: Optional[list[str]] = None
+
+    def _copy(self) -> "FakeQuery":
+        query = copy.copy(self)
+        query.filters = list(self.filters)
+        return query
+
+    def where(self, field: str, op: str, value: Any) -> "FakeQuery":
+        query = self._copy()
+        query.filters.append((field, op, value))
+        return query
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "FakeQuery":
+        query = self._copy()
+        query.order = (field, direction)
+        return query
+
+    def start_after(self, cursor: dict) -> "FakeQuery":
+        query = self._copy()
+        query.cursor = cursor
+        return query
+
+    def select(self, fields: list[str]) -> "FakeQuery":
+        query = self._copy()
+        query.fields = list(fields)
+        return query
+
+    def limit(self, count: int) -> "FakeQuery":
+        query = self._copy()
+        query.count = count
+        return query
+
+    def stream(self) -> Iterator[FakeDocumentSnapshot]:
+        self.db.round_trip("queries")
+        documents = [
+            (doc_id, data) for doc_id, data in self.db.data.get(self.collection, {}).items()
+            if all(self.OPERATORS[op](data.get(field), value) for field, op, value in self.filters)
+        ]
+        if self.order:
+            field, direction = self.order
+            descending = direction == "DESCENDING"
+            documents.sort(key=lambda document: document[1][field], reverse=descending)
+            if self.cursor:
+                after = self.cursor[field]
+                documents = [
+                    document for document in documents
+                    if (document[1][field] < after if descending else document[1][field] > after)
+                ]
+        if self.count is not None:
+            documents = documents[:self.count]
+        if self.fields is not None:
+            documents = [
+                (doc_id, {field: data[field] for field in self.fields if field in data}) for doc_id, data in documents
+            ]
+        return iter([FakeDocumentSnapshot(doc_id, data) for doc_id, data in documents])
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, db: "FakeFirestore", name: str):
+        super().__init__(db, name)
+        self.name = name
+
+    def document(self, doc_id: str) -> FakeDocumentReference:
+        return FakeDocumentReference(self.db, self.name, doc_id)
+
+
+class FakeFirestore:
+    """
+    An in memory stand-in for the Firestore client which supports the calls made by the FirestoreDatastore,
+    the snapshot listeners are notified synchronously on every write and the reads, the queries and the writes
+    are counted. Every read and query waits for the given latency, like a round trip to the server.
+    """
+    def __init__(self, latency_seconds: float = 0):
+        self.data: dict[str, dict[str, dict]] = {}
+        self.watchers: dict[tuple[str, str], list[Callable]] = {}
+        self.latency_seconds = latency_seconds
+        self.reads = 0
+        self.queries = 0
+        self.writes = 0
+        self.commits = 0
+        self.write_lock = threading.RLock()
+        self._lock = threading.Lock()
+
+    def round_trip(self, kind: str) -> None:
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + 1)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def transaction(self) -> FakeTransaction:
+        return FakeTransaction(self)
+
+    def get_all(self, references: list[FakeDocumentReference]) -> Iterator[FakeDocumentSnapshot]:
+        self.round_trip("reads")
+        return iter([
+            FakeDocumentSnapshot(reference.id, self.data.get(reference.collection, {}).get(reference.id))
+            for reference in reversed(references)
+        ])
+
+
+# The sample data shared by the datastore tests and the benchmarks
+sample_user = UserModel(id="1", credits=100, displayName="pla", email="str@str.com", createdAt=datetime(2023, 1, 1))
+
+
+def make_media(index: int, user_id: str = "1") -> MediaModel:
+    return MediaModel(
+        id=f"media-{index}", user_id=user_id, title=f"title {index}", duration=60,
+        media_url=f"https://youtube.com/{index}", media_source="youtube", thumbnail_url="https://yt.com/be.jpg",
+        created_at=datetime(2023, 1, 1) + timedelta(minutes=index), stream_itag=140
+    )
+
+
+def make_subtitle(index: int) -> SubtitleModel:
+    return SubtitleModel(
+        id=f"subtitle-{index}", media_id=f"media-{index}", content=f"1\n00:00:00,000 --> 00:00:01,000\n{index}\n",
+        created_at=datetime(2023, 1, 1), expire_at=datetime(2023, 1, 11)
+    )
+
+
+def add_history(db: FakeFirestore, user_id: str, count: int) -> None:
+    """Writes the media and the subtitles of a history directly to the fake, like the documents of earlier writes"""
+    for i in range(count):
+        media_id = f"media-{i}"
+        db.collection("media").document(media_id).set(MediaModel(
+            id=media_id, user_id=user_id, title=f"title {i}", duration=60, media_url=f"https://youtube.com/{i}",
+            media_source="youtube", thumbnail_url="https://yt.com/be.jpg",
+            created_at=datetime(2023, 1, 1) + timedelta(minutes=i)
+        ).dict())
+        db.collection("subtitles").document(f"subtitle-{i}").set(SubtitleModel(
+            id=f"subtitle-{i}", media_id=media_id, content=f"subtitle {i}", created_at=datetime(2023, 1, 1),
+            expire_at=datetime(2023, 1, 11)
+        ).dict())
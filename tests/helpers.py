@@ -0,0 +1,59 @@
+import os
+import re
+import subprocess
+import sys
+
+"""
+Helpers shared by the tests and the benchmarks, they are not part of the pysubs package
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the libraries which are only needed once a worker processes a job
+WORKER_MODULES: tuple[str, ...] = ("torch", "whisper", "pytube", "ffmpeg", "firebase_admin", "google.cloud.firestore")
+
+
+def measure_import_time(module: str) -> dict[str, int]:
+    """
+    Imports the module in a new interpreter and returns the cumulative import time in microseconds
+    of every module imported with it
+    :param module:
+    :return:
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def normalize(text: str) -> list[str]:
+    """
+    Splits the transcript into its lowercase words without the punctuation
+    :param text:
+    :return:
+    """
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    The word level edit distance between the transcripts over the number of the reference words
+    :param reference:
+    :param hypothesis:
+    :return:
+    """
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    distances = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        previous, distances[0] = distances[0], i
+        for j, hyp_word in enumerate(hyp, start=1):
+            previous, distances[j] = distances[j], min(
+                distances[j] + 1, distances[j - 1] + 1, previous + (ref_word != hyp_word)
+            )
+    return distances[-1] / max(1, len(ref))
@@ -1,14 +1,38 @@
 import base64
+import hashlib
 import os
 import uuid
 from datetime import timedelta, datetime
-from typing import BinaryIO
+from typing import BinaryIO, Optional
 
+import numpy as np
 from fastapi import UploadFile
 
-from pysubs.dal.datastore_models import MediaSubtitlesModel, SubtitleModel, MediaModel, UserModel
+from pysubs.dal.datastore_models import MediaSubtitlesModel, SubtitleModel, MediaModel, UserModel, \
+    TranscriptionCacheModel
 from pysubs.dal.firestore import FirestoreDatastore
-from pysubs.utils.models import YouTubeVideo, ConvertedFile, Media, MediaType, MediaSource
+from pysubs.utils.models import YouTubeVideo, ConvertedFile, Media, MediaType, MediaSource, IngestedFile, \
+    MediaAnalysis
+
+
+class MockStream:
+    def __init__(
+            self,
+            itag: int,
+            subtype: str,
+            abr: str = None,
+            resolution: str = None,
+            progressive: bool = False,
+            video_only: bool = False
+    ):
+        self.itag = itag
+        self.subtype = subtype
+        self.abr = abr
+        self.resolution = resolution
+        self.is_progressive = progressive
+        self.includes_audio_track = progressive or not video_only
+        self.includes_video_track = progressive or video_only
+        self.bitrate = None
 
 
 def mock_ffmpeg_convert(**_) -> None:
@@ -19,6 +43,10 @@ def mock_convert_to_mp3(media: Media) -> ConvertedFile:
     return ConvertedFile(local_storage_path="/file.mp3")
 
 
+def mock_decode_to_pcm(source: str, sample_rate: int = 16000) -> np.ndarray:
+    return np.zeros(sample_rate, dtype=np.float32)
+
+
 def mock_download_from_youtube(*_, **__) -> YouTubeVideo:
     return YouTubeVideo(
         title="test title",
@@ -49,6 +77,18 @@ def mock_write_content_to_file(local_storage_path: str, file_content: str | byte
     return local_storage_path
 
 
+def mock_copy_stream_to_file(source: BinaryIO, local_storage_path: str, max_bytes: int = None) -> IngestedFile:
+    return IngestedFile(local_storage_path=local_storage_path, byte_count=5, sha256=hashlib.sha256(b"12354").hexdigest())
+
+
+def mock_analyse_media(media_file_path: str) -> MediaAnalysis:
+    return MediaAnalysis(
+        duration=100.0,
+        thumbnail_path=mock_create_thumbnail(media_file_path),
+        pcm_path=f"{media_file_path}.f32"
+    )
+
+
 def mock_get_media_duration(media_file_path: str) -> float:
     return 100.0
 
@@ -69,7 +109,7 @@ def mock_download(_, media: Media) -> Media:
     return media
 
 
-def mock_process_audio(_, audio: Media) -> dict:
+def mock_process_audio(_, audio: Media, profile: Optional[str] = None) -> dict:
     return {"text": "subtitle"}
 
 
@@ -113,7 +153,7 @@ def mock_firestore_instance():
     return FirestoreDatastore
 
 
-def mock_get_history_for_user(user_id, last_created_at, count):
+def mock_get_history_for_user(user_id, last_created_at, count, include_content=True):
     media_id = str(uuid.uuid4())
     sub_id = str(uuid.uuid4())
     media = MediaModel(
@@ -129,7 +169,7 @@ def mock_get_history_for_user(user_id, last_created_at, count):
     subtitle = SubtitleModel(
         id=sub_id,
         media_id=media_id,
-        content="subtitles",
+        content="subtitles" if include_content else None,
         language="en",
         created_at=datetime.now(),
         expire_at=datetime.now(),
@@ -139,3 +179,73 @@ def mock_get_history_for_user(user_id, last_created_at, count):
 
 def mock_make_filename_unique(filename: str) -> str:
     return filename
+
+
+class MockUnitOfWork:
+    def __init__(self, datastore: "MockDatastore"):
+        self.datastore = datastore
+        self.writes = []
+
+    def __enter__(self) -> "MockUnitOfWork":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.commit()
+
+    def upsert_media(self, media: MediaModel) -> None:
+        self.writes.append(lambda: self.datastore.upsert_media(media))
+
+    def upsert_subtitle(self, subtitle: SubtitleModel) -> None:
+        self.writes.append(lambda: self.datastore.upsert_subtitle(subtitle))
+
+    def decrement_credits(self, user_id: str, amount: int) -> None:
+        def decrement():
+            self.datastore.users[user_id].credits -= amount
+        self.writes.append(decrement)
+
+    def commit(self) -> None:
+        for write in self.writes:
+            write()
+        self.datastore.commits += 1
+
+
+class MockDatastore:
+    """An in memory stand in for the datastore methods used while saving the generations"""
+    def __init__(self, users: list[UserModel]):
+        self.users = {user.id: user.copy() for user in users}
+        self.media: dict[str, MediaModel] = {}
+        self.subtitles: dict[str, SubtitleModel] = {}
+        self.cache: dict[str, TranscriptionCacheModel] = {}
+        self.commits = 0
+
+    def unit_of_work(self) -> MockUnitOfWork:
+        return MockUnitOfWork(self)
+
+    def get_user(self, user_id: str) -> UserModel:
+        return self.users[user_id].copy()
+
+    def upsert_user(self, user: UserModel) -> UserModel:
+        self.users[user.id] = user.copy()
+        return user
+
+    def upsert_media(self, media: MediaModel) -> MediaModel:
+        self.media[media.id] = media
+        return media
+
+    def upsert_subtitle(self, subtitle: SubtitleModel) -> SubtitleModel:
+        self.subtitles[subtitle.id] = subtitle
+        return subtitle
+
+    def get_media(self, media_id: str) -> MediaModel:
+        return self.media.get(media_id)
+
+    def get_subtitle(self, subtitle_id: str) -> SubtitleModel:
+        return self.subtitles.get(subtitle_id)
+
+    def get_cached_transcription(self, cache_key: str) -> TranscriptionCacheModel:
+        return self.cache.get(cache_key)
+
+    def upsert_cached_transcription(self, entry: TranscriptionCacheModel) -> TranscriptionCacheModel:
+        self.cache[entry.id] = entry
+        return entry
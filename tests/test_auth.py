@@ -0,0 +1,53 @@
+import time
+
+from pysubs.utils import auth
+
+
+class TestDecodeToken:
+    def test_verified_token_is_cached(self, monkeypatch):
+        verified = []
+
+        def verify_id_token(token: str) -> dict:
+            verified.append(token)
+            return {"user_id": "1", "exp": time.time() + 3600}
+
+        monkeypatch.setattr("firebase_admin.auth.verify_id_token", verify_id_token)
+        auth.get_token_cache().clear()
+        hits = auth.get_token_cache().stats()["hits"]
+        assert auth.decode_token("token-1")["user_id"] == "1"
+        assert auth.decode_token("token-1")["user_id"] == "1"
+        assert verified == ["token-1"]
+        assert auth.get_token_cache().stats()["hits"] == hits + 1
+
+    def test_expired_token_is_not_cached(self, monkeypatch):
+        verified = []
+
+        def verify_id_token(token: str) -> dict:
+            verified.append(token)
+            return {"user_id": "1", "exp": time.time() - 1}
+
+        monkeypatch.setattr("firebase_admin.auth.verify_id_token", verify_id_token)
+        auth.get_token_cache().clear()
+        auth.decode_token("token-2")
+        auth.decode_token("token-2")
+        assert verified == ["token-2", "token-2"]
+
+    def test_cache_size_is_read_on_first_use(self, monkeypatch):
+        monkeypatch.setattr(auth, "_token_caches", {})
+        monkeypatch.setenv("TOKEN_CACHE_SIZE", "5")
+        assert auth.get_token_cache().maxsize == 5
+        assert auth.get_token_cache() is auth.get_token_cache()
+
+
+class TestStreamToken:
+    def test_stream_token_is_valid_for_its_media(self):
+        stream_token = auth.issue_stream_token(user_id="1", media_id="media-1")
+        assert auth.redeem_stream_token(stream_token, "media-1") == "1"
+        assert auth.redeem_stream_token(stream_token, "media-2") is None
+        assert auth.redeem_stream_token("not-issued", "media-1") is None
+
+    def test_stream_token_expires(self, monkeypatch):
+        monkeypatch.setenv("STREAM_TOKEN_TTL_SECONDS", "0.01")
+        stream_token = auth.issue_stream_token(user_id="1", media_id="media-1")
+        time.sleep(0.05)
+        assert auth.redeem_stream_token(stream_token, "media-1") is None
@@ -0,0 +1,56 @@
+import time
+
+from pysubs.utils import ffmpeg_utils
+from pysubs.utils.cache import LRUCache
+from pysubs.utils.models import MediaAnalysis
+
+
+class TestLRUCache:
+    def test_least_recently_used_is_evicted(self):
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1}
+
+    def test_entries_expire(self):
+        cache = LRUCache(maxsize=2, ttl_seconds=60)
+        cache.put("a", 1)
+        cache.put("b", 2, ttl_seconds=0.01)
+        time.sleep(0.02)
+        assert cache.get("a") == 1
+        assert cache.get("b", "expired") == "expired"
+        assert cache.stats()["size"] == 1
+
+    def test_evicted_entries_are_reported(self):
+        evicted = []
+        cache = LRUCache(maxsize=1, on_evict=lambda key, value: evicted.append(key))
+        cache.put("a", 1)
+        cache.put("a", 2)
+        cache.put("b", 3)
+        cache.pop("b")
+        assert evicted == ["a", "b"]
+
+
+class TestProbeCache:
+    def test_parse_duration(self):
+        log = b"Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'test.mp4':\n  Duration: 01:02:03.50, start: 0.000000"
+        assert ffmpeg_utils._parse_duration(log) == 3723.5
+
+    def test_analysed_duration_is_reused(self, tmp_path, monkeypatch):
+        media_file_path = str(tmp_path / "test.mp4")
+        with open(media_file_path, "wb") as f:
+            f.write(b"12354")
+
+        def probe(_):
+            raise AssertionError("The analysed file must not be probed again")
+        monkeypatch.setattr("ffmpeg.probe", probe)
+        ffmpeg_utils.probe_cache.put(
+            ffmpeg_utils._get_probe_cache_key(media_file_path),
+            MediaAnalysis(duration=12.5, thumbnail_path=str(tmp_path / "test.jpg"))
+        )
+        assert ffmpeg_utils.get_media_duration(media_file_path) == 12.5
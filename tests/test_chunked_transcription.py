@@ -0,0 +1,56 @@
+import numpy as np
+
+from pysubs.utils.chunked_transcription import split_audio, stitch_segments, find_split_points, AudioChunk, \
+    SAMPLE_RATE
+
+
+def make_speech_with_pauses(seconds: int, pauses: list[float]) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    audio = rng.uniform(-0.5, 0.5, seconds * SAMPLE_RATE).astype(np.float32)
+    for pause in pauses:
+        audio[int(pause * SAMPLE_RATE):int((pause + 0.5) * SAMPLE_RATE)] = 0
+    return audio
+
+
+class TestChunkedTranscription:
+    def test_split_points_are_in_silence(self):
+        audio = make_speech_with_pauses(seconds=100, pauses=[28.0, 61.0, 92.0])
+        split_points = find_split_points(audio, chunk_seconds=30, search_seconds=5)
+        assert len(split_points) == 3
+        for point in split_points:
+            assert audio[point] == 0
+
+    def test_split_audio_covers_the_whole_audio(self):
+        audio = make_speech_with_pauses(seconds=100, pauses=[28.0, 61.0])
+        chunks = split_audio(audio, chunk_seconds=30, overlap_seconds=1)
+        assert chunks[0].core_start == 0
+        assert chunks[-1].core_end == len(audio)
+        for previous, current in zip(chunks, chunks[1:]):
+            assert previous.core_end == current.core_start
+            assert current.pad_start == current.core_start - SAMPLE_RATE
+
+    def test_short_audio_is_not_split(self):
+        audio = make_speech_with_pauses(seconds=20, pauses=[])
+        assert len(split_audio(audio, chunk_seconds=30, overlap_seconds=1)) == 1
+
+    def test_stitch_segments(self):
+        first = AudioChunk(index=0, core_start=0, core_end=10 * SAMPLE_RATE, pad_start=0, pad_end=11 * SAMPLE_RATE)
+        second = AudioChunk(
+            index=1, core_start=10 * SAMPLE_RATE, core_end=20 * SAMPLE_RATE, pad_start=9 * SAMPLE_RATE,
+            pad_end=20 * SAMPLE_RATE
+        )
+        results = [
+            (second, {"language": "en", "segments": [
+                {"id": 0, "start": 0.0, "end": 1.8, "text": " boundary"},
+                {"id": 1, "start": 2.0, "end": 5.0, "text": " second"},
+            ]}),
+            (first, {"language": "en", "segments": [
+                {"id": 0, "start": 0.0, "end": 4.0, "text": " first"},
+                {"id": 1, "start": 8.5, "end": 10.6, "text": " boundary"},
+            ]}),
+        ]
+        stitched = stitch_segments(results)
+        assert [segment["text"] for segment in stitched["segments"]] == [" first", " boundary", " second"]
+        assert [segment["id"] for segment in stitched["segments"]] == [0, 1, 2]
+        assert stitched["segments"][2]["start"] == 11.0
+        assert stitched["language"] == "en"
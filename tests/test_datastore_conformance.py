@@ -0,0 +1,141 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from pysubs.dal.datastore_models import TranscriptionCacheModel
+from pysubs.dal.firestore import FirestoreDatastore
+from pysubs.dal.sqlite import SQLiteDatastore
+from pysubs.exceptions.firestore import UserNotFoundError
+from pysubs.exceptions.media import NotEnoughCreditsToPerformGenerationError
+from pysubs.interfaces.datastore import Datastore
+from tests.fake_firestore import FakeFirestore, sample_user, make_media, make_subtitle
+
+
+@pytest.fixture(params=["firestore", "sqlite"])
+def datastore(request, tmp_path) -> Datastore:
+    if request.param == "firestore":
+        return FirestoreDatastore(db=FakeFirestore())
+    return SQLiteDatastore(path=str(tmp_path / "datastore.sqlite3"))
+
+
+class TestDatastoreConformance:
+    """The behaviour every Datastore implementation has to share"""
+    def test_users(self, datastore):
+        with pytest.raises(UserNotFoundError):
+            datastore.get_user("1")
+        datastore.upsert_user(sample_user)
+        assert datastore.get_user("1") == sample_user
+        datastore.upsert_user(sample_user.copy(update={"credits": 90}))
+        assert datastore.get_user("1").credits == 90
+
+    def test_media_and_subtitles(self, datastore):
+        assert datastore.get_media("media-1") is None
+        assert datastore.get_subtitle_for_media("media-1") is None
+        datastore.upsert_media(make_media(1))
+        datastore.upsert_subtitle(make_subtitle(1))
+        assert datastore.get_media("media-1") == make_media(1)
+        assert datastore.get_subtitle_for_media("media-1") == make_subtitle(1)
+        assert datastore.get_subtitle("subtitle-1") == make_subtitle(1)
+        assert datastore.get_subtitle("subtitle-2") is None
+
+    def test_history(self, datastore):
+        for i in range(5):
+            datastore.upsert_media(make_media(i))
+            datastore.upsert_subtitle(make_subtitle(i))
+        datastore.upsert_media(make_media(5, user_id="2"))
+        first_page = datastore.get_history_for_user(user_id="1", count=2)
+        second_page = datastore.get_history_for_user(
+            user_id="1", last_created_at=first_page[-1].media.created_at, count=10
+        )
+        assert [item.media.id for item in first_page + second_page] == [f"media-{i}" for i in reversed(range(5))]
+        assert all(item.subtitles == [make_subtitle(int(item.media.id[-1]))] for item in first_page + second_page)
+        summary = datastore.get_history_for_user(user_id="1", include_content=False)
+        assert all(item.subtitles[0].content is None for item in summary)
+        assert datastore.get_history_for_user(user_id="3") == []
+
+    def test_history_with_a_text_cursor(self, datastore):
+        for i in range(5):
+            datastore.upsert_media(make_media(i))
+            datastore.upsert_subtitle(make_subtitle(i))
+        first_page = datastore.get_history_for_user(user_id="1", count=2)
+        cursor = first_page[-1].media.created_at.isoformat()
+        for last_created_at in (cursor, f"{cursor}+00:00"):
+            second_page = datastore.get_history_for_user(user_id="1", last_created_at=last_created_at, count=10)
+            assert [item.media.id for item in second_page] == [f"media-{i}" for i in reversed(range(3))]
+
+    def test_unit_of_work(self, datastore):
+        datastore.upsert_user(sample_user)
+        with datastore.unit_of_work() as unit_of_work:
+            unit_of_work.upsert_media(make_media(1))
+            unit_of_work.upsert_subtitle(make_subtitle(1))
+            unit_of_work.decrement_credits(user_id="1", amount=3)
+        assert datastore.get_user("1").credits == 97
+        assert datastore.get_subtitle("subtitle-1") == make_subtitle(1)
+        with pytest.raises(RuntimeError):
+            with datastore.unit_of_work() as unit_of_work:
+                unit_of_work.upsert_media(make_media(2))
+                raise RuntimeError("failed")
+        assert datastore.get_media("media-2") is None
+
+    def test_credits_are_not_overdrawn(self, datastore):
+        datastore.upsert_user(sample_user.copy(update={"credits": 5}))
+        with pytest.raises(NotEnoughCreditsToPerformGenerationError):
+            with datastore.unit_of_work() as unit_of_work:
+                unit_of_work.upsert_media(make_media(1))
+                unit_of_work.decrement_credits(user_id="1", amount=6)
+        assert datastore.get_media("media-1") is None
+        with pytest.raises(UserNotFoundError):
+            with datastore.unit_of_work() as unit_of_work:
+                unit_of_work.decrement_credits(user_id="2", amount=1)
+
+    def test_concurrent_decrements(self, datastore):
+        datastore.upsert_user(sample_user.copy(update={"credits": 5}))
+        outcomes = []
+
+        def generate():
+            try:
+                with datastore.unit_of_work() as unit_of_work:
+                    unit_of_work.decrement_credits(user_id="1", amount=1)
+                outcomes.append(True)
+            except NotEnoughCreditsToPerformGenerationError:
+                outcomes.append(False)
+
+        threads = [threading.Thread(target=generate) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert outcomes.count(True) == 5
+        assert datastore.get_user("1").credits == 0
+
+    def test_long_subtitle(self, datastore):
+        subtitle = make_subtitle(1)
+        subtitle.content = "".join(f"{i}\n00:00:00,000 --> 00:00:01,000\n{'x' * i}\n\n" for i in range(2000))
+        datastore.upsert_subtitle(subtitle)
+        assert datastore.get_subtitle("subtitle-1").content == subtitle.content
+
+    def test_generation_lock(self, datastore):
+        assert datastore.acquire_generation_lock("media", owner="first", ttl_seconds=60)
+        assert datastore.acquire_generation_lock("media", owner="first", ttl_seconds=60)
+        assert not datastore.acquire_generation_lock("media", owner="second", ttl_seconds=60)
+        datastore.release_generation_lock("media", owner="second")
+        assert not datastore.acquire_generation_lock("media", owner="second", ttl_seconds=60)
+        datastore.release_generation_lock("media", owner="first")
+        assert datastore.acquire_generation_lock("media", owner="second", ttl_seconds=-1)
+        assert datastore.acquire_generation_lock("media", owner="first", ttl_seconds=60)
+
+    def test_expired_generation_lock_taken_over_is_not_released(self, datastore):
+        assert datastore.acquire_generation_lock("media", owner="first", ttl_seconds=-1)
+        assert datastore.acquire_generation_lock("media", owner="second", ttl_seconds=60)
+        datastore.release_generation_lock("media", owner="first")
+        assert not datastore.acquire_generation_lock("media", owner="third", ttl_seconds=60)
+
+    def test_transcription_cache(self, datastore):
+        entry = TranscriptionCacheModel(
+            id="key", content_id="content", model_name="base", language="en", detected_language="en",
+            content="subtitle", title="title", duration=60, thumbnail_url=None, created_at=datetime(2023, 1, 1)
+        )
+        assert datastore.get_cached_transcription("key") is None
+        datastore.upsert_cached_transcription(entry)
+        assert datastore.get_cached_transcription("key") == entry
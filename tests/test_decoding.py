@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+
+from pysubs.exceptions.models import InvalidDecodingProfileError
+from pysubs.utils.constants import EnvConstants, DecodingProfileName
+from pysubs.utils.decoding import get_decoding_profile
+from pysubs.utils.models import Media, MediaSource, MediaType
+from pysubs.utils.transcriber import WhisperTranscriber
+
+
+class FakeModel:
+    def __init__(self, name: str, calls: list):
+        self.name = name
+        self.calls = calls
+
+    def transcribe(self, audio, **options) -> dict:
+        self.calls.append((self.name, options))
+        return {"text": "", "segments": [], "language": "en"}
+
+
+class FakeRegistry:
+    def __init__(self):
+        self.calls = []
+
+    def get_model(self, name: str) -> FakeModel:
+        return FakeModel(name, self.calls)
+
+    @contextmanager
+    def use_model(self, name: str):
+        yield self.get_model(name)
+
+
+class TestDecodingProfiles:
+    def test_configured_profile_is_the_default(self, monkeypatch):
+        assert get_decoding_profile().name == DecodingProfileName.BALANCED
+        monkeypatch.setenv(EnvConstants.DECODING_PROFILE, DecodingProfileName.FAST)
+        assert get_decoding_profile().name == DecodingProfileName.FAST
+        assert get_decoding_profile("Accurate").name == DecodingProfileName.ACCURATE
+
+    def test_unknown_profile(self):
+        with pytest.raises(InvalidDecodingProfileError):
+            get_decoding_profile("fastest")
+
+    def test_profiles_set_the_model(self, monkeypatch):
+        monkeypatch.setenv(EnvConstants.WHISPER_MODEL, "base")
+        monkeypatch.setenv(EnvConstants.WHISPER_ACCURATE_MODEL, "medium")
+        assert get_decoding_profile(DecodingProfileName.FAST).model_name == "tiny"
+        assert get_decoding_profile(DecodingProfileName.BALANCED).model_name == "base"
+        assert get_decoding_profile(DecodingProfileName.ACCURATE).model_name == "medium"
+
+    def test_transcriber_decodes_with_the_profile(self, monkeypatch):
+        registry = FakeRegistry()
+        monkeypatch.setattr("pysubs.utils.model_registry.WhisperModelRegistry.instance", lambda: registry)
+        audio = Media(source=MediaSource.RAW_FILE, file_type=MediaType.PCM, pcm=np.zeros(16000, dtype=np.float32))
+        WhisperTranscriber().process_audio(audio, profile=DecodingProfileName.FAST)
+        WhisperTranscriber().process_audio(audio)
+        WhisperTranscriber(model_name="small").process_audio(audio, profile=DecodingProfileName.FAST)
+        assert registry.calls == [
+            ("tiny", {"temperature": 0.0, "condition_on_previous_text": False, "fp16": False}),
+            ("base", {}),
+            ("small", {"temperature": 0.0, "condition_on_previous_text": False, "fp16": False}),
+        ]
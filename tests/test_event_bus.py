@@ -0,0 +1,36 @@
+import asyncio
+import threading
+
+from pysubs.utils.event_bus import JobEventBus, JobEvent, JobEventStatus
+
+
+class TestJobEventBus:
+    def test_events_are_pushed_from_worker_threads(self):
+        bus = JobEventBus()
+
+        async def wait_for_job():
+            events = []
+            async with bus.subscribe("media") as subscription:
+                threading.Thread(target=lambda: [
+                    bus.publish(JobEvent(job_id="other", status=JobEventStatus.PENDING, stage="downloading")),
+                    bus.publish(JobEvent(job_id="media", status=JobEventStatus.PENDING, stage="downloading")),
+                    bus.publish(JobEvent(job_id="media", status=JobEventStatus.OK, data={"subtitle": "subtitle"})),
+                ]).start()
+                while not events or not events[-1].final:
+                    events.append(await asyncio.wait_for(subscription.get(), timeout=5))
+            return events
+
+        events = asyncio.run(wait_for_job())
+        assert [event.stage for event in events] == ["downloading", None]
+        assert events[-1].data == {"subtitle": "subtitle"}
+        assert bus.stats() == {"jobs": 0, "subscribers": 0, "published": 3, "delivered": 2}
+
+    def test_closed_loop_is_unsubscribed(self):
+        bus = JobEventBus()
+
+        async def subscribe():
+            return bus.subscribe("media")
+
+        asyncio.run(subscribe())
+        bus.publish(JobEvent(job_id="media", status=JobEventStatus.FAILED))
+        assert bus.stats()["subscribers"] == 0
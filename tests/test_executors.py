@@ -0,0 +1,28 @@
+import asyncio
+import threading
+import time
+
+from pysubs.utils.executors import BlockingExecutors, ExecutorKind
+
+
+class TestBlockingExecutors:
+    def test_blocking_call_does_not_stall_the_loop(self):
+        executors = BlockingExecutors(sizes={ExecutorKind.IO: 2, ExecutorKind.YOUTUBE: 1})
+
+        async def run():
+            slow = asyncio.create_task(executors.run(ExecutorKind.YOUTUBE, time.sleep, 0.5))
+            started_at = time.perf_counter()
+            thread_name = await executors.run(ExecutorKind.IO, lambda: threading.current_thread().name)
+            elapsed = time.perf_counter() - started_at
+            await slow
+            return thread_name, elapsed
+
+        thread_name, elapsed = asyncio.run(run())
+        executors.shutdown()
+        assert thread_name.startswith("pysubs-api-io")
+        assert elapsed < 0.25
+
+    def test_stats(self):
+        executors = BlockingExecutors(sizes={ExecutorKind.IO: 2})
+        assert executors.stats() == {ExecutorKind.IO: {"workers": 2, "queued": 0}}
+        executors.shutdown()
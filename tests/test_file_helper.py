@@ -0,0 +1,31 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from pysubs.exceptions.media import UploadTooLargeError
+from pysubs.utils import file_helper
+
+
+class TestFileHelper:
+    def test_copy_stream_to_file(self, tmp_path):
+        content = os.urandom(10_000)
+        local_storage_path = str(tmp_path / "upload.mp4")
+        ingested = file_helper.copy_stream_to_file(
+            source=io.BytesIO(content), local_storage_path=local_storage_path, max_bytes=10_000, chunk_bytes=1024
+        )
+        assert ingested.byte_count == len(content)
+        assert ingested.sha256 == hashlib.sha256(content).hexdigest()
+        with open(local_storage_path, "rb") as f:
+            assert f.read() == content
+
+    def test_copy_stream_to_file_rejects_large_upload(self, tmp_path):
+        local_storage_path = str(tmp_path / "upload.mp4")
+        source = io.BytesIO(os.urandom(10_000))
+        with pytest.raises(UploadTooLargeError):
+            file_helper.copy_stream_to_file(
+                source=source, local_storage_path=local_storage_path, max_bytes=4096, chunk_bytes=1024
+            )
+        assert source.tell() == 5 * 1024
+        assert not os.path.exists(local_storage_path)
@@ -0,0 +1,181 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from pysubs.dal.datastore_models import UserModel, MediaModel, SubtitleModel
+from pysubs.dal.firestore import FirestoreDatastore
+from pysubs.exceptions.firestore import UserNotFoundError
+from tests.fake_firestore import FakeFirestore, add_history
+
+sample_user = UserModel(id="1", credits=100, displayName="pla", email="str@str.com", createdAt=datetime.now())
+
+
+def wait_for_unwatch(fs: FirestoreDatastore) -> None:
+    """Waits for the listeners of the evicted users to be stopped, the unwatch executor runs one task at a time"""
+    fs._unwatch_executor.submit(lambda: None).result()
+
+
+class TestUserCache:
+    def test_user_reads_are_cached(self):
+        db = FakeFirestore()
+        db.collection("users").document("1").set(sample_user.dict())
+        fs = FirestoreDatastore(db=db)
+        assert fs.get_user("1") == sample_user
+        assert fs.get_user("1") == sample_user
+        assert db.reads == 1
+        assert fs.user_cache.stats()["hits"] == 1
+
+    def test_returned_user_does_not_change_the_cache(self):
+        db = FakeFirestore()
+        db.collection("users").document("1").set(sample_user.dict())
+        fs = FirestoreDatastore(db=db)
+        fs.get_user("1").credits = 0
+        assert fs.get_user("1").credits == 100
+
+    def test_upsert_user_writes_through(self):
+        db = FakeFirestore()
+        db.collection("users").document("1").set(sample_user.dict())
+        fs = FirestoreDatastore(db=db)
+        user = fs.get_user("1")
+        user.credits = 90
+        fs.upsert_user(user)
+        assert fs.get_user("1").credits == 90
+        assert db.reads == 1
+
+    def test_changes_from_elsewhere_replace_the_cached_user(self):
+        db = FakeFirestore()
+        db.collection("users").document("1").set(sample_user.dict())
+        fs = FirestoreDatastore(db=db)
+        fs.get_user("1")
+        db.collection("users").document("1").set({"credits": 500}, merge=True)
+        assert fs.get_user("1").credits == 500
+        assert db.reads == 1
+
+    def test_evicted_user_is_not_watched(self):
+        db = FakeFirestore()
+        db.collection("users").document("1").set(sample_user.dict())
+        fs = FirestoreDatastore(db=db)
+        fs.get_user("1")
+        assert db.watchers[("users", "1")]
+        fs.user_cache.clear()
+        wait_for_unwatch(fs)
+        assert not db.watchers[("users", "1")]
+
+    def test_deleted_user_is_not_unwatched_on_the_listener_thread(self):
+        db = FakeFirestore()
+        db.collection("users").document("1").set(sample_user.dict())
+        fs = FirestoreDatastore(db=db)
+        fs.get_user("1")
+        watch = fs._user_watches["1"]
+        unsubscribe = watch.unsubscribe
+        threads = []
+
+        def record_unsubscribe():
+            threads.append(threading.current_thread())
+            unsubscribe()
+
+        watch.unsubscribe = record_unsubscribe
+        # the fake runs the callbacks of the listeners on the thread which writes the document
+        db.collection("users").document("1").delete()
+        wait_for_unwatch(fs)
+        assert threads and threads[0] is not threading.current_thread()
+        assert not db.watchers[("users", "1")]
+        with pytest.raises(UserNotFoundError):
+            fs.get_user("1")
+
+    def test_user_watches_are_limited(self, monkeypatch):
+        monkeypatch.setenv("USER_WATCH_LIMIT", "2")
+        db = FakeFirestore()
+        for user_id in ["1", "2", "3"]:
+            db.collection("users").document(user_id).set(sample_user.copy(update={"id": user_id}).dict())
+        fs = FirestoreDatastore(db=db)
+        for user_id in ["1", "2", "3"]:
+            fs.get_user(user_id)
+        assert [user_id for (_, user_id), watchers in db.watchers.items() if watchers] == ["1", "2"]
+        assert fs.user_cache.stats()["size"] == 3
+
+    def test_unit_of_work_updates_the_cached_user(self):
+        db = FakeFirestore()
+        db.collection("users").document("1").set(sample_user.dict())
+        fs = FirestoreDatastore(db=db)
+        fs.get_user("1")
+        with fs.unit_of_work() as unit_of_work:
+            unit_of_work.decrement_credits(user_id="1", amount=3)
+        assert db.watchers[("users", "1")]
+        reads = db.reads
+        assert fs.get_user("1").credits == sample_user.credits - 3
+        assert db.reads == reads
+
+
+class TestHistory:
+    def test_history_page_is_fetched_in_batches(self):
+        db = FakeFirestore()
+        add_history(db, user_id="1", count=25)
+        fs = FirestoreDatastore(db=db)
+        history = fs.get_history_for_user(user_id="1", count=100)
+        assert db.queries == 1 + 3
+        assert [item.media.id for item in history] == [f"media-{i}" for i in reversed(range(25))]
+        assert all(item.subtitles[0].media_id == item.media.id for item in history)
+        assert all(len(item.subtitles) == 1 for item in history)
+
+    def test_history_pagination(self):
+        db = FakeFirestore()
+        add_history(db, user_id="1", count=5)
+        fs = FirestoreDatastore(db=db)
+        first_page = fs.get_history_for_user(user_id="1", count=2)
+        second_page = fs.get_history_for_user(user_id="1", last_created_at=first_page[-1].media.created_at, count=2)
+        assert [item.media.id for item in first_page + second_page] == ["media-4", "media-3", "media-2", "media-1"]
+
+    def test_summary_leaves_out_the_content(self):
+        db = FakeFirestore()
+        add_history(db, user_id="1", count=3)
+        fs = FirestoreDatastore(db=db)
+        history = fs.get_history_for_user(user_id="1", include_content=False)
+        assert all(item.subtitles[0].content is None for item in history)
+        assert fs.get_subtitle("subtitle-0").content == "subtitle 0"
+        assert fs.get_subtitle("subtitle-9") is None
+
+    def test_empty_history(self):
+        db = FakeFirestore()
+        fs = FirestoreDatastore(db=db)
+        assert fs.get_history_for_user(user_id="1") == []
+        assert db.queries == 1
+
+
+class TestUnitOfWork:
+    def test_generation_is_committed_in_one_round_trip(self):
+        db = FakeFirestore()
+        db.collection("users").document("1").set(sample_user.dict())
+        fs = FirestoreDatastore(db=db)
+        fs.get_user("1")
+        media = MediaModel(
+            id="media", user_id="1", title="title", duration=60, media_url="https://youtube.com/1",
+            media_source="youtube", thumbnail_url="https://yt.com/be.jpg", created_at=datetime(2023, 1, 1)
+        )
+        subtitle = SubtitleModel(
+            id="subtitle", media_id="media", content="subtitle", created_at=datetime(2023, 1, 1),
+            expire_at=datetime(2023, 1, 11)
+        )
+        with fs.unit_of_work() as unit_of_work:
+            unit_of_work.upsert_media(media)
+            unit_of_work.upsert_subtitle(subtitle)
+            unit_of_work.decrement_credits(user_id="1", amount=3)
+        assert db.commits == 1
+        assert db.data["users"]["1"]["credits"] == 97
+        assert db.data["media"]["media"]["title"] == "title"
+        assert fs.get_subtitle("subtitle").content == "subtitle"
+        assert fs.get_user("1").credits == 97
+
+    def test_failed_unit_of_work_is_not_committed(self):
+        db = FakeFirestore()
+        fs = FirestoreDatastore(db=db)
+        subtitle = SubtitleModel(
+            id="subtitle", media_id="media", content="subtitle", created_at=datetime(2023, 1, 1),
+            expire_at=datetime(2023, 1, 11)
+        )
+        with pytest.raises(UserNotFoundError):
+            with fs.unit_of_work() as unit_of_work:
+                unit_of_work.upsert_subtitle(subtitle)
+                unit_of_work.decrement_credits(user_id="missing", amount=3)
+        assert "subtitle" not in db.data.get("subtitles", {})
@@ -0,0 +1,18 @@
+import os
+
+from tests.helpers import measure_import_time, WORKER_MODULES
+
+# a generous bound of the cold start import of the API in seconds, it took more than 2 seconds with whisper and torch
+# and takes a fraction of a second without them, so a loaded test runner does not fail it.
+# API_IMPORT_BUDGET_SECONDS overrides it, e.g. with a tighter bound on a dedicated machine
+API_IMPORT_BUDGET_SECONDS: float = float(os.getenv("API_IMPORT_BUDGET_SECONDS") or 5)
+
+
+class TestImportTime:
+    def test_api_does_not_import_the_worker_modules(self):
+        timings = measure_import_time("pysubs.main")
+        assert [module for module in WORKER_MODULES if module in timings] == []
+
+    def test_api_import_is_within_the_budget(self):
+        timings = measure_import_time("pysubs.main")
+        assert timings["pysubs.main"] / 1e6 < API_IMPORT_BUDGET_SECONDS
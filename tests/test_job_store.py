@@ -0,0 +1,113 @@
+import sqlite3
+
+from pysubs.dal.job_store import SQLiteJobStore, JobStatus
+
+
+class TestSQLiteJobStore:
+    def test_wal_mode(self, tmp_path):
+        store = SQLiteJobStore(path=str(tmp_path / "jobs.sqlite3"))
+        with store._connect() as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_claim_takes_a_lease(self, tmp_path):
+        store = SQLiteJobStore(path=str(tmp_path / "jobs.sqlite3"))
+        store.enqueue(job_id="1", kind="youtube", payload={"media": {"id": "1"}}, max_attempts=3)
+        job = store.claim(owner="worker-1", lease_seconds=60)
+        assert job.status == JobStatus.RUNNING
+        assert job.attempts == 1
+        assert job.payload == {"media": {"id": "1"}}
+        assert store.claim(owner="worker-2", lease_seconds=60) is None
+        assert store.extend_lease(job_id="1", owner="worker-1", lease_seconds=60)
+        assert not store.extend_lease(job_id="1", owner="worker-2", lease_seconds=60)
+
+    def test_expired_lease_is_claimed_again(self, tmp_path):
+        store = SQLiteJobStore(path=str(tmp_path / "jobs.sqlite3"))
+        store.enqueue(job_id="1", kind="youtube", payload={}, max_attempts=3)
+        store.claim(owner="worker-1", lease_seconds=-1)
+        job = store.claim(owner="worker-2", lease_seconds=60)
+        assert job.lease_owner == "worker-2"
+        assert job.attempts == 2
+
+    def test_outcome_of_an_expired_lease_is_dropped(self, tmp_path):
+        store = SQLiteJobStore(path=str(tmp_path / "jobs.sqlite3"))
+        store.enqueue(job_id="1", kind="youtube", payload={}, max_attempts=3)
+        store.claim(owner="worker-1", lease_seconds=-1)
+        store.claim(owner="worker-2", lease_seconds=60)
+        assert not store.complete(job_id="1", owner="worker-1")
+        assert not store.fail(job_id="1", owner="worker-1", error="timeout")
+        job = store.get("1")
+        assert job.status == JobStatus.RUNNING
+        assert job.lease_owner == "worker-2"
+        assert store.complete(job_id="1", owner="worker-2")
+        assert store.get("1").status == JobStatus.SUCCEEDED
+
+    def test_abandoned_job_is_not_resumed_forever(self, tmp_path):
+        store = SQLiteJobStore(path=str(tmp_path / "jobs.sqlite3"))
+        store.enqueue(job_id="1", kind="youtube", payload={}, max_attempts=2)
+        store.claim(owner="worker-1", lease_seconds=-1)
+        assert store.fail_abandoned() == []
+        store.claim(owner="worker-2", lease_seconds=-1)
+        assert store.claim(owner="worker-3", lease_seconds=60) is None
+        assert [job.id for job in store.fail_abandoned()] == ["1"]
+        assert store.get("1").status == JobStatus.FAILED
+        assert store.fail_abandoned() == []
+
+    def test_failed_attempt_waits_for_backoff(self, tmp_path):
+        store = SQLiteJobStore(path=str(tmp_path / "jobs.sqlite3"))
+        store.enqueue(job_id="1", kind="youtube", payload={}, max_attempts=3)
+        store.claim(owner="worker-1", lease_seconds=60)
+        assert store.fail(job_id="1", owner="worker-1", error="timeout", retry_in=60)
+        assert store.get("1").status == JobStatus.QUEUED
+        assert store.claim(owner="worker-1", lease_seconds=60) is None
+        store.enqueue(job_id="2", kind="youtube", payload={}, max_attempts=3)
+        store.claim(owner="worker-1", lease_seconds=60)
+        assert store.fail(job_id="2", owner="worker-1", error="timeout")
+        assert store.get("2").status == JobStatus.FAILED
+
+    def test_stages_and_counts(self, tmp_path):
+        store = SQLiteJobStore(path=str(tmp_path / "jobs.sqlite3"))
+        store.enqueue(job_id="1", kind="youtube", payload={}, max_attempts=3)
+        store.enqueue(job_id="2", kind="youtube", payload={}, max_attempts=3)
+        store.claim(owner="worker-1", lease_seconds=60)
+        store.set_stage(job_id="1", stage="downloading")
+        assert store.get("1").stage == "downloading"
+        assert store.count(JobStatus.QUEUED) == 1
+        assert store.complete(job_id="1", owner="worker-1")
+        assert store.get("1").status == JobStatus.SUCCEEDED
+
+    def test_active_job_is_not_replaced(self, tmp_path):
+        store = SQLiteJobStore(path=str(tmp_path / "jobs.sqlite3"))
+        _, created = store.enqueue(job_id="1", kind="youtube", payload={"first": True}, max_attempts=3)
+        assert created
+        job, created = store.enqueue(job_id="1", kind="youtube", payload={"first": False}, max_attempts=3)
+        assert not created
+        assert job.payload == {"first": True}
+        store.claim(owner="worker-1", lease_seconds=60)
+        store.fail(job_id="1", owner="worker-1", error="failed")
+        _, created = store.enqueue(job_id="1", kind="youtube", payload={"first": False}, max_attempts=3)
+        assert created
+
+    def test_decoding_is_recorded(self, tmp_path):
+        store = SQLiteJobStore(path=str(tmp_path / "jobs.sqlite3"))
+        store.enqueue(job_id="1", kind="youtube", payload={}, max_attempts=3)
+        assert store.get("1").decoding_profile is None
+        store.set_decoding(job_id="1", decoding_profile="fast", real_time_factor=0.25)
+        job = store.get("1")
+        assert job.decoding_profile == "fast"
+        assert job.real_time_factor == 0.25
+
+    def test_columns_are_added_to_an_existing_database(self, tmp_path):
+        path = str(tmp_path / "jobs.sqlite3")
+        with sqlite3.connect(path) as conn:
+            conn.execute("""
+                CREATE TABLE jobs (
+                    id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, status TEXT NOT NULL, stage TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL, lease_owner TEXT,
+                    lease_expires_at REAL, next_attempt_at REAL NOT NULL, last_error TEXT, created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+        store = SQLiteJobStore(path=path)
+        store.enqueue(job_id="1", kind="youtube", payload={}, max_attempts=3)
+        store.set_decoding(job_id="1", decoding_profile="accurate", real_time_factor=1.5)
+        assert store.get("1").decoding_profile == "accurate"
@@ -4,13 +4,14 @@ import os
 from collections import OrderedDict
 from datetime import datetime
 from typing import BinaryIO
+import numpy as np
 from fastapi import UploadFile
 
 from pysubs.dal.datastore_models import UserModel
 from pysubs.utils.media.file import FileMediaManager
 from pysubs.utils.models import MediaSource, MediaType, Media
-from tests.mock_functions import mock_write_content_to_file, mock_get_media_duration, mock_create_thumbnail, \
-    mock_get_base64_src_for_image, mock_convert_to_mp3, mock_make_filename_unique
+from tests.mock_functions import mock_copy_stream_to_file, mock_analyse_media, \
+    mock_get_base64_src_for_image, mock_convert_to_mp3, mock_make_filename_unique, mock_decode_to_pcm
 
 file = BinaryIO()
 file.write(b"12354")
@@ -36,16 +37,12 @@ sample_user = UserModel(
 class TestFileMediaManager:
     def test_get_media_info(self, monkeypatch):
         monkeypatch.setattr(
-            "pysubs.utils.file_helper.write_content_to_file",
-            mock_write_content_to_file
+            "pysubs.utils.file_helper.copy_stream_to_file",
+            mock_copy_stream_to_file
         )
         monkeypatch.setattr(
-            "pysubs.utils.ffmpeg_utils.get_media_duration",
-            mock_get_media_duration
-        )
-        monkeypatch.setattr(
-            "pysubs.utils.ffmpeg_utils.create_thumbnail",
-            mock_create_thumbnail
+            "pysubs.utils.ffmpeg_utils.analyse_media",
+            mock_analyse_media
         )
         monkeypatch.setattr(
             "pysubs.utils.conversion.get_base64_src_for_image",
@@ -56,6 +53,7 @@ class TestFileMediaManager:
         assert "data:image/jpeg;base64," in media.thumbnail_url
         assert media.source == MediaSource.RAW_FILE
         assert media.file_type == MediaType.MP4
+        assert media.content_id == f"sha256:{hashlib.sha256(b'12354').hexdigest()}"
 
     def test_make_filename_unique(self):
         filename = "test.mp4"
@@ -83,6 +81,26 @@ class TestFileMediaManager:
         result = mgr.convert(media=sample_media, to_type=MediaType.MP3)
         assert result.file_type == MediaType.MP3
 
+    def test_convert_to_pcm(self, monkeypatch):
+        monkeypatch.setattr(
+            "pysubs.utils.conversion.decode_to_pcm",
+            mock_decode_to_pcm
+        )
+        mgr = FileMediaManager()
+        result = mgr.convert(media=sample_media, to_type=MediaType.PCM)
+        assert result.file_type == MediaType.PCM
+        assert result.local_storage_path is None
+        assert len(result.pcm) == 16000
+
+    def test_convert_to_pcm_uses_analysed_audio(self, tmp_path):
+        local_storage_path = str(tmp_path / "test.mp4")
+        np.arange(16000, dtype=np.float32).tofile(f"{local_storage_path}.f32")
+        media = Media(id="1", source=MediaSource.RAW_FILE, file_type=MediaType.MP4, local_storage_path=local_storage_path)
+        result = FileMediaManager().convert(media=media, to_type=MediaType.PCM)
+        assert result.file_type == MediaType.PCM
+        assert result.pcm.dtype == np.float32
+        assert result.pcm[-1] == 15999
+
     def test_generate_media_id(self, monkeypatch):
         monkeypatch.setattr(
             "pysubs.utils.media.file.FileMediaManager.make_filename_unique",
@@ -3,14 +3,17 @@ import json
 from collections import OrderedDict
 from datetime import timedelta, datetime
 
+import numpy as np
 import pytest
+from pytube import StreamQuery
 
 from pysubs.dal.datastore_models import UserModel
 from pysubs.exceptions.media import UnsupportedMediaDownloadError, UnsupportedMediaConversionError
 from pysubs.utils.conversion import convert_to_mp3 as convert_to_mp3
 from pysubs.utils.models import Media, MediaSource, MediaType, ConvertedFile
 from pysubs.utils.media.youtube import YouTubeMediaManager
-from tests.mock_functions import mock_download_from_youtube, mock_convert_to_mp3, mock_ffmpeg_convert, mock_convert
+from tests.mock_functions import mock_download_from_youtube, mock_convert_to_mp3, mock_ffmpeg_convert, mock_convert, \
+    mock_decode_to_pcm, MockStream
 
 
 sample_media = Media(
@@ -106,6 +109,16 @@ class TestYTMediaManager:
         assert result.title == "test title"
         assert result.file_type == MediaType.MP3
 
+    def test_mp4_convert_to_pcm(self, monkeypatch):
+        monkeypatch.setattr(
+            "pysubs.utils.conversion.decode_to_pcm",
+            mock_decode_to_pcm
+        )
+        obj = YouTubeMediaManager()
+        result = obj.convert(media=self.mp4_media, to_type=MediaType.PCM)
+        assert result.file_type == MediaType.PCM
+        assert result.pcm.dtype == np.float32
+
     def test_mp3_convert(self, monkeypatch):
         monkeypatch.setattr(
             "pysubs.utils.conversion.convert_to_mp3",
@@ -156,3 +169,22 @@ class TestYTMediaManager:
         })
         key_helper = json.dumps(key_helper_dict).encode("utf-8")
         assert hashlib.sha256(key_helper).hexdigest() == media_id
+
+    def test_select_smallest_adequate_audio_stream(self):
+        streams = StreamQuery([
+            MockStream(itag=18, progressive=True, subtype="mp4", resolution="360p"),
+            MockStream(itag=140, subtype="mp4", abr="128kbps"),
+            MockStream(itag=249, subtype="webm", abr="50kbps"),
+            MockStream(itag=139, subtype="mp4", abr="48kbps"),
+            MockStream(itag=599, subtype="mp4", abr="30kbps"),
+        ])
+        assert YouTubeMediaManager._select_stream(streams, min_audio_kbps=48).itag == 139
+        assert YouTubeMediaManager._select_stream(streams, min_audio_kbps=200).itag == 140
+
+    def test_select_progressive_stream_without_audio_streams(self):
+        streams = StreamQuery([
+            MockStream(itag=22, progressive=True, subtype="mp4", resolution="720p"),
+            MockStream(itag=18, progressive=True, subtype="mp4", resolution="360p"),
+            MockStream(itag=137, subtype="mp4", resolution="1080p", video_only=True),
+        ])
+        assert YouTubeMediaManager._select_stream(streams, min_audio_kbps=48).itag == 18
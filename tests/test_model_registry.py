@@ -0,0 +1,116 @@
+import threading
+import time
+
+import numpy as np
+
+from pysubs.utils.model_registry import WhisperModelRegistry
+from pysubs.utils.models import Media, MediaSource, MediaType
+from pysubs.utils.transcriber import WhisperTranscriber
+
+MODEL_SIZES = {"tiny": 40, "base": 70, "small": 240}
+
+
+class FakeModel:
+    def __init__(self, name: str):
+        self.name = name
+        self.transcribing = 0
+        self.max_transcribing = 0
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio, **options) -> dict:
+        with self._lock:
+            self.transcribing += 1
+            self.max_transcribing = max(self.max_transcribing, self.transcribing)
+        time.sleep(0.05)
+        with self._lock:
+            self.transcribing -= 1
+        return {"text": "", "segments": [], "language": "en"}
+
+
+class TestWhisperModelRegistry:
+    def make_registry(self, budget: int, loads: list) -> WhisperModelRegistry:
+        def loader(name: str) -> FakeModel:
+            loads.append(name)
+            time.sleep(0.01)
+            return FakeModel(name)
+        return WhisperModelRegistry(
+            memory_budget_bytes=budget,
+            loader=loader,
+            sizer=lambda model: MODEL_SIZES[model.name]
+        )
+
+    def test_model_is_loaded_once(self):
+        loads = []
+        registry = self.make_registry(budget=1000, loads=loads)
+        first = registry.get_model("base")
+        second = registry.get_model("base")
+        assert first is second
+        assert loads == ["base"]
+
+    def test_concurrent_loads_share_weights(self):
+        loads = []
+        registry = self.make_registry(budget=1000, loads=loads)
+        models = []
+        threads = [threading.Thread(target=lambda: models.append(registry.get_model("base"))) for _ in range(8)]
+        for thr in threads:
+            thr.start()
+        for thr in threads:
+            thr.join()
+        assert loads == ["base"]
+        assert all(model is models[0] for model in models)
+
+    def test_least_recently_used_is_evicted(self):
+        loads = []
+        registry = self.make_registry(budget=120, loads=loads)
+        registry.preload(["tiny", "base"])
+        registry.get_model("tiny")
+        registry.get_model("small")
+        assert list(registry.stats()["models"]) == ["small"]
+        registry.get_model("tiny")
+        registry.get_model("base")
+        assert list(registry.stats()["models"]) == ["tiny", "base"]
+        assert loads == ["tiny", "base", "small", "tiny", "base"]
+
+    def test_stats(self):
+        registry = self.make_registry(budget=1000, loads=[])
+        registry.get_model("tiny")
+        stats = registry.stats()
+        assert stats["resident_bytes"] == MODEL_SIZES["tiny"]
+        assert stats["models"]["tiny"]["load_seconds"] > 0
+
+    def test_transcriber_uses_registry(self, monkeypatch):
+        registry = self.make_registry(budget=1000, loads=[])
+        monkeypatch.setattr(
+            "pysubs.utils.model_registry.WhisperModelRegistry.instance",
+            lambda: registry
+        )
+        assert WhisperTranscriber(model_name="tiny").model is WhisperTranscriber(model_name="tiny").model
+
+    def test_concurrent_transcriptions_do_not_share_the_model(self, monkeypatch):
+        loads = []
+        registry = self.make_registry(budget=1000, loads=loads)
+        monkeypatch.setattr(
+            "pysubs.utils.model_registry.WhisperModelRegistry.instance",
+            lambda: registry
+        )
+        audio = Media(source=MediaSource.RAW_FILE, file_type=MediaType.PCM, pcm=np.zeros(16000, dtype=np.float32))
+        threads = [
+            threading.Thread(target=WhisperTranscriber(model_name="base").process_audio, args=(audio,))
+            for _ in range(2)
+        ]
+        for thr in threads:
+            thr.start()
+        for thr in threads:
+            thr.join()
+        assert loads == ["base"]
+        assert registry.get_model("base").max_transcribing == 1
+        assert registry.stats()["models"]["base"]["users"] == 0
+
+    def test_model_in_use_is_not_evicted(self):
+        loads = []
+        registry = self.make_registry(budget=120, loads=loads)
+        with registry.use_model("tiny"):
+            registry.get_model("base")
+            registry.get_model("small")
+            assert list(registry.stats()["models"]) == ["tiny", "small"]
+        assert list(registry.stats()["models"]) == ["small"]
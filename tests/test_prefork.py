@@ -0,0 +1,69 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from pysubs.utils.prefork import PreforkSupervisor, read_process_memory
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="the workers are forked and their memory is read from /proc"
+)
+
+# stands in for the weights of the models, loaded by the supervisor before the fork
+shared_weights: list[bytes] = []
+
+
+def load_weights() -> None:
+    shared_weights.append(os.urandom(32 * 1024 * 1024))
+
+
+def wait_for(condition, timeout_seconds: float = 10) -> None:
+    deadline = time.time() + timeout_seconds
+    while time.time() < deadline:
+        if condition():
+            return
+        time.sleep(0.05)
+    raise AssertionError("The condition was not met in time")
+
+
+def start(supervisor: PreforkSupervisor) -> threading.Thread:
+    thr = threading.Thread(target=supervisor.run, daemon=True)
+    thr.start()
+    return thr
+
+
+class TestPreforkSupervisor:
+    def test_workers_share_the_preloaded_pages(self):
+        supervisor = PreforkSupervisor(processes=2, preload=load_weights, target=lambda stopped: stopped.wait())
+        thr = start(supervisor)
+        try:
+            wait_for(lambda: len(supervisor.get_worker_pids()) == 2)
+            workers = supervisor.stats()["workers"]
+            assert all(worker["shared"] >= 32 * 1024 * 1024 for worker in workers)
+            assert all(worker["private"] < worker["shared"] for worker in workers)
+        finally:
+            supervisor.stop()
+            thr.join(timeout=10)
+        assert supervisor.get_worker_pids() == []
+
+    def test_crashed_worker_is_restarted(self, tmp_path):
+        def target(stopped: threading.Event) -> None:
+            if not (marker := tmp_path / "crashed").exists():
+                marker.touch()
+                raise RuntimeError("crashed")
+            stopped.wait()
+
+        supervisor = PreforkSupervisor(processes=1, preload=lambda: None, target=target, restart_seconds=0.01)
+        thr = start(supervisor)
+        try:
+            wait_for(lambda: supervisor.stats()["restarts"] == 1 and len(supervisor.get_worker_pids()) == 1)
+        finally:
+            supervisor.stop()
+            thr.join(timeout=10)
+
+    def test_memory_of_this_process(self):
+        memory = read_process_memory(os.getpid())
+        assert memory.rss >= memory.private > 0
+        assert read_process_memory(-1) is None
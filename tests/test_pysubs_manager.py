@@ -8,14 +8,18 @@ from typing import BinaryIO
 import pytest
 from fastapi import UploadFile
 
-from pysubs.dal.datastore_models import UserModel
+from pysubs.dal.datastore_models import UserModel, JobModel
 from pysubs.exceptions.media import NotEnoughCreditsToPerformGenerationError
+from pysubs.exceptions.scheduler import DecodingProfileConflictError
 from pysubs.utils.pysubs_manager import get_audio_from_yt_video, get_subtitles_from_audio, generate_transcription_id, \
-    check_if_user_can_generate, get_audio_from_video_file, get_remaining_credits, get_history
-from pysubs.utils.models import Media, MediaType, MediaSource
+    check_if_user_can_generate, get_audio_from_video_file, get_remaining_credits, get_history, cache_transcription, \
+    save_cached_transcription, save_transcription_attempt, get_subtitle_content, generate_cache_key, \
+    check_in_flight_decoding_profile
+from pysubs.utils.media.youtube import YouTubeMediaManager
+from pysubs.utils.models import Media, MediaType, MediaSource, Transcription
 from tests.mock_functions import mock_download, mock_convert, mock_process_audio, mock_generate_subtitles, \
     mock_firestore_instance, mock_get_history_for_user, mock_get_media_info_for_yt, \
-    mock_get_media_info_for_file
+    mock_get_media_info_for_file, MockDatastore
 
 sample_file = BinaryIO()
 sample_file.write(b"12354")
@@ -52,7 +56,7 @@ class TestPySubsManager:
             source_url="https://youtube.com/testvideo"
         )
         media = get_audio_from_yt_video(video=video, user=user)
-        assert media.file_type == MediaType.MP3
+        assert media.file_type == MediaType.PCM
         assert media.source_url == video_url
 
     def test_get_audio_from_video_file(self, monkeypatch):
@@ -81,7 +85,7 @@ class TestPySubsManager:
             file_type=MediaType.MP4,
         )
         media = get_audio_from_video_file(video=video, user=user)
-        assert media.file_type == MediaType.MP3
+        assert media.file_type == MediaType.PCM
 
     def test_get_subtitles_from_audio(self, monkeypatch):
         monkeypatch.setattr(
@@ -105,6 +109,9 @@ class TestPySubsManager:
         )
         transcription = get_subtitles_from_audio(audio=audio)
         assert transcription.media_id == audio.id
+        assert transcription.decoding_profile == "balanced"
+        assert transcription.real_time_factor >= 0
+        assert get_subtitles_from_audio(audio=audio, decoding_profile="fast").decoding_profile == "fast"
 
     def test_generate_transcription_id(self):
         media_id = "1234"
@@ -173,3 +180,115 @@ class TestPySubsManager:
         history = get_history(last_created_at=current_datetime, count=1, user=self.user)
         assert len(history) == 1
         assert history[0].created_at == current_datetime
+        assert history[0].subtitle == "subtitles"
+        summary = get_history(last_created_at=current_datetime, count=1, user=self.user, summary=True)
+        assert summary[0].subtitle is None
+
+    def test_media_payload_round_trip(self):
+        media = Media(
+            id="123456",
+            title="title",
+            source=MediaSource.YOUTUBE,
+            file_type=MediaType.MP4,
+            source_url="https://youtube.com/testvideo",
+            duration=timedelta(minutes=2),
+            local_storage_path="/file.mp4",
+        )
+        restored = Media.from_dict(json.loads(json.dumps(media.to_dict())))
+        assert restored == media
+
+    def test_transcription_cache_is_shared_across_users(self, monkeypatch):
+        first_user = UserModel(id="first", credits=10, displayName="", email="", createdAt=datetime.now())
+        second_user = UserModel(id="second", credits=10, displayName="", email="", createdAt=datetime.now())
+        datastore = MockDatastore(users=[first_user, second_user])
+        monkeypatch.setattr(
+            "pysubs.dal.firestore.FirestoreDatastore.instance",
+            lambda: datastore
+        )
+        first = YouTubeMediaManager.create_media(video_source="https://youtu.be/dQw4w9WgXcQ", user=first_user)
+        second = YouTubeMediaManager.create_media(
+            video_source="https://www.youtube.com/watch?v=dQw4w9WgXcQ", user=second_user
+        )
+        assert first.id != second.id
+        assert first.content_id == second.content_id == "youtube:dQw4w9WgXcQ"
+        assert not save_cached_transcription(media=second, user=second_user)
+        first.title = "title"
+        first.duration = timedelta(minutes=2)
+        cache_transcription(first, Transcription(id="1", content="subtitle", language="en", media_id=first.id))
+        assert save_cached_transcription(media=second, user=second_user)
+        assert datastore.media[second.id].title == "title"
+        assert datastore.media[second.id].user_id == second_user.id
+        subtitle = datastore.subtitles[generate_transcription_id(media_id=second.id, language="en")]
+        assert subtitle.content == "subtitle"
+        assert datastore.users[second_user.id].credits == 9
+
+    def test_transcription_cache_is_kept_per_decoding_profile(self, monkeypatch):
+        user = UserModel(id="user", credits=10, displayName="", email="", createdAt=datetime.now())
+        datastore = MockDatastore(users=[user])
+        monkeypatch.setattr(
+            "pysubs.dal.firestore.FirestoreDatastore.instance",
+            lambda: datastore
+        )
+        media = YouTubeMediaManager.create_media(video_source="https://youtu.be/dQw4w9WgXcQ", user=user)
+        media.title = "title"
+        media.duration = timedelta(minutes=2)
+        cache_transcription(media, Transcription(
+            id="1", content="subtitle", language="en", media_id=media.id, decoding_profile="fast"
+        ))
+        assert not save_cached_transcription(media=media, user=user)
+        assert not save_cached_transcription(media=media, user=user, decoding_profile="accurate")
+        assert save_cached_transcription(media=media, user=user, decoding_profile="fast")
+        assert generate_cache_key(content_id="content", model_name="base", language="en") == generate_cache_key(
+            content_id="content", model_name="base", language="en", decoding_profile="balanced"
+        )
+
+    def test_transcription_cache_is_kept_per_quantization_mode(self, monkeypatch):
+        user = UserModel(id="user", credits=10, displayName="", email="", createdAt=datetime.now())
+        datastore = MockDatastore(users=[user])
+        monkeypatch.setattr(
+            "pysubs.dal.firestore.FirestoreDatastore.instance",
+            lambda: datastore
+        )
+        media = YouTubeMediaManager.create_media(video_source="https://youtu.be/dQw4w9WgXcQ", user=user)
+        media.title = "title"
+        media.duration = timedelta(minutes=2)
+        monkeypatch.setenv("WHISPER_QUANTIZATION", "int8")
+        cache_transcription(media, Transcription(id="1", content="subtitle", language="en", media_id=media.id))
+        assert save_cached_transcription(media=media, user=user)
+        monkeypatch.setenv("WHISPER_QUANTIZATION", "none")
+        assert not save_cached_transcription(media=media, user=user)
+        assert generate_cache_key(content_id="content", model_name="base", language="en") == generate_cache_key(
+            content_id="content", model_name="base", language="en", quantization_mode="none"
+        )
+
+    def test_get_subtitle_content_of_the_user(self, monkeypatch):
+        owner = UserModel(id="owner", credits=10, displayName="", email="", createdAt=datetime.now())
+        other = UserModel(id="other", credits=10, displayName="", email="", createdAt=datetime.now())
+        datastore = MockDatastore(users=[owner, other])
+        monkeypatch.setattr(
+            "pysubs.dal.firestore.FirestoreDatastore.instance",
+            lambda: datastore
+        )
+        media = YouTubeMediaManager.create_media(video_source="https://youtu.be/dQw4w9WgXcQ", user=owner)
+        media.title = "title"
+        media.duration = timedelta(minutes=2)
+        transcription = Transcription(id="1", content="subtitle", language="en", media_id=media.id)
+        save_transcription_attempt(media, transcription, owner)
+        media_model, subtitle = get_subtitle_content(subtitle_id="1", user=owner)
+        assert media_model.id == media.id
+        assert subtitle.content == "subtitle"
+        assert get_subtitle_content(subtitle_id="1", user=other) == (None, None)
+        assert get_subtitle_content(subtitle_id="2", user=owner) == (None, None)
+
+    def test_in_flight_generation_with_another_decoding_profile(self, monkeypatch):
+        job = JobModel(
+            id="media", kind="youtube", payload={"decoding_profile": "fast"}, status="running", stage="transcribing",
+            attempts=1, max_attempts=3, lease_owner="worker", lease_expires_at=0, next_attempt_at=0, last_error=None,
+            created_at=0, updated_at=0, decoding_profile=None, real_time_factor=None
+        )
+        monkeypatch.setattr("pysubs.utils.pysubs_manager.get_job_status", lambda media_id: job)
+        check_in_flight_decoding_profile(media_id="media", decoding_profile="fast")
+        with pytest.raises(DecodingProfileConflictError):
+            check_in_flight_decoding_profile(media_id="media", decoding_profile="accurate")
+        job.status = "succeeded"
+        check_in_flight_decoding_profile(media_id="media", decoding_profile="accurate")
@@ -0,0 +1,58 @@
+import os
+
+import torch
+from whisper.model import Whisper, ModelDimensions
+
+from pysubs.utils import quantization
+from pysubs.utils.model_registry import get_model_resident_bytes
+from tests.helpers import word_error_rate
+
+
+def make_model(name: str) -> Whisper:
+    torch.manual_seed(0)
+    model = Whisper(ModelDimensions(
+        n_mels=80, n_audio_ctx=30, n_audio_state=64, n_audio_head=2, n_audio_layer=2,
+        n_vocab=100, n_text_ctx=16, n_text_state=64, n_text_head=2, n_text_layer=2
+    ))
+    # left uninitialized by whisper, as it is always loaded from a checkpoint
+    torch.nn.init.normal_(model.decoder.positional_embedding, std=0.02)
+    return model
+
+
+class TestQuantization:
+    def test_linear_layers_are_quantized(self):
+        model = make_model("tiny")
+        mel = torch.randn(1, 80, 60)
+        tokens = torch.tensor([[1, 2, 3]])
+        with torch.no_grad():
+            expected = model(mel, tokens)
+        fp32_bytes = get_model_resident_bytes(model)
+        quantized = quantization.quantize_dynamic_int8(model)
+        linears = [m for m in quantized.modules() if isinstance(m, torch.ao.nn.quantized.dynamic.Linear)]
+        assert linears
+        assert not any(type(m) is torch.nn.Linear for m in quantized.modules())
+        with torch.no_grad():
+            actual = quantized(mel, tokens)
+        assert torch.nn.functional.cosine_similarity(actual.flatten(), expected.flatten(), dim=0) > 0.99
+        assert get_model_resident_bytes(quantized) < fp32_bytes
+
+    def test_quantized_model_is_cached(self, tmp_path):
+        loaded = []
+
+        def loader(name):
+            loaded.append(name)
+            return make_model(name)
+
+        first = quantization.load_quantized_model("tiny", loader=loader, cache_dir=str(tmp_path))
+        second = quantization.load_quantized_model("tiny", loader=loader, cache_dir=str(tmp_path))
+        assert loaded == ["tiny"]
+        assert os.path.exists(quantization.get_quantized_cache_path(str(tmp_path), "tiny", "int8"))
+        mel = torch.randn(1, 80, 60)
+        tokens = torch.tensor([[1, 2, 3]])
+        with torch.no_grad():
+            assert torch.equal(first(mel, tokens), second(mel, tokens))
+
+    def test_word_error_rate(self):
+        assert word_error_rate("The quick brown fox.", "the quick brown fox") == 0
+        assert word_error_rate("the quick brown fox", "the quick fox jumps") == 0.5
+        assert word_error_rate("", "words") == 1
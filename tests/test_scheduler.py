@@ -0,0 +1,126 @@
+import threading
+import time
+
+import pytest
+
+from pysubs.dal.job_store import SQLiteJobStore, JobStatus
+from pysubs.exceptions.scheduler import JobQueueFullError
+from pysubs.utils.scheduler import JobScheduler
+
+
+def wait_for_status(store: SQLiteJobStore, job_id: str, status: str) -> None:
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        if store.get(job_id).status == status:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not reach the status {status}")
+
+
+class TestJobScheduler:
+    def make_scheduler(self, tmp_path, **kwargs) -> JobScheduler:
+        store = SQLiteJobStore(path=str(tmp_path / "jobs.sqlite3"))
+        options = dict(workers=2, max_queue_size=4, retry_base_seconds=0.01, poll_seconds=0.01)
+        options.update(kwargs)
+        return JobScheduler(store=store, **options)
+
+    def test_jobs_run_on_workers(self, tmp_path):
+        scheduler = self.make_scheduler(tmp_path)
+        results = []
+        scheduler.register_handler("append", lambda job_id, payload: results.append(payload["value"]))
+        scheduler.submit("1", "append", {"value": "first"})
+        wait_for_status(scheduler.store, "1", JobStatus.SUCCEEDED)
+        assert results == ["first"]
+        assert scheduler.stats()["completed"] == 1
+
+    def test_full_queue_is_rejected(self, tmp_path):
+        scheduler = self.make_scheduler(tmp_path, workers=1, max_queue_size=1, default_retry_after=7)
+        started = threading.Event()
+        release = threading.Event()
+
+        def block(job_id, payload):
+            started.set()
+            release.wait(timeout=5)
+
+        scheduler.register_handler("block", block)
+        scheduler.submit("running", "block", {})
+        assert started.wait(timeout=5)
+        scheduler.submit("queued", "block", {})
+        assert scheduler.is_full()
+        with pytest.raises(JobQueueFullError) as e:
+            scheduler.submit("rejected", "block", {})
+        assert e.value.retry_after == 7
+        stats = scheduler.stats()
+        assert stats["queue_depth"] == 1
+        assert stats["utilization"] == 1.0
+        release.set()
+        wait_for_status(scheduler.store, "queued", JobStatus.SUCCEEDED)
+
+    def test_retryable_errors_are_retried(self, tmp_path):
+        scheduler = self.make_scheduler(tmp_path, max_attempts=3)
+        attempts = []
+
+        def flaky(job_id, payload):
+            attempts.append(job_id)
+            if len(attempts) < 3:
+                raise ConnectionError("connection reset")
+
+        scheduler.register_handler("flaky", flaky, retryable_errors=(ConnectionError,))
+        scheduler.submit("1", "flaky", {})
+        wait_for_status(scheduler.store, "1", JobStatus.SUCCEEDED)
+        assert len(attempts) == 3
+        assert scheduler.stats()["retried"] == 2
+
+    def test_other_errors_fail_the_job(self, tmp_path):
+        scheduler = self.make_scheduler(tmp_path)
+
+        def fail(job_id, payload):
+            raise ValueError("failed")
+
+        scheduler.register_handler("fail", fail, retryable_errors=(ConnectionError,))
+        scheduler.submit("1", "fail", {})
+        wait_for_status(scheduler.store, "1", JobStatus.FAILED)
+        assert scheduler.store.get("1").attempts == 1
+        assert "failed" in scheduler.store.get("1").last_error
+
+    def test_unfinished_jobs_are_resumed(self, tmp_path):
+        store = SQLiteJobStore(path=str(tmp_path / "jobs.sqlite3"))
+        store.enqueue(job_id="queued", kind="append", payload={"value": 1}, max_attempts=3)
+        store.enqueue(job_id="crashed", kind="append", payload={"value": 2}, max_attempts=3)
+        assert store.claim(owner="dead-process", lease_seconds=-1).id == "queued"
+        results = []
+        scheduler = JobScheduler(store=store, workers=1, max_queue_size=4, poll_seconds=0.01)
+        scheduler.register_handler("append", lambda job_id, payload: results.append(payload["value"]))
+        scheduler.start()
+        wait_for_status(store, "queued", JobStatus.SUCCEEDED)
+        wait_for_status(store, "crashed", JobStatus.SUCCEEDED)
+        assert sorted(results) == [1, 2]
+
+    def test_job_crashing_every_worker_is_failed(self, tmp_path):
+        store = SQLiteJobStore(path=str(tmp_path / "jobs.sqlite3"))
+        store.enqueue(job_id="crashing", kind="append", payload={"value": 1}, max_attempts=1)
+        store.claim(owner="dead-process", lease_seconds=-1)
+        finished = []
+        scheduler = JobScheduler(store=store, workers=1, max_queue_size=4, poll_seconds=0.01)
+        scheduler.register_handler("append", lambda job_id, payload: None)
+        scheduler.add_finished_listener(lambda job, succeeded: finished.append((job.id, succeeded)))
+        scheduler.start()
+        wait_for_status(store, "crashing", JobStatus.FAILED)
+        deadline = time.time() + 5
+        while not finished and time.time() < deadline:
+            time.sleep(0.01)
+        assert finished == [("crashing", False)]
+        assert scheduler.stats()["failed"] == 1
+
+    def test_api_process_only_queues_the_jobs(self, tmp_path):
+        api = self.make_scheduler(tmp_path, run_workers=False)
+        api.submit("1", "append", {"value": "first"})
+        time.sleep(0.05)
+        assert api.store.get("1").status == JobStatus.QUEUED
+        assert not api._threads
+        worker = self.make_scheduler(tmp_path)
+        results = []
+        worker.register_handler("append", lambda job_id, payload: results.append(payload["value"]))
+        worker.start()
+        wait_for_status(api.store, "1", JobStatus.SUCCEEDED)
+        assert results == ["first"]
@@ -0,0 +1,87 @@
+import os
+import time
+
+import pytest
+
+from pysubs.exceptions.media import ScratchQuotaExceededError
+from pysubs.utils.scratch import ScratchSpace
+
+
+def write_file(path: str, size: int) -> None:
+    with open(path, "wb") as f:
+        f.write(b"0" * size)
+
+
+class TestScratchSpace:
+    def test_workspace_is_released(self, tmp_path):
+        scratch = ScratchSpace(root=str(tmp_path), workspace_quota_bytes=100, budget_bytes=1000)
+        path = scratch.get_path(workspace_id="media", filename="video.mp4")
+        write_file(path, 40)
+        assert scratch.usage("media") == 40
+        assert scratch.remaining("media") == 60
+        scratch.release("media")
+        assert not os.path.exists(os.path.dirname(path))
+        assert scratch.stats()["released"] == 1
+
+    def test_quota(self, tmp_path):
+        scratch = ScratchSpace(root=str(tmp_path), workspace_quota_bytes=100, budget_bytes=1000)
+        write_file(scratch.get_path(workspace_id="media", filename="video.mp4"), 101)
+        with pytest.raises(ScratchQuotaExceededError):
+            scratch.check_quota("media")
+
+    def test_invalid_workspace_id(self, tmp_path):
+        scratch = ScratchSpace(root=str(tmp_path), workspace_quota_bytes=100, budget_bytes=1000)
+        with pytest.raises(ValueError):
+            scratch.workspace("../media")
+
+    def test_sweep_keeps_active_jobs(self, tmp_path):
+        write_file(str(tmp_path / "stray.jpg"), 10)
+        os.makedirs(tmp_path / "finished")
+        os.makedirs(tmp_path / "queued")
+        scratch = ScratchSpace(root=str(tmp_path), workspace_quota_bytes=100, budget_bytes=1000)
+        assert scratch.sweep(keep=["queued"]) == 2
+        assert os.listdir(tmp_path) == ["queued"]
+
+    def test_least_recently_used_workspace_is_evicted(self, tmp_path):
+        for name in ["older", "old"]:
+            os.makedirs(tmp_path / name)
+            write_file(str(tmp_path / name / "video.mp4"), 60)
+        old_time = time.time() - 60
+        os.utime(tmp_path / "older", (old_time - 60, old_time - 60))
+        os.utime(tmp_path / "old", (old_time, old_time))
+        scratch = ScratchSpace(root=str(tmp_path), workspace_quota_bytes=100, budget_bytes=150)
+        write_file(scratch.get_path(workspace_id="running", filename="video.mp4"), 60)
+        scratch.workspace("new")
+        assert not os.path.exists(tmp_path / "older")
+        assert os.path.exists(tmp_path / "old")
+        assert os.path.exists(tmp_path / "running")
+        assert scratch.stats()["evicted"] == 1
+
+    def test_new_workspace_over_budget_is_refused(self, tmp_path):
+        scratch = ScratchSpace(root=str(tmp_path), workspace_quota_bytes=100, budget_bytes=50)
+        write_file(scratch.get_path(workspace_id="running", filename="video.mp4"), 60)
+        with pytest.raises(ScratchQuotaExceededError):
+            scratch.workspace("new")
+        assert os.listdir(tmp_path) == ["running"]
+
+    def test_workspaces_of_other_processes_are_kept(self, tmp_path):
+        for name in ["queued-elsewhere", "finished"]:
+            os.makedirs(tmp_path / name)
+            write_file(str(tmp_path / name / "video.mp4"), 60)
+            old_time = time.time() - 600
+            os.utime(tmp_path / name / "video.mp4", (old_time, old_time))
+            os.utime(tmp_path / name, (old_time, old_time))
+        os.makedirs(tmp_path / "uploading")
+        write_file(str(tmp_path / "uploading" / "video.mp4"), 10)
+        scratch = ScratchSpace(
+            root=str(tmp_path), workspace_quota_bytes=100, budget_bytes=100, grace_seconds=300,
+            get_active_ids=lambda: ["queued-elsewhere"]
+        )
+        scratch.workspace("new")
+        assert sorted(os.listdir(tmp_path)) == ["new", "queued-elsewhere", "uploading"]
+        assert scratch.sweep() == 0
+        old_time = time.time() - 600
+        for path in [tmp_path / "uploading" / "video.mp4", tmp_path / "uploading", tmp_path / "new"]:
+            os.utime(path, (old_time, old_time))
+        assert scratch.sweep() == 1
+        assert sorted(os.listdir(tmp_path)) == ["new", "queued-elsewhere"]
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from pysubs.dal.datastore_models import JobModel
+from pysubs.dal.job_store import JobStatus
+from pysubs.exceptions.scheduler import JobQueueFullError
+from pysubs.utils.pysubs_manager import finish_in_flight_generation, YOUTUBE_JOB
+from pysubs.utils.single_flight import InFlightRegistry
+
+
+class MockLockDatastore:
+    """Stands in for the datastore locks, shared between the registries like the datastore of many processes"""
+    def __init__(self):
+        self.locks: dict[str, tuple[str, float]] = {}
+        self.lock = threading.Lock()
+
+    def acquire_generation_lock(self, media_id: str, owner: str, ttl_seconds: float) -> bool:
+        with self.lock:
+            now = time.time()
+            if (held := self.locks.get(media_id)) and held[0] != owner and held[1] > now:
+                return False
+            self.locks[media_id] = (owner, now + ttl_seconds)
+            return True
+
+    def release_generation_lock(self, media_id: str, owner: str) -> None:
+        with self.lock:
+            if (held := self.locks.get(media_id)) and held[0] == owner:
+                del self.locks[media_id]
+
+
+class TestInFlightRegistry:
+    def test_duplicates_are_attached(self):
+        datastore = MockLockDatastore()
+        registry = InFlightRegistry(datastore_factory=lambda: datastore, lock_seconds=60)
+        started = []
+        assert registry.run_once("media", lambda: started.append("media")) == ("media", True)
+        assert registry.run_once("media", lambda: started.append("media")) == ("media", False)
+        assert started == ["media"]
+        assert registry.get("media").attached == 1
+        registry.finish("media")
+        assert registry.run_once("media", lambda: started.append("media")) == ("media", True)
+        assert started == ["media", "media"]
+
+    def test_concurrent_duplicates_start_once(self):
+        datastore = MockLockDatastore()
+        registry = InFlightRegistry(datastore_factory=lambda: datastore, lock_seconds=60)
+        started = []
+        threads = [
+            threading.Thread(target=registry.run_once, args=("media", lambda: started.append("media")))
+            for _ in range(8)
+        ]
+        for thr in threads:
+            thr.start()
+        for thr in threads:
+            thr.join()
+        assert started == ["media"]
+
+    def test_generation_in_another_process(self):
+        datastore = MockLockDatastore()
+        first = InFlightRegistry(datastore_factory=lambda: datastore, lock_seconds=60)
+        second = InFlightRegistry(datastore_factory=lambda: datastore, lock_seconds=60)
+        started = []
+        first.run_once("media", lambda: started.append("first"))
+        assert second.run_once("media", lambda: started.append("second")) == ("media", False)
+        assert second.stats()["attached_elsewhere"] == 1
+        first.finish("media")
+        assert second.run_once("media", lambda: started.append("second")) == ("media", True)
+        assert started == ["first", "second"]
+
+    def test_failed_start_is_released(self):
+        datastore = MockLockDatastore()
+        registry = InFlightRegistry(datastore_factory=lambda: datastore, lock_seconds=60)
+
+        def start():
+            raise JobQueueFullError("full", retry_after=1)
+
+        with pytest.raises(JobQueueFullError):
+            registry.run_once("media", start)
+        assert not registry.is_in_flight("media")
+        assert "media" not in datastore.locks
+
+    def test_generation_queued_by_the_api_is_released_by_the_worker(self, monkeypatch):
+        datastore = MockLockDatastore()
+        api = InFlightRegistry(datastore_factory=lambda: datastore, lock_seconds=60)
+        worker = InFlightRegistry(datastore_factory=lambda: datastore, lock_seconds=60)
+        replica = InFlightRegistry(datastore_factory=lambda: datastore, lock_seconds=60)
+        api.run_once("media", lambda: None)
+        assert replica.run_once("media", lambda: None) == ("media", False)
+        monkeypatch.setattr("pysubs.utils.single_flight.InFlightRegistry.instance", lambda: worker)
+        job = JobModel(
+            id="media", kind=YOUTUBE_JOB, payload={"generation_lock_owner": api.owner}, status=JobStatus.FAILED,
+            stage=None, attempts=1, max_attempts=1, lease_owner=None, lease_expires_at=None, next_attempt_at=0,
+            last_error="error", created_at=0, updated_at=0, decoding_profile=None, real_time_factor=None
+        )
+        finish_in_flight_generation(job, succeeded=False)
+        assert "media" not in datastore.locks
+        assert replica.run_once("media", lambda: None) == ("media", True)
+
+    def test_discarded_generation_is_released(self):
+        datastore = MockLockDatastore()
+        api = InFlightRegistry(datastore_factory=lambda: datastore, lock_seconds=60)
+        replica = InFlightRegistry(datastore_factory=lambda: datastore, lock_seconds=60)
+        api.run_once("media", lambda: None)
+        api.discard("media")
+        assert not api.is_in_flight("media")
+        assert replica.run_once("media", lambda: None) == ("media", True)
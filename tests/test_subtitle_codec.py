@@ -0,0 +1,117 @@
+import base64
+import os
+from datetime import datetime
+
+from pysubs.dal import subtitle_codec
+from pysubs.dal.datastore_models import SubtitleModel, TranscriptionCacheModel
+from pysubs.dal.firestore import FirestoreDatastore
+from tests.fake_firestore import FakeFirestore
+
+SRT = "1\n00:00:00,000 --> 00:00:02,000\nHello world\n\n2\n00:00:02,000 --> 00:00:04,000\nHello again\n\n"
+
+
+def make_subtitle(content: str) -> SubtitleModel:
+    return SubtitleModel(
+        id="subtitle", media_id="media", content=content, created_at=datetime(2023, 1, 1),
+        expire_at=datetime(2023, 1, 11)
+    )
+
+
+class TestSubtitleCodec:
+    def test_round_trip(self):
+        content = SRT * 1000
+        encoded = subtitle_codec.encode_content(content)
+        assert encoded.size == len(content.encode("utf-8"))
+        assert sum(len(chunk) for chunk in encoded.chunks) < encoded.size / 10
+        assert subtitle_codec.decode_content(encoded.encoding, encoded.chunks) == content
+
+    def test_large_body_is_chunked(self):
+        content = base64.b64encode(os.urandom(30_000)).decode()
+        encoded = subtitle_codec.encode_content(content, chunk_bytes=10_000)
+        assert len(encoded.chunks) > 1
+        assert all(len(chunk) <= 10_000 for chunk in encoded.chunks)
+        assert subtitle_codec.decode_content(encoded.encoding, encoded.chunks) == content
+
+    def test_empty_content(self):
+        encoded = subtitle_codec.encode_content("")
+        assert subtitle_codec.decode_content(encoded.encoding, encoded.chunks) == ""
+
+
+class TestSubtitleStorage:
+    def test_content_is_stored_compressed(self):
+        db = FakeFirestore()
+        fs = FirestoreDatastore(db=db)
+        fs.upsert_subtitle(make_subtitle(SRT))
+        document = db.data["subtitles"]["subtitle"]
+        assert document["content"] is None
+        assert document["content_encoding"] == subtitle_codec.ENCODING_ZLIB
+        assert fs.get_subtitle("subtitle").content == SRT
+        assert fs.get_subtitle_for_media("media").content == SRT
+
+    def test_long_content_is_stored_in_chunks(self):
+        db = FakeFirestore()
+        fs = FirestoreDatastore(db=db)
+        content = base64.b64encode(os.urandom(2 * subtitle_codec.CHUNK_BYTES)).decode()
+        fs.upsert_subtitle(make_subtitle(content))
+        assert db.data["subtitles"]["subtitle"]["content_chunks"] > 1
+        assert all(len(chunk["data"]) <= subtitle_codec.CHUNK_BYTES for chunk in db.data["subtitle_chunks"].values())
+        reads = db.reads
+        assert fs.get_subtitle("subtitle").content == content
+        assert db.reads == reads + 2
+
+    def test_chunks_expire_with_the_subtitle(self):
+        db = FakeFirestore()
+        fs = FirestoreDatastore(db=db)
+        fs.upsert_subtitle(make_subtitle(base64.b64encode(os.urandom(2 * subtitle_codec.CHUNK_BYTES)).decode()))
+        assert db.data["subtitle_chunks"]
+        assert all(chunk["expire_at"] == datetime(2023, 1, 11) for chunk in db.data["subtitle_chunks"].values())
+
+    def test_shrunk_content_deletes_the_stale_chunks(self):
+        db = FakeFirestore()
+        fs = FirestoreDatastore(db=db)
+        fs.upsert_subtitle(make_subtitle(base64.b64encode(os.urandom(3 * subtitle_codec.CHUNK_BYTES)).decode()))
+        assert len(db.data["subtitle_chunks"]) > 1
+        content = base64.b64encode(os.urandom(subtitle_codec.CHUNK_BYTES)).decode()
+        fs.upsert_subtitle(make_subtitle(content))
+        assert list(db.data["subtitle_chunks"]) == ["subtitle-1"]
+        assert fs.get_subtitle("subtitle").content == content
+        fs.upsert_subtitle(make_subtitle(SRT))
+        assert db.data["subtitle_chunks"] == {}
+        assert fs.get_subtitle("subtitle").content == SRT
+
+    def test_uncompressed_subtitles_are_read(self):
+        db = FakeFirestore()
+        db.collection("subtitles").document("subtitle").set(make_subtitle(SRT).dict())
+        fs = FirestoreDatastore(db=db)
+        assert fs.get_subtitle("subtitle").content == SRT
+
+
+class TestTranscriptionCacheStorage:
+    def test_long_cached_transcription_is_stored_in_chunks(self):
+        db = FakeFirestore()
+        fs = FirestoreDatastore(db=db)
+        content = base64.b64encode(os.urandom(2 * subtitle_codec.CHUNK_BYTES)).decode()
+        entry = TranscriptionCacheModel(
+            id="key", content_id="content", model_name="base", language="en", detected_language="en",
+            content=content, title="title", duration=60, thumbnail_url=None, created_at=datetime(2023, 1, 1)
+        )
+        fs.upsert_cached_transcription(entry)
+        document = db.data["transcription_cache"]["key"]
+        assert document["content"] is None
+        assert document["content_chunks"] > 1
+        assert all(
+            len(chunk["data"]) <= subtitle_codec.CHUNK_BYTES for chunk in db.data["transcription_cache_chunks"].values()
+        )
+        assert fs.get_cached_transcription("key") == entry
+        fs.upsert_cached_transcription(entry.copy(update={"content": SRT}))
+        assert db.data["transcription_cache_chunks"] == {}
+        assert fs.get_cached_transcription("key").content == SRT
+
+    def test_uncompressed_cached_transcriptions_are_read(self):
+        db = FakeFirestore()
+        entry = TranscriptionCacheModel(
+            id="key", content_id="content", model_name="base", language="en", detected_language="en",
+            content=SRT, title="title", duration=60, thumbnail_url=None, created_at=datetime(2023, 1, 1)
+        )
+        db.collection("transcription_cache").document("key").set(entry.dict())
+        assert FirestoreDatastore(db=db).get_cached_transcription("key") == entry